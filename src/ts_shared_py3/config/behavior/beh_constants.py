@@ -40,6 +40,14 @@ FEELING_CD_PREFIX = "feelingReport"
 FEELING_ONLY_CODE_POS = "feelingReportPos"
 FEELING_ONLY_CODE_NEG = "feelingReportNeg"
 
+# taxonomy source files (relative to OsPathInfo project root)
+CATEGORY_YAML_REL_PATH = "static/data/category.yaml"
+BEHAVIOR_YAML_REL_PATH = "static/data/behaviors.yaml"
+# precompiled binary copy of the parsed yaml;  see config/behavior/snapshot.py
+SNAPSHOT_REL_PATH = "static/data/behaviors.snapshot"
+# how often BehaviorSourceSingleton.startWatcher checks the yaml for edits
+HOT_RELOAD_POLL_SECS = 30
+
 # below moved to test
 # sample relationship data for scoring tests
 # GETTING_BETTER_FILENAME = "gettingBetter.csv"
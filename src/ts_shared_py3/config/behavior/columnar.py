@@ -0,0 +1,149 @@
+"""
+columnar (struct of arrays) view of the behavior taxonomy
+
+every node gets a dense int id (its position in masterDict)
+and its hot scalar attributes are stored in aligned NumPy arrays
+so scoring & stats code can resolve thousands of behCodes with
+one dict pass + vectorized gathers instead of a BehCatNode walk per entry
+
+    cols = BehaviorSourceSingleton().columns
+    ids = cols.idsFor(codes)            # -1 for unknown codes
+    impacts = cols.impact[ids]          # (after masking unknowns)
+    BehaviorSourceSingleton().impactsFor(codes)
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, Mapping, Optional, Iterable, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .load_yaml import BehCatNode
+
+# id used for unknown / empty codes (topCategory, opposite, parent)
+NO_ID = -1
+
+
+def _frozen(arr: np.ndarray) -> np.ndarray:
+    # shared across threads;  nobody may write into these
+    arr.flags.writeable = False
+    return arr
+
+
+class TaxonomyColumns(object):
+    """immutable after construction;  safe to read from many threads"""
+
+    def __init__(self: TaxonomyColumns, masterDict: Mapping[str, BehCatNode]) -> None:
+        nodes: Tuple[BehCatNode, ...] = tuple(masterDict.values())
+        self.nodes: Tuple[BehCatNode, ...] = nodes
+        self.codes: Tuple[str, ...] = tuple(b.code for b in nodes)
+        self.idByCode: Dict[str, int] = {cd: i for i, cd in enumerate(self.codes)}
+
+        idGet = self.idByCode.get
+        count = len(nodes)
+        self.impact = _frozen(
+            np.fromiter((float(b.impact) for b in nodes), np.float64, count)
+        )
+        self.positive = _frozen(
+            np.fromiter((bool(b.positive) for b in nodes), bool, count)
+        )
+        self.isCategory = _frozen(
+            np.fromiter((bool(b.isCategory) for b in nodes), bool, count)
+        )
+        self.sort = _frozen(np.fromiter((int(b.sort) for b in nodes), np.int32, count))
+        self.topCategoryId = _frozen(
+            np.fromiter(
+                (idGet(b.topCategoryCode, NO_ID) for b in nodes), np.int32, count
+            )
+        )
+        self.oppositeId = _frozen(
+            np.fromiter((idGet(b.oppositeCode, NO_ID) for b in nodes), np.int32, count)
+        )
+        self.parentId = _frozen(
+            np.fromiter((idGet(b.parentCode, NO_ID) for b in nodes), np.int32, count)
+        )
+
+    def __len__(self: TaxonomyColumns) -> int:
+        return len(self.codes)
+
+    def idsFor(self: TaxonomyColumns, codes: Iterable[str]) -> np.ndarray:
+        # int32 ids aligned with codes;  NO_ID where the code is unknown
+        idGet = self.idByCode.get
+        return np.fromiter((idGet(cd, NO_ID) for cd in codes), np.int32)
+
+    def codesFor(self: TaxonomyColumns, ids: np.ndarray) -> List[Optional[str]]:
+        # inverse of idsFor (None for NO_ID)
+        codes = self.codes
+        return [codes[i] if i >= 0 else None for i in ids.tolist()]
+
+    def lookupMany(
+        self: TaxonomyColumns, codes: Iterable[str]
+    ) -> List[Optional[BehCatNode]]:
+        # bcnFromCode for many codes at once (None where unknown)
+        nodes = self.nodes
+        return [nodes[i] if i >= 0 else None for i in self.idsFor(codes).tolist()]
+
+    def impactsFor(
+        self: TaxonomyColumns, codes: Iterable[str], default: float = 0.0
+    ) -> np.ndarray:
+        return self._gather(self.impact, self.idsFor(codes), default)
+
+    def positiveFor(
+        self: TaxonomyColumns, codes: Iterable[str], default: bool = False
+    ) -> np.ndarray:
+        return self._gather(self.positive, self.idsFor(codes), default)
+
+    def topCategoryIdsFor(self: TaxonomyColumns, codes: Iterable[str]) -> np.ndarray:
+        return self._gather(self.topCategoryId, self.idsFor(codes), NO_ID)
+
+    def oppositeIdsFor(self: TaxonomyColumns, codes: Iterable[str]) -> np.ndarray:
+        return self._gather(self.oppositeId, self.idsFor(codes), NO_ID)
+
+    @staticmethod
+    def _gather(column: np.ndarray, ids: np.ndarray, default) -> np.ndarray:
+        # column[ids] with default wherever ids == NO_ID
+        out = column[ids]  # NO_ID (-1) reads the last row;  overwritten below
+        unknown = ids < 0
+        if unknown.any():
+            out[unknown] = default
+        return out
+
+
+def benchColumns(
+    masterDict: Mapping[str, BehCatNode], cols: TaxonomyColumns, entries: int = 10000
+) -> None:
+    # per-entry dict walk vs batch lookup for a list of behCodes
+    import random
+    from ...utils.bench import bestMs
+
+    behCodes = [cd for cd, b in masterDict.items() if not b.isCategory]
+    codes = [random.choice(behCodes) for _ in range(entries)]
+
+    def _perEntry() -> Tuple[float, int]:
+        total, posCount = 0.0, 0
+        for cd in codes:
+            bcn = masterDict.get(cd)
+            total += bcn.impact
+            posCount += 1 if bcn.positive else 0
+        return total, posCount
+
+    def _batch() -> Tuple[float, int]:
+        ids = cols.idsFor(codes)
+        return float(cols.impact[ids].sum()), int(cols.positive[ids].sum())
+
+    assert abs(_perEntry()[0] - _batch()[0]) < 1e-6 and _perEntry()[1] == _batch()[1]
+    print(
+        "{0} entries:  per-entry dict walk {1:.2f}ms   batch ids + numpy {2:.2f}ms".format(
+            entries, bestMs(_perEntry, 10), bestMs(_batch, 10)
+        )
+    )
+
+
+if __name__ == "__main__":
+    from ...utils.bench import benchArgs
+
+    benchArgs()
+    from .load_yaml import BehaviorSourceSingleton
+
+    _bss = BehaviorSourceSingleton()
+    benchColumns(_bss.masterDict, _bss.columns)
@@ -0,0 +1,221 @@
+"""
+inverted keyword index over BehCatNode keywords
+
+inheritCategoryDescripToBehKeywords flattens each behavior's search words
+into a "*" delimited string;  scanning that string on every node per query
+is slow, so BehaviorSourceSingleton builds this index once at load:
+
+    token -> postings (behCodes sorted) with a precomputed BM25 weight per code
+
+query tokens also match as prefixes (type-ahead) at a reduced weight
+
+usage:
+    BehaviorSourceSingleton().searchByKeyword("late text", limit=10, positive=False)
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, Optional, Iterable, TYPE_CHECKING
+import re
+import sys
+import math
+import heapq
+from bisect import bisect_left
+from collections import Counter
+
+from ...utils.stop_words import removeStopWords
+
+if TYPE_CHECKING:
+    from .load_yaml import BehCatNode
+
+
+# BM25 tuning;  behavior "documents" are short so keep length penalty mild
+BM25_K1 = 1.2
+BM25_B = 0.5
+# score multiplier when a query token only matches as a prefix of an index token
+PREFIX_MATCH_WEIGHT = 0.6
+# shortest query token allowed to expand as a prefix
+MIN_PREFIX_LEN = 2
+# guard against a 2 letter prefix fanning out over the whole vocabulary
+MAX_PREFIX_EXPANSIONS = 40
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    # lowercase words in original order (dups kept for term frequency)
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class KeywordIndex(object):
+    """immutable after construction;  safe to read from many threads"""
+
+    def __init__(self: KeywordIndex, masterDict: Dict[str, BehCatNode]) -> None:
+        termFreqsByCode: Dict[str, Counter] = dict()
+        self._positiveByCode: Dict[str, bool] = dict()
+        # the raw keyword strings, split into shared (interned) words
+        # so nodes can drop their copy;  see BehCatNode.keywords
+        self._keywordParts: Dict[str, Tuple[str, ...]] = dict()
+        for code, bcn in masterDict.items():
+            keywords = bcn.keywords
+            self._keywordParts[code] = tuple(sys.intern(w) for w in keywords.split("*"))
+            if bcn.isCategory:
+                continue  # only behaviors are searchable
+            termFreqsByCode[code] = _termFreqs(keywords)
+            self._positiveByCode[code] = bool(bcn.positive)
+
+        docCount = max(len(termFreqsByCode), 1)
+        avgDocLen = (
+            sum(sum(tf.values()) for tf in termFreqsByCode.values()) / float(docCount)
+        ) or 1.0
+
+        # token -> {code: tf}
+        tfByToken: Dict[str, Dict[str, int]] = dict()
+        docLenByCode: Dict[str, int] = dict()
+        for code, tfs in termFreqsByCode.items():
+            docLenByCode[code] = sum(tfs.values())
+            for token, tf in tfs.items():
+                tfByToken.setdefault(token, dict())[code] = tf
+
+        # token -> (sorted codes, matching BM25 weights)
+        self._postings: Dict[str, Tuple[Tuple[str, ...], Tuple[float, ...]]] = dict()
+        for token, codeTfs in tfByToken.items():
+            df = len(codeTfs)
+            idf = math.log(1.0 + (docCount - df + 0.5) / (df + 0.5))
+            codes = tuple(sorted(codeTfs))
+            weights = tuple(
+                _bm25(idf, codeTfs[cd], docLenByCode[cd], avgDocLen) for cd in codes
+            )
+            self._postings[token] = (codes, weights)
+
+        # sorted vocabulary for prefix lookups via bisect
+        self._vocabulary: Tuple[str, ...] = tuple(sorted(self._postings))
+
+    def __len__(self: KeywordIndex) -> int:
+        return len(self._postings)
+
+    def keywordsFor(self: KeywordIndex, code: str) -> str:
+        # original keyword string for any node ("" if unknown)
+        return "*".join(self._keywordParts.get(code, ()))
+
+    def postings(self: KeywordIndex, token: str) -> Tuple[str, ...]:
+        # sorted behCodes containing token (exact match)
+        return self._postings.get(token, ((), ()))[0]
+
+    def search(
+        self: KeywordIndex,
+        query: str,
+        limit: int = 20,
+        positive: Optional[bool] = None,
+    ) -> List[Tuple[str, float]]:
+        """ranked [(behCode, score)] best first
+        every query token adds its best exact-or-prefix BM25 weight per code
+        positive=None returns both pos & neg behaviors
+        """
+        if limit < 1:
+            return []
+        queryTokens = removeStopWords(tokenize(query))
+        if len(queryTokens) < 1:
+            return []
+
+        scores: Dict[str, float] = dict()
+        for qToken in queryTokens:
+            bestForToken: Dict[str, float] = dict()
+            for token, multiplier in self._expand(qToken):
+                codes, weights = self._postings[token]
+                for cd, wt in zip(codes, weights):
+                    wt *= multiplier
+                    if wt > bestForToken.get(cd, 0.0):
+                        bestForToken[cd] = wt
+            for cd, wt in bestForToken.items():
+                scores[cd] = scores.get(cd, 0.0) + wt
+
+        if positive is not None:
+            posByCode = self._positiveByCode
+            candidates: Iterable[Tuple[str, float]] = (
+                (cd, sc) for cd, sc in scores.items() if posByCode[cd] == positive
+            )
+        else:
+            candidates = scores.items()
+        # ties broken by code so results are stable
+        return heapq.nsmallest(limit, candidates, key=lambda t: (-t[1], t[0]))
+
+    def _expand(self: KeywordIndex, qToken: str) -> List[Tuple[str, float]]:
+        # exact token (full weight) plus vocabulary tokens starting with qToken
+        expansions: List[Tuple[str, float]] = []
+        if qToken in self._postings:
+            expansions.append((qToken, 1.0))
+        if len(qToken) < MIN_PREFIX_LEN:
+            return expansions
+
+        vocab = self._vocabulary
+        idx = bisect_left(vocab, qToken)
+        while idx < len(vocab) and len(expansions) < MAX_PREFIX_EXPANSIONS:
+            token = vocab[idx]
+            if not token.startswith(qToken):
+                break
+            if token != qToken:
+                expansions.append((token, PREFIX_MATCH_WEIGHT))
+            idx += 1
+        return expansions
+
+
+def _termFreqs(keywords: str) -> Counter:
+    # stop words dropped via removeStopWords (which also dedups)
+    tokens = tokenize(keywords)
+    keep = set(removeStopWords(tokens))
+    return Counter(t for t in tokens if t in keep)
+
+
+def _bm25(idf: float, tf: int, docLen: int, avgDocLen: float) -> float:
+    norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * (docLen / avgDocLen))
+    return idf * (tf * (BM25_K1 + 1.0)) / norm
+
+
+def linearScanSearch(
+    masterDict: Dict[str, BehCatNode],
+    keywordsByCode: Dict[str, str],
+    query: str,
+    positive: Optional[bool] = None,
+) -> List[str]:
+    # old approach (substring scan of every node);  kept for the benchmark
+    terms = ["*" + t for t in removeStopWords(tokenize(query))]
+    return [
+        cd
+        for cd, bcn in masterDict.items()
+        if not bcn.isCategory
+        and (positive is None or bcn.positive == positive)
+        and any(t in keywordsByCode[cd] for t in terms)
+    ]
+
+
+def benchSearch(
+    masterDict: Dict[str, BehCatNode], queries: List[str], rounds: int = 200
+) -> None:
+    # compare per-query latency:  index vs linear scan
+    from ...utils.bench import perCallMicros
+
+    index = KeywordIndex(masterDict)
+    # keyword strings the way the nodes used to carry them
+    keywordsByCode = {cd: index.keywordsFor(cd) for cd in masterDict}
+
+    def _perQueryMicros(func) -> float:
+        return perCallMicros(lambda: [func(q) for q in queries], rounds) / len(queries)
+
+    indexUs = _perQueryMicros(lambda q: index.search(q, 20))
+    scanUs = _perQueryMicros(lambda q: linearScanSearch(masterDict, keywordsByCode, q))
+    print(
+        "nodes:{0}  tokens:{1}  index: {2:.1f}us/query   linear scan: {3:.1f}us/query".format(
+            len(masterDict), len(index), indexUs, scanUs
+        )
+    )
+
+
+if __name__ == "__main__":
+    from ...utils.bench import benchArgs
+
+    _queries = benchArgs("[query ...]")
+    from .load_yaml import BehaviorSourceSingleton
+
+    _bss = BehaviorSourceSingleton()
+    _queries = _queries or ["late", "lied to me", "money", "jeal", "family fri"]
+    benchSearch(_bss.masterDict, _queries)
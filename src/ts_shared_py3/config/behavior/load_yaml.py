@@ -15,9 +15,13 @@ Behavior level:
 """
 
 from __future__ import annotations
-from typing import Callable, Tuple, Dict, Any, List
+from typing import Callable, Tuple, Dict, Any, List, Mapping, Optional, Iterable
+import os
+import sys
 import random
+import threading
 import yaml
+import numpy as np
 import json  # dumps( {} ) turns dict into string
 
 # from pathlib import Path
@@ -44,7 +48,17 @@ from .beh_constants import (
     SHOWALL_CODE_PREFIX,
     FEELING_ONLY_CODE_POS,
     FEELING_ONLY_CODE_NEG,
+    CATEGORY_YAML_REL_PATH,
+    BEHAVIOR_YAML_REL_PATH,
+    SNAPSHOT_REL_PATH,
+    HOT_RELOAD_POLL_SECS,
 )
+from .snapshot import loadSnapshotIfCurrent, yamlSourceHash, TaxonomyTuple
+from .taxonomy_view import TaxonomyView, CatCodeWithName, buildTaxonomyView
+from .keyword_index import KeywordIndex
+from .rendered_payload import RenderedPayload
+from .sampler import sampleCodes
+from .columnar import TaxonomyColumns
 
 # usage:
 # from common.config.behavior.load_yaml import BehaviorSourceSingleton
@@ -99,10 +113,28 @@ def forRowInYaml(fullFilePath: str, funcToRun: Callable) -> list[BehCatNode]:
 
 @dataclass
 class BehCatNode(object):
+    # slots:  no per-node __dict__ (every worker process holds every node)
+    __slots__ = (
+        "code",
+        "parentCode",
+        "text",
+        "_keywords",
+        "_keywordIndex",  # of the owning view, once _keywords is dropped
+        "sort",
+        "positive",
+        "childrenSearchable",
+        "isCategory",
+        "impact",
+        "aliases",
+        "altCategories",
+        "oppositeCode",
+        "topCategoryCode",
+        "parentDescription",
+    )
+
     code: str
     parentCode: str
     text: str
-    keywords: str
     sort: int
     positive: bool
     childrenSearchable: bool
@@ -115,6 +147,25 @@ class BehCatNode(object):
     def __init__(self: BehCatNode) -> None:
         pass
 
+    @property
+    def keywords(self: BehCatNode) -> str:
+        """search words ("*" delimited)
+        once a TaxonomyView is built its KeywordIndex holds the only copy
+        """
+        if self._keywords is None:
+            return self._keywordIndex.keywordsFor(self.code)
+        return self._keywords
+
+    @keywords.setter
+    def keywords(self: BehCatNode, value: str) -> None:
+        self._keywords = value
+
+    def useKeywordIndex(self: BehCatNode, keywordIndex: KeywordIndex) -> None:
+        # drop this node's copy;  keywords now come from the view's index
+        # (not the singleton:  an old view's nodes keep their own index)
+        self._keywordIndex = keywordIndex
+        self._keywords = None
+
     @staticmethod
     def yamlToBcn(isCategory: bool, row: Dict[str, Any]) -> BehCatNode:
         """BIG WARNING HERE
@@ -303,6 +354,8 @@ class BehCatNode(object):
         bcn.sort = 100
         bcn.keywords = ""
         bcn.childrenSearchable = 0
+        bcn.aliases = []
+        bcn.altCategories = ""
         bcn.topCategoryCode = "hiddenPos" if isPositive else "hiddenNeg"
         bcn.parentDescription = (
             "Feelings"  # category name for the feeling only behaviors
@@ -321,7 +374,9 @@ def finalKeywordsList(
     textWordsList = theText.lower().split(" ")
     bkl = behKeywordsLst.lower().split(",")  # [w.lower() for w in behKeywordsLst]
     ckl = catKeywordsLst.lower().split(",")  # [w.lower() for w in catKeywordsLst]
-    dedupSet = set(bkl + ckl + textWordsList)  # remove dups
+    # remove dups;  dict keeps first-seen order so the rendered payload
+    # (and its ETag) is identical on every instance
+    dedupSet = dict.fromkeys(bkl + ckl + textWordsList)
     # return removeStopWords(list(dedupSet))  # list in/out
     return list(dedupSet)
 
@@ -387,6 +442,182 @@ def getCategoryListSorted(
     return sortTupleList(tupList)
 
 
+def buildSortedGraph(
+    masterDict: Dict[str, BehCatNode], categoriesDict: Dict[str, BehCatNode]
+) -> list[Tuple[str, list[str]]]:
+    # every behavior or subCat has a parent
+    # we need a sorted list of every parent's child  codes
+    # tempGraphDict first contains tuples & then converted to strings after sorting
+    parentToChildrenDict: Dict[str, List[Tuple[str, int]]] = dict()
+    beh: BehCatNode = None
+    for cd, beh in masterDict.items():
+        # only need to process subCats & behaviors (parentCode filters out topLevelCats)
+        if beh.parentCode not in ("", "root"):
+            lstForTier2: List[Tuple[str, int]] = parentToChildrenDict.setdefault(
+                beh.parentCode, []
+            )
+            lstForTier2.append((cd, beh.sort))
+
+            if not beh.isCategory:  # skip subcats; DO NOT REMOVE THIS  (see "OR" above)
+                # copy super-parent code & descrip to the behavior
+                beh.inheritParentVals(masterDict)
+
+            # # also make sure same behavior added to alt-categories
+            # # 190104 -> we eliminated altCategories
+            # for cat in beh.altCategories:
+            #     # sort #s typically skip 5 digits
+            #     # there are never more than 16 items in a subcat list
+            #     # 5 x 16 = 80
+            #     # add 80 so alt-cats always sort at bottom of list in relative order
+            #     tempGraphDict.setdefault(cat, []).append((cd, beh.sort + 80))
+
+    # tempGraphDict.keys() contains every category pointed at by a Behavior or subcat
+    # if we subtract the TOTAL (bigger) list of category keys, we should get EMPTY set
+    # some behaviors are hidden (only found by searching) & have no parent
+    # allowed to have 1 (hidden) as a left over category code
+    leftoverKeys = set(parentToChildrenDict.keys()) - set(categoriesDict.keys())
+    if len(leftoverKeys) > 1:
+        print("Warn:  left over category codes: {0}".format(leftoverKeys))
+
+    # now sort all sublists & build final graph
+    # graph is a list of tuples where t.0 == catOrSubCatCode & t.1 == [behCodes]
+    graph: List[Tuple[str, List[str]]] = []
+    for catCode, lstOfCodeSortTup in parentToChildrenDict.items():
+        behCodeOnlyList: list[str] = removeDupChildCodesThenSort(lstOfCodeSortTup)
+        # NOTE:  not updating tempGraphDict
+        graph.append((catCode, behCodeOnlyList))
+    return graph
+
+
+def removeDupChildCodesThenSort(lstOfCodeSortTup: List[Tuple[str, int]]) -> list[str]:
+    newList: list[Tuple[str, int]] = []
+    seenList: list[str] = []
+    for tup in lstOfCodeSortTup:
+        if tup[0] not in seenList:
+            newList.append(tup)
+            seenList.append(tup[0])
+
+    # must be a real list (not a map iterator) so the graph can be re-read & pickled
+    return [x[0] for x in sorted(newList, key=lambda x: x[1])]
+
+
+def appendShowAllCategories(
+    masterDict: Dict[str, BehCatNode],
+    topLevelCategoryCodes: List[str],
+    graph: List[Tuple[str, List[str]]],
+) -> None:
+    """
+    puts showAll (children searchable) on both the pos & neg top level categories
+    Returns: none
+    """
+    posCode = SHOWALL_CODE_PREFIX + "Pos"
+    negCode = SHOWALL_CODE_PREFIX + "Neg"
+
+    topLevelCategoryCodes.insert(0, posCode)  # at top of category list
+    topLevelCategoryCodes.insert(0, negCode)
+
+    # find all pos & neg behaviors
+    posChildren = [
+        cd for cd, v in masterDict.items() if v.positive and not v.isCategory
+    ]
+    negChildren = [
+        cd for cd, v in masterDict.items() if not v.positive and not v.isCategory
+    ]
+
+    graph.append((posCode, posChildren))
+    graph.append((negCode, negChildren))
+
+    showAllPositiveCat = BehCatNode.make(
+        True, posCode, SHOWALL_CAT_LABEL + " Positive", "", True, negCode
+    )
+    showAllPositiveCat.childrenSearchable = True
+
+    showAllNegativeCat = BehCatNode.make(
+        True, negCode, SHOWALL_CAT_LABEL + " Negative", "", False, posCode
+    )
+    showAllNegativeCat.childrenSearchable = True
+
+    masterDict[posCode] = showAllPositiveCat
+    masterDict[negCode] = showAllNegativeCat
+
+
+def _intern(val: Any) -> Any:
+    return sys.intern(val) if isinstance(val, str) else val
+
+
+def internTaxonomyStrings(
+    masterDict: Dict[str, BehCatNode],
+    topLevelCategoryCodes: List[str],
+    graph: List[Tuple[str, List[str]]],
+) -> Tuple[Dict[str, BehCatNode], List[str], List[Tuple[str, List[str]]]]:
+    """codes & category names repeat across hundreds of nodes (and the graph)
+    yaml gives each occurrence its own str;  share one copy of each instead
+    """
+    for bcn in masterDict.values():
+        bcn.code = _intern(bcn.code)
+        bcn.parentCode = _intern(bcn.parentCode)
+        bcn.oppositeCode = _intern(bcn.oppositeCode)
+        bcn.topCategoryCode = _intern(bcn.topCategoryCode)
+        bcn.parentDescription = _intern(bcn.parentDescription)
+    return (
+        {bcn.code: bcn for bcn in masterDict.values()},
+        [_intern(cd) for cd in topLevelCategoryCodes],
+        [(_intern(cd), [_intern(ch) for ch in kids]) for cd, kids in graph],
+    )
+
+
+def loadTaxonomyFromYaml(
+    catPath: str, behPath: str
+) -> Tuple[Dict[str, BehCatNode], List[str], List[Tuple[str, List[str]]]]:
+    """parse both yaml files & fully resolve the taxonomy
+    returns (masterDict, topLevelCategoryCodes, graph)
+    this is the slow path;  snapshot.py caches its result
+    """
+    categoriesDict: dict[str, BehCatNode] = dict()
+    # forRowInYaml returns a list which we can ignore here
+    forRowInYaml(
+        catPath,
+        makePerRowFunc(True, categoriesDict),
+    )
+    behaviorsDict: dict[str, BehCatNode] = dict()  # behavior
+    forRowInYaml(
+        behPath,
+        makePerRowFunc(False, behaviorsDict),
+    )
+
+    # walk thru every behavior in behaviorsDict
+    # update the beh.keywords as a unique, lowercase string of search words
+    inheritCategoryDescripToBehKeywords(behaviorsDict, categoriesDict)
+
+    masterDict: Dict[str, BehCatNode] = dict(categoriesDict)
+    masterDict.update(behaviorsDict)
+
+    # figure out the root of hierarchy
+    topLevelCategoryCodes: List[str] = getCategoryListSorted(
+        categoriesDict, lambda cat: cat.parentCode in ("", "root")
+    )
+    assert (
+        len(topLevelCategoryCodes) > 3
+    ), "top level categories missing (%s found)" % (len(topLevelCategoryCodes))
+
+    graph: List[Tuple[str, List[str]]] = buildSortedGraph(masterDict, categoriesDict)
+    # NOTE:  Show all and Feelings are not getting augmentation from buildSortedGraph
+    appendShowAllCategories(masterDict, topLevelCategoryCodes, graph)
+
+    masterDict, topLevelCategoryCodes, graph = internTaxonomyStrings(
+        masterDict, topLevelCategoryCodes, graph
+    )
+
+    # feelingOnlyCodes are now in YAML .. no need to add them here
+    # self.appendFeelingOnlyCodes()
+    print(
+        "master:{0}  beh:{1}  graph(cats/subcats):{2}".format(
+            len(masterDict), len(behaviorsDict), len(graph)
+        )
+    )
+    return masterDict, topLevelCategoryCodes, graph
+
+
 class BehaviorSourceSingleton(metaclass=Singleton):
     """
     takes raw Category & Behavior data from yaml files
@@ -396,6 +627,11 @@ class BehaviorSourceSingleton(metaclass=Singleton):
             masterDict   dict( key=code, value=BehCatNode)
             topLevelCategoryCodes  list(string)
             graph   dict as tree of codes
+
+    all of these (and every derived list/msg/index) live on one immutable
+    TaxonomyView (see taxonomy_view.py) that is swapped as a single reference
+    read methods grab self._view ONCE so they never mix two taxonomies
+    reload() / startWatcher() swap in a new view when the yaml changes
     """
 
     def __init__(
@@ -409,66 +645,161 @@ class BehaviorSourceSingleton(metaclass=Singleton):
 
         NOTE: hidden behaviors may be a problem for showing parent category on Behavior stats
         """
-        catPath: str = OsPathInfo().get_path_rel_proj_root("static/data/category.yaml")
-        behPath: str = OsPathInfo().get_path_rel_proj_root("static/data/behaviors.yaml")
-
         if self.init_completed:
             return
 
-        categoriesDict: dict[str, BehCatNode] = dict()
-        # forRowInYaml returns a list which we can ignore here
-        forRowInYaml(
-            catPath,
-            makePerRowFunc(True, categoriesDict),
-        )
-        behaviorsDict: dict[str, BehCatNode] = dict()  # behavior
-        forRowInYaml(
-            behPath,
-            makePerRowFunc(False, behaviorsDict),
+        self._catPath: str = OsPathInfo().get_path_rel_proj_root(CATEGORY_YAML_REL_PATH)
+        self._behPath: str = OsPathInfo().get_path_rel_proj_root(BEHAVIOR_YAML_REL_PATH)
+        # serializes reloads (writers only);  readers never take it
+        self._reloadLock = threading.Lock()
+        self._reloadListeners: List[Callable[[TaxonomyView], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stopWatching = threading.Event()
+
+        self._view: TaxonomyView = buildTaxonomyView(
+            *self._loadTaxonomy(self._catPath, self._behPath),
+            generation=1,
+            sourceHash=yamlSourceHash(self._catPath, self._behPath),
         )
 
-        # walk thru every behavior in behaviorsDict
-        # update the beh.keywords as a unique, lowercase string of search words
-        inheritCategoryDescripToBehKeywords(behaviorsDict, categoriesDict)
+    @staticmethod
+    def _loadTaxonomy(catPath: str, behPath: str) -> TaxonomyTuple:
+        # prefer the precompiled snapshot (see snapshot.py) when it matches the yaml
+        snapPath: str = OsPathInfo().get_path_rel_proj_root(SNAPSHOT_REL_PATH)
+        taxonomy = loadSnapshotIfCurrent(snapPath, catPath, behPath)
+        if taxonomy is None:
+            taxonomy = loadTaxonomyFromYaml(catPath, behPath)
+        return taxonomy
 
-        self.masterDict = categoriesDict
-        self.masterDict.update(behaviorsDict)
+    @property
+    def generation(self: BehaviorSourceSingleton) -> int:
+        # starts at 1;  +1 on every successful reload
+        return self._view.generation
 
-        # figure out the root of hierarchy
-        self.topLevelCategoryCodes = getCategoryListSorted(
-            categoriesDict, lambda cat: cat.parentCode in ("", "root")
-        )
-        assert (
-            len(self.topLevelCategoryCodes) > 3
-        ), "top level categories missing (%s found)" % (len(self.topLevelCategoryCodes))
-
-        self.graph: List[Tuple[str, List[str]]] = self.buildSortedGraph(categoriesDict)
-        # NOTE:  Show all and Feelings are not getting augmentation from buildSortedGraph
-        self.appendShowAllCategories()
-
-        # feelingOnlyCodes are now in YAML .. no need to add them here
-        # self.appendFeelingOnlyCodes()
-        print(
-            "master:{0}  beh:{1}  graph(cats/subcats):{2}".format(
-                len(self.masterDict), len(behaviorsDict), len(self.graph)
+    def reload(
+        self: BehaviorSourceSingleton,
+        catPath: Optional[str] = None,
+        behPath: Optional[str] = None,
+        force: bool = False,
+    ) -> bool:
+        """rebuild the taxonomy (from new yaml paths if passed) & swap it in
+        the new view is built completely before the swap;  readers keep
+        whichever view they already hold and never wait
+        returns False (nothing swapped) when the yaml content is unchanged
+        a bad yaml raises and leaves the current view in place
+        """
+        with self._reloadLock:
+            catPath = catPath or self._catPath
+            behPath = behPath or self._behPath
+            srcHash = yamlSourceHash(catPath, behPath)
+            oldView = self._view
+            samePaths = (catPath, behPath) == (self._catPath, self._behPath)
+            if not force and samePaths and srcHash == oldView.sourceHash:
+                return False
+
+            newView = buildTaxonomyView(
+                *self._loadTaxonomy(catPath, behPath),
+                generation=oldView.generation + 1,
+                sourceHash=srcHash,
+            )
+            self._catPath, self._behPath = catPath, behPath
+            self._view = newView
+            logging.info(
+                "behavior taxonomy reloaded:  generation {0}  ({1} nodes)".format(
+                    newView.generation, len(newView.masterDict)
+                )
             )
+            # still under the lock so listeners see generations in order
+            for callback in self._reloadListeners:
+                try:
+                    callback(newView)
+                except Exception:
+                    logging.exception(
+                        "behavior reload listener {0} failed".format(callback)
+                    )
+        return True
+
+    def addReloadListener(
+        self: BehaviorSourceSingleton, callback: Callable[[TaxonomyView], None]
+    ) -> None:
+        """callback(newView) runs after every successful reload
+        use it to drop caches derived from the taxonomy
+        """
+        with self._reloadLock:
+            if callback not in self._reloadListeners:
+                self._reloadListeners.append(callback)
+
+    def startWatcher(
+        self: BehaviorSourceSingleton, pollSecs: float = HOT_RELOAD_POLL_SECS
+    ) -> None:
+        """poll the yaml mtimes on a daemon thread & reload when they change
+        (reload itself skips the swap if the content hash is unchanged)
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stopWatching.clear()
+        self._watcher = threading.Thread(
+            target=self._watchYaml,
+            args=(pollSecs,),
+            name="behaviorYamlWatcher",
+            daemon=True,
         )
+        self._watcher.start()
+
+    def stopWatcher(self: BehaviorSourceSingleton) -> None:
+        self._stopWatching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watchYaml(self: BehaviorSourceSingleton, pollSecs: float) -> None:
+        lastStamp = self._yamlMtimes()
+        while not self._stopWatching.wait(pollSecs):
+            stamp = self._yamlMtimes()
+            if stamp == lastStamp:
+                continue
+            lastStamp = stamp
+            try:
+                self.reload()
+            except Exception:
+                # half-edited file etc;  keep serving the current view
+                logging.exception(
+                    "behavior yaml reload failed;  still on generation {0}".format(
+                        self.generation
+                    )
+                )
 
-        # values to build & cache when requested
-        self._behaviorListMsg = None  # full list
-        self._orderedBehByCat = None  # dict of question under top level category
-        self._negCatCodesWithNames = None  # list of tuples (catCode, catName)
-        self._posCatCodesWithNames = None
-        self._countsByCategory = None  # of beh/questions per category
+    def _yamlMtimes(self: BehaviorSourceSingleton) -> Optional[Tuple[int, int]]:
+        try:
+            return (
+                os.stat(self._catPath).st_mtime_ns,
+                os.stat(self._behPath).st_mtime_ns,
+            )
+        except OSError:
+            return None
+
+    @property
+    def masterDict(self: BehaviorSourceSingleton) -> Mapping[str, BehCatNode]:
+        # read only mapping
+        return self._view.masterDict
+
+    @property
+    def topLevelCategoryCodes(self: BehaviorSourceSingleton) -> Tuple[str, ...]:
+        return self._view.topLevelCategoryCodes
+
+    @property
+    def graph(self: BehaviorSourceSingleton) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+        return self._view.graph
 
     def getBehAsDict(self: BehaviorSourceSingleton, code: str) -> Dict[str, Any]:
         """return a dict to describe behavior atts
         for community news meta
         """
-        bcn = self.masterDict.get(code, None)
+        md = self._view.masterDict
+        bcn = md.get(code, None)
         if bcn is not None:
             bcnAsDict = bcn.asDict
-            catRec = self.masterDict.get(bcn.topCategoryCode, None)
+            catRec = md.get(bcn.topCategoryCode, None)
             if catRec is not None:
                 bcnAsDict["catName"] = catRec.text
             else:
@@ -480,7 +811,7 @@ class BehaviorSourceSingleton(metaclass=Singleton):
 
     def catAndSubForCode(self: BehaviorSourceSingleton, code: str) -> tuple[str, str]:
         # use beh code to determine cat & subCat codes
-        bcn = self.masterDict.get(code, None)
+        bcn = self._view.masterDict.get(code, None)
         if bcn is not None:
             return (bcn.topCategoryCode, bcn.parentCode)
         else:
@@ -492,177 +823,77 @@ class BehaviorSourceSingleton(metaclass=Singleton):
         pass None to get both +-
         """
         codes = []
-        for beh in self.masterDict.values():
+        for beh in self._view.masterDict.values():
             if beh.isCategory:
                 continue  # skip cat & subcat recs
             if pos is None or beh.positive == pos:
                 codes.append(beh.code)
         return codes
 
-    def buildSortedGraph(
-        self: BehaviorSourceSingleton, categoriesDict: dict[str, BehCatNode]
-    ) -> list[Tuple[str, list[str]]]:
-        # every behavior or subCat has a parent
-        # we need a sorted list of every parent's child  codes
-        # tempGraphDict first contains tuples & then converted to strings after sorting
-        parentToChildrenDict: Dict[str, List[Tuple[str, int]]] = dict()
-        beh: BehCatNode = None
-        for cd, beh in self.masterDict.items():
-            # only need to process subCats & behaviors (parentCode filters out topLevelCats)
-            if beh.parentCode not in ("", "root"):
-                lstForTier2: List[Tuple[str, int]] = parentToChildrenDict.setdefault(
-                    beh.parentCode, []
-                )
-                lstForTier2.append((cd, beh.sort))
-
-                if (
-                    not beh.isCategory
-                ):  # skip subcats; DO NOT REMOVE THIS  (see "OR" above)
-                    # copy super-parent code & descrip to the behavior
-                    beh.inheritParentVals(self.masterDict)
-
-                # # also make sure same behavior added to alt-categories
-                # # 190104 -> we eliminated altCategories
-                # for cat in beh.altCategories:
-                #     # sort #s typically skip 5 digits
-                #     # there are never more than 16 items in a subcat list
-                #     # 5 x 16 = 80
-                #     # add 80 so alt-cats always sort at bottom of list in relative order
-                #     tempGraphDict.setdefault(cat, []).append((cd, beh.sort + 80))
-
-        # tempGraphDict.keys() contains every category pointed at by a Behavior or subcat
-        # if we subtract the TOTAL (bigger) list of category keys, we should get EMPTY set
-        # some behaviors are hidden (only found by searching) & have no parent
-        # allowed to have 1 (hidden) as a left over category code
-        leftoverKeys = set(parentToChildrenDict.keys()) - set(categoriesDict.keys())
-        if len(leftoverKeys) > 1:
-            print("Warn:  left over category codes: {0}".format(leftoverKeys))
-
-        # now sort all sublists & build final graph
-        # graph is a list of tuples where t.0 == catOrSubCatCode & t.1 == [behCodes]
-        graph: List[Tuple[str, List[str]]] = []
-        for catCode, lstOfCodeSortTup in parentToChildrenDict.items():
-            behCodeOnlyList: list[str] = self.removeDupChildCodesThenSort(
-                lstOfCodeSortTup
-            )
-            # NOTE:  not updating tempGraphDict
-            graph.append((catCode, behCodeOnlyList))
-        return graph
-
-    def removeDupChildCodesThenSort(
-        self: BehaviorSourceSingleton, lstOfCodeSortTup: List[str]
-    ) -> list[str]:
-        newList: list[Tuple[str, int]] = []
-        seenList: list[str] = []
-        for tup in lstOfCodeSortTup:
-            if tup[0] not in seenList:
-                newList.append(tup)
-                seenList.append(tup[0])
-
-        return map(lambda x: x[0], sorted(newList, key=lambda x: x[1]))
-
-    def appendShowAllCategories(self: BehaviorSourceSingleton) -> None:
-        """
-        puts showAll (children searchable) on both the pos & neg top level categories
-        Returns: none
-        """
-        posCode = SHOWALL_CODE_PREFIX + "Pos"
-        negCode = SHOWALL_CODE_PREFIX + "Neg"
-
-        self.topLevelCategoryCodes.insert(0, posCode)  # at top of category list
-        self.topLevelCategoryCodes.insert(0, negCode)
-
-        # find all pos & neg behaviors
-        posChildren = [
-            cd for cd, v in self.masterDict.items() if v.positive and not v.isCategory
-        ]
-        negChildren = [
-            cd
-            for cd, v in self.masterDict.items()
-            if not v.positive and not v.isCategory
-        ]
-
-        self.graph.append((posCode, posChildren))
-        self.graph.append((negCode, negChildren))
-
-        showAllPositiveCat = BehCatNode.make(
-            True, posCode, SHOWALL_CAT_LABEL + " Positive", "", True, negCode
-        )
-        showAllPositiveCat.childrenSearchable = True
-
-        showAllNegativeCat = BehCatNode.make(
-            True, negCode, SHOWALL_CAT_LABEL + " Negative", "", False, posCode
-        )
-        showAllNegativeCat.childrenSearchable = True
+    def bcnFromCode(self: BehaviorSourceSingleton, code: str) -> BehCatNode:
+        return self._view.masterDict.get(code)
 
-        self.masterDict[posCode] = showAllPositiveCat
-        self.masterDict[negCode] = showAllNegativeCat
+    def keywordsFor(self: BehaviorSourceSingleton, code: str) -> str:
+        # search words for a node ("" if unknown)
+        return self._view.keywordIndex.keywordsFor(code)
 
-    def bcnFromCode(self: BehaviorSourceSingleton, code: str) -> BehCatNode:
-        return self.masterDict.get(code)
+    @property
+    def columns(self: BehaviorSourceSingleton) -> TaxonomyColumns:
+        # ids & numpy attribute arrays;  see columnar.py
+        return self._view.columns
+
+    def lookupMany(
+        self: BehaviorSourceSingleton, codes: Iterable[str]
+    ) -> list[Optional[BehCatNode]]:
+        # bcnFromCode for a batch (None where unknown)
+        return self._view.columns.lookupMany(codes)
+
+    def impactsFor(
+        self: BehaviorSourceSingleton, codes: Iterable[str], default: float = 0.0
+    ) -> np.ndarray:
+        # float64 array of bcn.impact aligned with codes
+        return self._view.columns.impactsFor(codes, default)
+
+    def searchByKeyword(
+        self: BehaviorSourceSingleton,
+        query: str,
+        limit: int = 20,
+        positive: bool = None,
+    ) -> list[BehCatNode]:
+        """ranked behaviors matching query words (or word prefixes)
+        positive=None searches both pos & neg behaviors
+        """
+        view = self._view
+        md = view.masterDict
+        return [md[cd] for cd, _ in view.keywordIndex.search(query, limit, positive)]
 
     def catNameFromCode(self: BehaviorSourceSingleton, code: str) -> str:
-        catBcn = self.masterDict.get(code)
+        catBcn = self._view.masterDict.get(code)
         if catBcn is not None:
             return catBcn.text
         return "_notFnd_{0}".format(code)
 
     @property
-    def countsByCategory(self: BehaviorSourceSingleton) -> Dict[str, int]:
-        # return dict of beh quest counts by top level category
-        if self._countsByCategory is None:
-            self._countsByCategory = self._makeCategoryCountDict()
-        return self._countsByCategory
-
-    def _makeCategoryCountDict(self: BehaviorSourceSingleton) -> Dict[str, int]:
-        d: Dict[str, int] = dict()
-        for bcn in self.masterDict.values():
-            if bcn.isCategory or bcn.positive:
-                continue  # only count negative questions
-            cnt = d.setdefault(bcn.topCategoryCode, 0)
-            d[bcn.topCategoryCode] = cnt + 1
-        return d
+    def countsByCategory(self: BehaviorSourceSingleton) -> Mapping[str, int]:
+        # return (read only) dict of beh quest counts by top level category
+        return self._view.countsByCategory
 
     @property
     def behaviorListMsg(self: BehaviorSourceSingleton) -> FullBehaviorListMsg:
-        # serves all
-        if self._behaviorListMsg is None:
-            self._behaviorListMsg = self._toMsg()
-        # if False:
-        #     fst: NodeListMsg = self._behaviorListMsg.graph[4]
-        #     ch: List[str] = fst.children
-        #     print("first NodeLst is {0} w {1} children".format(fst.code, "below"))
-
-        return self._behaviorListMsg
-
-    def _toMsg(self) -> FullBehaviorListMsg:
-        # remember to remove feelings from list
-        # from common.messages.behavior import FullBehaviorListMsg, NodeListMsg
-        # raise Exception
-
-        mastLst = [
-            b.toMsg()
-            for b in self.masterDict.values()
-            if not b.code.startswith("feelingReport")
-        ]
-        # nodeList = [NodeListMsg(code=tup[0], children=tup[1]) for tup in self.graph]
-        nodeList: List[NodeListMsg] = []
-        for tup in self.graph:
-            lstChildCodes: List[str] = [cd for cd in tup[1]]
-            nodeList.append(NodeListMsg(code=tup[0], children=lstChildCodes))
-            # print("{0} == {1}".format(tup[0], lstChildCodes))
-        fbl = FullBehaviorListMsg(
-            topCategoryCodes=self.topLevelCategoryCodes,
-            graph=nodeList,
-            masterList=mastLst,
-        )
-        return fbl
+        # serves all;  built with the view, never on the request path
+        return self._view.behaviorListMsg
+
+    @property
+    def behaviorListPayload(self: BehaviorSourceSingleton) -> RenderedPayload:
+        # behaviorListMsg pre-rendered (json, gzip, br) with an ETag
+        # serve via rendered_payload.flaskResponse (handles If-None-Match)
+        return self._view.behaviorListPayload
 
     def findTopCategory(
         self: BehaviorSourceSingleton, behaviorCode: str, isPositive: bool
     ) -> str:
         # set topCategoryCode on each behavior when it is stored
-        bcn = self.masterDict.get(behaviorCode)
+        bcn = self._view.masterDict.get(behaviorCode)
         if bcn:
             return bcn.topCategoryCode
         else:
@@ -670,7 +901,7 @@ class BehaviorSourceSingleton(metaclass=Singleton):
 
     # to support the Score calcs below:
     def isPositiveByCode(self: BehaviorSourceSingleton, code: str) -> bool:
-        bcn = self.masterDict.get(code)
+        bcn = self._view.masterDict.get(code)
         if bcn == None:
             logging.error("behavior code {0} not found in master dict".format(code))
             return False
@@ -692,25 +923,28 @@ class BehaviorSourceSingleton(metaclass=Singleton):
             return len(filteredBehaviors)
 
         # exclude feeling only reports by both of those codes
-        # check remainder for pos/neg
-        tot = sum(
-            (
-                1
-                if b.behaviorCode not in (FEELING_ONLY_CODE_POS, FEELING_ONLY_CODE_NEG)
-                and self.isPositiveByCode(b.behaviorCode) == countPositive
-                else 0
-            )
+        # check remainder for pos/neg (one batch lookup for all entries)
+        codes = [
+            b.behaviorCode
             for b in filteredBehaviors
-        )
-        return tot
+            if b.behaviorCode not in (FEELING_ONLY_CODE_POS, FEELING_ONLY_CODE_NEG)
+        ]
+        cols = self._view.columns
+        ids = cols.idsFor(codes)
+        for missingIdx in np.flatnonzero(ids < 0):
+            logging.error(
+                "behavior code {0} not found in master dict".format(codes[missingIdx])
+            )
+        # unknown codes count as negative (same as isPositiveByCode)
+        positive = cols.positive[ids] & (ids >= 0)
+        return int(np.count_nonzero(positive == countPositive))
 
-    def categoryCodesWithNames(self: BehaviorSourceSingleton, neg: bool = True):
-        # return sorted list of tuples (catCode, catText) (Negative cats only)
-        if neg and self._negCatCodesWithNames is None:
-            self._negCatCodesWithNames = self._buildCatCodeAndNameList(False)
-        elif not neg and self._posCatCodesWithNames is None:
-            self._posCatCodesWithNames = self._buildCatCodeAndNameList(True)
-        return self._negCatCodesWithNames if neg else self._posCatCodesWithNames
+    def categoryCodesWithNames(
+        self: BehaviorSourceSingleton, neg: bool = True
+    ) -> Tuple[CatCodeWithName, ...]:
+        # return sorted tuples (catCode, catText, iconName, isPositive) (Negative cats by default)
+        view = self._view
+        return view.negCatCodesWithNames if neg else view.posCatCodesWithNames
 
     def getXBehaviorsForCatAfter(
         self: BehaviorSourceSingleton,
@@ -727,98 +961,41 @@ class BehaviorSourceSingleton(metaclass=Singleton):
         if count < 1:
             return []
 
-        if self._orderedBehByCat is None:
-            self._orderedBehByCat = dict()
-
-        bcnLst = self._orderedBehByCat.setdefault(categoryCode, [])
+        # list & positions must come from the same view
+        view = self._view
+        bcnLst: Tuple[BehCatNode, ...] = view.orderedBehByCat.get(categoryCode, ())
         if len(bcnLst) < 1:
-            bcnLst = self._buildBehListByCat(categoryCode)
-            self._orderedBehByCat[categoryCode] = bcnLst
-            if len(bcnLst) < 1:
-                print("serious error")
-                return []
-
-        idxAfterStarting = BehaviorSourceSingleton._indexPastLastEntry(
-            bcnLst, startingAfter
+            print("serious error")
+            return []
+
+        # unknown/empty startingAfter means start at the top of the list
+        idxAfterStarting = (
+            view.behPositionByCat[categoryCode].get(startingAfter, -1) + 1
         )
         if startingAfter == "_testMode" and idxAfterStarting + count > len(bcnLst) - 1:
             # in test mode, we need a predictable # of recs back
             idxAfterStarting = len(bcnLst) - (count + 1)
-        return bcnLst[idxAfterStarting : idxAfterStarting + count]
-
-    @staticmethod
-    def _indexPastLastEntry(bcnLst: list[BehCatNode], startingAfter: str) -> int:
-        # find the bcn rec in list & return idx 1 past there
-        idx = 0
-        for i, b in enumerate(bcnLst):
-            if b.code == startingAfter:
-                idx = i + 1
-                break
-        return idx
-
-    def _buildBehListByCat(
-        self: BehaviorSourceSingleton, categoryCode: str
-    ) -> list[BehCatNode]:
-        # return sorted list of behavior recs
-        # unify into one sorted list
-        behaveList = [
-            rec
-            for rec in self.masterDict.values()
-            if rec.topCategoryCode == categoryCode and not rec.isCategory
-        ]
-        # behaveList = sorted(behaveList, key = lambda r: r.sort)
-        return sorted(behaveList, key=lambda r: r.sort)
-
-    def _buildCatCodeAndNameList(
-        self: BehaviorSourceSingleton, pos: bool = False
-    ) -> list[Tuple[str, str, str, bool]]:
-        # master list of tuples containing top level category (code, name, icon, pos)
-        # using specified sort order
-        md = self.masterDict
-        lstTups = []
-        for cd in self.topLevelCategoryCodes:
-            rec = md.get(cd)
-            if (
-                rec is not None
-                and rec.positive == pos
-                and not rec.code.startswith(SHOWALL_CODE_PREFIX)
-            ):
-                lstTups.append((cd, rec.text.upper(), rec.iconName, rec.positive))
-
-        # sortFunc = lambda cd: md.get(cd).sort
-        # return sorted(lstTups, key=sortFunc)
-        return lstTups  # should already be sorted
+        return list(bcnLst[idxAfterStarting : idxAfterStarting + count])
 
     def getRandomBcns(
-        self: BehaviorSourceSingleton, count: int, pos: bool = False
+        self: BehaviorSourceSingleton,
+        count: int,
+        pos: bool = False,
+        seed: Optional[int] = None,
+        byCategory: bool = False,
+        weightByImpact: bool = False,
     ) -> list[BehCatNode]:
-        # Type: int, bool -> [BehCatNode]
-        lstBcn = []
-        consumedPositions = set()  # confirms all beh recs are unique
-        allBehCodes = [
-            cd
-            for cd, v in self.masterDict.items()
-            if not v.isCategory and v.positive == pos
-        ]
-        for i in range(count):
-            bcn, selectedIdx = self._getRandBcnRec(allBehCodes, consumedPositions)
-            consumedPositions.add(selectedIdx)
-            lstBcn.append(bcn)
-        return lstBcn
-
-    def _getRandBcnRec(
-        self: BehaviorSourceSingleton, allBehCodes: list[str], excludedIdxs: list[int]
-    ) -> Tuple[BehCatNode, int]:
-        # assert False, "length of Graph: {0}".format(len(self.graph))
-        rowIdx = random.randint(0, len(allBehCodes) - 1)
-        bcnCode = allBehCodes[rowIdx]
-        bcn = self.masterDict.get(bcnCode)
-        while rowIdx in excludedIdxs or bcn is None:
-            # next lines are dups from above
-            rowIdx = random.randint(0, len(allBehCodes) - 1)
-            bcnCode = allBehCodes[rowIdx]
-            bcn = self.masterDict.get(bcnCode)
-        return bcn, rowIdx
+        """count unique random behaviors (fewer if not that many exist)
+        seed:  repeatable picks
+        byCategory:  spread picks over top categories in proportion to their size
+        weightByImpact:  favor behaviors with larger abs(impact)
+        """
+        view = self._view
+        pool = view.posSamplePool if pos else view.negSamplePool
+        rng = random.Random(seed) if seed is not None else None
+        codes = sampleCodes(pool, count, rng, byCategory, weightByImpact)
+        md = view.masterDict
+        return [md[cd] for cd in codes]
 
 
 class BcnEncoder(json.JSONEncoder):
@@ -0,0 +1,207 @@
+"""
+pre-rendered FullBehaviorListMsg response body
+
+the full behavior list is large & identical for every user
+so instead of a marshmallow dump + json encode (+ compress) per request
+each TaxonomyView renders it ONCE into:
+    identity json bytes, gzip bytes, brotli bytes (if brotli is installed)
+    a strong ETag per encoding from the sha256 of the json:
+        "<hash>" (identity), "<hash>-gz", "<hash>-br"
+
+endpoints then just pick a variant by Accept-Encoding
+and answer If-None-Match with a 304 (no body at all);  any variant of the
+current hash matches, so a client that switched encodings still gets a 304
+
+usage (flask):
+    return flaskResponse(BehaviorSourceSingleton().behaviorListPayload)
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, NamedTuple, Optional
+import json
+import gzip
+import hashlib
+
+try:
+    import brotli  # optional;  pip install brotli
+except ImportError:
+    brotli = None
+
+from ...api_data_classes.behavior import FullBehaviorListMsg
+
+JSON_CONTENT_TYPE = "application/json"
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+ENCODING_ETAG_SUFFIXES = {"gzip": "-gz", "br": "-br"}  # by Content-Encoding
+
+
+class RenderedPayload(NamedTuple):
+    """immutable;  built once per taxonomy generation"""
+
+    body: bytes  # utf-8 json
+    gzipBody: bytes
+    brotliBody: Optional[bytes]  # None when brotli is not installed
+    etag: str  # quoted (strong) etag of the identity body
+
+    def etagFor(self: RenderedPayload, encoding: Optional[str]) -> str:
+        # a strong etag must differ per encoded body
+        suffix = ENCODING_ETAG_SUFFIXES.get(encoding)
+        return self.etag if suffix is None else self.etag[:-1] + suffix + '"'
+
+    def bodyFor(
+        self: RenderedPayload, acceptEncoding: str = ""
+    ) -> Tuple[bytes, Optional[str]]:
+        # best variant the client accepts:  (body, Content-Encoding or None)
+        accepted = _acceptedEncodings(acceptEncoding)
+        if self.brotliBody is not None and "br" in accepted:
+            return self.brotliBody, "br"
+        if "gzip" in accepted:
+            return self.gzipBody, "gzip"
+        return self.body, None
+
+    def responseParts(
+        self: RenderedPayload, ifNoneMatch: str = "", acceptEncoding: str = ""
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """framework neutral (status, headers, body)
+        304 with an empty body when the client already has this etag
+        """
+        body, encoding = self.bodyFor(acceptEncoding)
+        headers: Dict[str, str] = {
+            "ETag": self.etagFor(encoding),
+            "Vary": "Accept-Encoding",
+        }
+        if etagMatches(ifNoneMatch, self.etag):
+            return 304, headers, b""
+
+        headers["Content-Type"] = JSON_CONTENT_TYPE
+        headers["Content-Length"] = str(len(body))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return 200, headers, body
+
+
+def renderBehaviorList(msg: FullBehaviorListMsg) -> RenderedPayload:
+    # same json the endpoints produced from FullBehaviorListMsg.Schema().dump
+    # sort_keys because marshmallow field order is not stable across processes
+    # and the ETag must match on every instance
+    asDict = FullBehaviorListMsg.Schema().dump(msg)
+    body: bytes = json.dumps(asDict, separators=(",", ":"), sort_keys=True).encode(
+        "utf-8"
+    )
+    return RenderedPayload(
+        body=body,
+        # mtime=0 keeps the gzip bytes identical across instances
+        gzipBody=gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        brotliBody=(
+            brotli.compress(body, quality=BROTLI_QUALITY)
+            if brotli is not None
+            else None
+        ),
+        etag='"{0}"'.format(hashlib.sha256(body).hexdigest()[:32]),
+    )
+
+
+def etagMatches(ifNoneMatch: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison:  W/ prefixes are ignored
+    # & so are the encoding suffixes (same json, any encoding)
+    if not ifNoneMatch:
+        return False
+    for candidate in ifNoneMatch.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if _etagHash(candidate) == _etagHash(etag):
+            return True
+    return False
+
+
+def _etagHash(etag: str) -> str:
+    # '"<hash>-gz"' -> '<hash>'
+    tag = etag.strip('"')
+    for suffix in ENCODING_ETAG_SUFFIXES.values():
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+
+def _acceptedEncodings(acceptEncoding: str) -> List[str]:
+    # codings the client allows (q=0 means refused)
+    accepted: List[str] = []
+    for part in acceptEncoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q=") and _qValue(params[2:]) <= 0:
+            continue
+        accepted.append(coding.strip())
+    return accepted
+
+
+def _qValue(raw: str) -> float:
+    try:
+        return float(raw)
+    except ValueError:
+        return 1.0
+
+
+def flaskResponse(payload: RenderedPayload):
+    # flask Response for the current request (304 or the best encoded body)
+    from flask import request, Response
+
+    status, headers, body = payload.responseParts(
+        request.headers.get("If-None-Match", ""),
+        request.headers.get("Accept-Encoding", ""),
+    )
+    return Response(body, status=status, headers=headers)
+
+
+def benchPayload(
+    msg: FullBehaviorListMsg, payload: RenderedPayload, rounds: int = 200
+) -> None:
+    # per request cost:  current (dump + json + gzip) vs pre-rendered lookup
+    from ...utils.bench import perCallMicros
+
+    def _perRequestMicros(func) -> float:
+        return perCallMicros(func, rounds)
+
+    schema = FullBehaviorListMsg.Schema()
+    dumpUs = _perRequestMicros(lambda: json.dumps(schema.dump(msg)).encode("utf-8"))
+    dumpGzUs = _perRequestMicros(
+        lambda: gzip.compress(json.dumps(schema.dump(msg)).encode("utf-8"))
+    )
+    preUs = _perRequestMicros(lambda: payload.responseParts("", "gzip, br"))
+    notModUs = _perRequestMicros(lambda: payload.responseParts(payload.etag, "gzip"))
+
+    # one etag per encoded body;  any of them gets a 304
+    etags = {payload.responseParts("", enc)[1]["ETag"] for enc in ("", "gzip", "br")}
+    assert len(etags) == (3 if payload.brotliBody is not None else 2), etags
+    for tag in etags:
+        assert payload.responseParts("W/" + tag, "gzip")[0] == 304
+    assert payload.responseParts('"stale-gz"', "gzip")[0] == 200
+
+    print(
+        "bytes:  json {0}   gzip {1}   br {2}".format(
+            len(payload.body),
+            len(payload.gzipBody),
+            len(payload.brotliBody) if payload.brotliBody is not None else "n/a",
+        )
+    )
+    print(
+        "per request:  dump+json {0:.0f}us   dump+json+gzip {1:.0f}us   "
+        "pre-rendered {2:.1f}us   304 {3:.1f}us".format(
+            dumpUs, dumpGzUs, preUs, notModUs
+        )
+    )
+
+
+if __name__ == "__main__":
+    from ...utils.bench import benchArgs
+
+    benchArgs()
+    from .load_yaml import BehaviorSourceSingleton
+
+    _bss = BehaviorSourceSingleton()
+    benchPayload(_bss.behaviorListMsg, _bss.behaviorListPayload)
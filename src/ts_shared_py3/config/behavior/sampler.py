@@ -0,0 +1,172 @@
+"""
+random behavior sampling for BehaviorSourceSingleton.getRandomBcns
+
+each TaxonomyView holds one SamplePool per polarity (built at load)
+so a call never rebuilds the candidate list and never rejection-samples:
+    uniform:    random.sample over the pool  O(k)
+    weighted:   Efraimidis-Spirakis keys (u ** (1/|impact|))  O(n log k)
+    byCategory: count split over top categories by size (largest remainder)
+                then sampled within each category
+
+count is clamped to the pool size;  pass a seed for repeatable picks
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, NamedTuple, Mapping, Sequence, TYPE_CHECKING
+from types import MappingProxyType
+import heapq
+import random
+
+if TYPE_CHECKING:
+    from .load_yaml import BehCatNode
+
+
+# used when the caller passes no (seeded) generator
+_sharedRng = random.Random()
+
+
+class SamplePool(NamedTuple):
+    """all non-category behaviors of one polarity;  read only"""
+
+    codes: Tuple[str, ...]  # sorted so seeded picks are repeatable
+    weights: Tuple[float, ...]  # abs(impact), aligned with codes
+    # topCategoryCode -> positions in codes
+    idxByCat: Mapping[str, Tuple[int, ...]]
+
+
+def buildSamplePool(masterDict: Mapping[str, BehCatNode], positive: bool) -> SamplePool:
+    bcns = sorted(
+        (b for b in masterDict.values() if not b.isCategory and b.positive == positive),
+        key=lambda b: b.code,
+    )
+    idxByCat: Dict[str, List[int]] = dict()
+    for i, bcn in enumerate(bcns):
+        idxByCat.setdefault(bcn.topCategoryCode, []).append(i)
+    return SamplePool(
+        codes=tuple(b.code for b in bcns),
+        weights=tuple(abs(float(b.impact)) for b in bcns),
+        idxByCat=MappingProxyType({cd: tuple(ix) for cd, ix in idxByCat.items()}),
+    )
+
+
+def sampleCodes(
+    pool: SamplePool,
+    count: int,
+    rng: random.Random = None,
+    byCategory: bool = False,
+    weightByImpact: bool = False,
+) -> List[str]:
+    """count unique behCodes (fewer if the pool is smaller)"""
+    rng = rng or _sharedRng
+    count = min(count, len(pool.codes))
+    if count < 1:
+        return []
+
+    if not byCategory:
+        picked = _pick(range(len(pool.codes)), count, pool.weights, rng, weightByImpact)
+    else:
+        catIdxs = list(pool.idxByCat.values())
+        picked = []
+        for idxs, quota in zip(catIdxs, _quotas([len(ix) for ix in catIdxs], count)):
+            if quota > 0:
+                picked.extend(_pick(idxs, quota, pool.weights, rng, weightByImpact))
+        rng.shuffle(picked)  # don't hand back results grouped by category
+    return [pool.codes[i] for i in picked]
+
+
+def _pick(
+    idxs: Sequence[int],
+    k: int,
+    weights: Tuple[float, ...],
+    rng: random.Random,
+    weightByImpact: bool,
+) -> List[int]:
+    if not weightByImpact:
+        return rng.sample(idxs, k)
+    # weighted sampling without replacement;  zero impact only fills leftover slots
+    rand = rng.random
+    return heapq.nlargest(
+        k,
+        idxs,
+        key=lambda i: rand() ** (1.0 / weights[i]) if weights[i] > 0 else -rand(),
+    )
+
+
+def _quotas(sizes: List[int], count: int) -> List[int]:
+    # split count over groups in proportion to size (largest remainder method)
+    total = sum(sizes)
+    exact = [count * s / total for s in sizes]
+    quotas = [int(e) for e in exact]
+    leftover = count - sum(quotas)
+    byRemainder = sorted(range(len(sizes)), key=lambda i: quotas[i] - exact[i])
+    for i in byRemainder[:leftover]:
+        quotas[i] += 1
+    return quotas
+
+
+def _rejectionSample(
+    masterDict: Mapping[str, BehCatNode], count: int, pos: bool
+) -> List[str]:
+    # old getRandomBcns approach;  kept for the benchmark (count must be <= pool)
+    allBehCodes = [
+        cd for cd, v in masterDict.items() if not v.isCategory and v.positive == pos
+    ]
+    picked: List[str] = []
+    consumed = set()
+    for _ in range(count):
+        rowIdx = random.randint(0, len(allBehCodes) - 1)
+        while rowIdx in consumed:
+            rowIdx = random.randint(0, len(allBehCodes) - 1)
+        consumed.add(rowIdx)
+        picked.append(allBehCodes[rowIdx])
+    return picked
+
+
+def benchSampler(
+    masterDict: Mapping[str, BehCatNode],
+    pool: SamplePool,
+    pos: bool,
+    rounds: int = 2000,
+) -> None:
+    # per call latency (small k & k == pool size) plus a uniformity check
+    from collections import Counter
+    from ...utils.bench import perCallMicros
+
+    def _perCallMicros(func) -> float:
+        return perCallMicros(func, rounds)
+
+    poolSize = len(pool.codes)
+    for k in (5, poolSize):
+        oldUs = _perCallMicros(lambda: _rejectionSample(masterDict, k, pos))
+        newUs = _perCallMicros(lambda: sampleCodes(pool, k))
+        wtUs = _perCallMicros(lambda: sampleCodes(pool, k, weightByImpact=True))
+        catUs = _perCallMicros(lambda: sampleCodes(pool, k, byCategory=True))
+        print(
+            "k={0:<4} rejection: {1:.1f}us   sample: {2:.1f}us   weighted: {3:.1f}us   "
+            "byCategory: {4:.1f}us".format(k, oldUs, newUs, wtUs, catUs)
+        )
+
+    draws = Counter()
+    for _ in range(rounds * 10):
+        draws.update(sampleCodes(pool, 3))
+    expected = rounds * 10 * 3 / poolSize
+    print(
+        "uniformity over {0} codes:  min {1:.2f}  max {2:.2f}  (x expected)".format(
+            poolSize,
+            min(draws.get(cd, 0) for cd in pool.codes) / expected,
+            max(draws.values()) / expected,
+        )
+    )
+    assert sampleCodes(pool, 5, random.Random(7)) == sampleCodes(
+        pool, 5, random.Random(7)
+    ), "seeded picks should repeat"
+
+
+if __name__ == "__main__":
+    from ...utils.bench import benchArgs
+
+    benchArgs()
+    from .load_yaml import BehaviorSourceSingleton
+
+    _view = BehaviorSourceSingleton()._view
+    benchSampler(_view.masterDict, _view.negSamplePool, False)
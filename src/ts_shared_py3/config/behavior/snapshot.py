@@ -0,0 +1,170 @@
+"""
+precompiled binary snapshot of the behavior taxonomy
+
+parsing category.yaml & behaviors.yaml (plus keyword inheritance & graph sort)
+dominates cold-start time on every new instance
+so at build time we compile the fully-resolved result
+    (masterDict, topLevelCategoryCodes, graph)
+into one pickled & checksummed file that load_yaml prefers at startup
+
+file layout:
+    MAGIC (8 bytes)
+    format version (uint16 big-endian)
+    sha256 of the source yaml (32 bytes)
+    sha256 of the payload (32 bytes)
+    payload (pickle)
+
+the snapshot is only used when its yaml hash matches the current yaml files
+anything else (missing, stale, corrupt, old format) falls back to yaml
+
+build it:
+    python -m ts_shared_py3.config.behavior.snapshot /path/to/proj_root
+    python -m ts_shared_py3.config.behavior.snapshot /path/to/proj_root --bench
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, Optional, Any
+import os
+import sys
+import pickle
+import struct
+import hashlib
+import logging
+
+SNAPSHOT_MAGIC = b"TSBEHSNP"
+# bump whenever BehCatNode fields or the payload shape change
+SNAPSHOT_FORMAT_VERSION = 3  # 3: BehCatNode uses __slots__
+
+_HEADER_FMT = ">8sH32s32s"
+_HEADER_SIZE = struct.calcsize(_HEADER_FMT)
+
+# (masterDict, topLevelCategoryCodes, graph)
+TaxonomyTuple = Tuple[Dict[str, Any], List[str], List[Tuple[str, List[str]]]]
+
+
+def yamlSourceHash(catPath: str, behPath: str) -> bytes:
+    """sha256 over both yaml files (and the format version)"""
+    h = hashlib.sha256()
+    h.update(struct.pack(">H", SNAPSHOT_FORMAT_VERSION))
+    for path in (catPath, behPath):
+        with open(path, "rb") as f:
+            h.update(f.read())
+        h.update(b"\0")  # keep file boundaries distinct
+    return h.digest()
+
+
+def writeSnapshot(snapPath: str, taxonomy: TaxonomyTuple, yamlHash: bytes) -> int:
+    """serialize taxonomy to snapPath;  returns bytes written"""
+    payload: bytes = pickle.dumps(tuple(taxonomy), protocol=pickle.HIGHEST_PROTOCOL)
+    header: bytes = struct.pack(
+        _HEADER_FMT,
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_FORMAT_VERSION,
+        yamlHash,
+        hashlib.sha256(payload).digest(),
+    )
+    # write then rename so a running instance never sees half a file
+    tmpPath = snapPath + ".tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmpPath, snapPath)
+    return len(header) + len(payload)
+
+
+def readSnapshot(snapPath: str, yamlHash: bytes) -> Optional[TaxonomyTuple]:
+    """return taxonomy tuple or None if snapshot is missing/stale/corrupt"""
+    try:
+        with open(snapPath, "rb") as f:
+            raw: bytes = f.read()
+    except OSError:
+        return None
+
+    if len(raw) < _HEADER_SIZE:
+        logging.warning("behavior snapshot {0} is truncated".format(snapPath))
+        return None
+
+    magic, version, srcHash, payloadHash = struct.unpack_from(_HEADER_FMT, raw, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+        logging.info("behavior snapshot {0} has old format".format(snapPath))
+        return None
+    if srcHash != yamlHash:
+        logging.info("behavior snapshot {0} is stale vs yaml".format(snapPath))
+        return None
+
+    payload = memoryview(raw)[_HEADER_SIZE:]
+    if hashlib.sha256(payload).digest() != payloadHash:
+        logging.warning("behavior snapshot {0} failed checksum".format(snapPath))
+        return None
+
+    # only ever load snapshots produced by our own build step (pickle is trusted here)
+    masterDict, topLevelCategoryCodes, graph = pickle.loads(payload)
+    return masterDict, topLevelCategoryCodes, graph
+
+
+def loadSnapshotIfCurrent(
+    snapPath: str, catPath: str, behPath: str
+) -> Optional[TaxonomyTuple]:
+    """used by BehaviorSourceSingleton at startup
+    never raises;  any problem means "use the yaml"
+    """
+    if not os.path.exists(snapPath):
+        return None
+    try:
+        return readSnapshot(snapPath, yamlSourceHash(catPath, behPath))
+    except Exception as e:
+        logging.warning("behavior snapshot {0} unusable: {1}".format(snapPath, e))
+        return None
+
+
+def compileSnapshot(catPath: str, behPath: str, snapPath: str) -> int:
+    """build step:  parse yaml the slow way & write the snapshot"""
+    from .load_yaml import loadTaxonomyFromYaml
+
+    taxonomy = loadTaxonomyFromYaml(catPath, behPath)
+    return writeSnapshot(snapPath, taxonomy, yamlSourceHash(catPath, behPath))
+
+
+def benchStartup(catPath: str, behPath: str, snapPath: str, rounds: int = 20) -> None:
+    """compare yaml vs snapshot cold-load time (same work __init__ does)"""
+    from .load_yaml import loadTaxonomyFromYaml
+    from ...utils.bench import bestMs
+
+    def _timeIt(func) -> float:
+        return bestMs(func, rounds) / 1000
+
+    _stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # loadTaxonomyFromYaml prints counts
+    try:
+        yamlSecs = _timeIt(lambda: loadTaxonomyFromYaml(catPath, behPath))
+    finally:
+        sys.stdout.close()
+        sys.stdout = _stdout
+    snapSecs = _timeIt(lambda: loadSnapshotIfCurrent(snapPath, catPath, behPath))
+    assert loadSnapshotIfCurrent(snapPath, catPath, behPath) is not None, "stale?"
+
+    print(
+        "yaml: {0:.2f}ms   snapshot: {1:.2f}ms   speedup: {2:.1f}x  (best of {3})".format(
+            yamlSecs * 1000, snapSecs * 1000, yamlSecs / snapSecs, rounds
+        )
+    )
+
+
+if __name__ == "__main__":
+    from ..env_vars import OsPathInfo
+    from ...utils.bench import benchArgs
+    from .beh_constants import (
+        CATEGORY_YAML_REL_PATH,
+        BEHAVIOR_YAML_REL_PATH,
+        SNAPSHOT_REL_PATH,
+    )
+
+    _args = benchArgs("[--bench]")
+    _catPath = OsPathInfo().get_path_rel_proj_root(CATEGORY_YAML_REL_PATH)
+    _behPath = OsPathInfo().get_path_rel_proj_root(BEHAVIOR_YAML_REL_PATH)
+    _snapPath = OsPathInfo().get_path_rel_proj_root(SNAPSHOT_REL_PATH)
+
+    byteCount = compileSnapshot(_catPath, _behPath, _snapPath)
+    print("wrote {0} ({1} bytes)".format(_snapPath, byteCount))
+    if "--bench" in _args:
+        benchStartup(_catPath, _behPath, _snapPath)
@@ -0,0 +1,227 @@
+"""
+load checks for the TaxonomyView swap in BehaviorSourceSingleton
+(kept out of taxonomy_view.py, which every request imports)
+    stressReadsDuringReload   read APIs from many threads while views swap
+    hotReloadCheck            the yaml watcher against temp copies of the yaml
+    benchNodeMemory           BehCatNode bytes vs the old layout & the RSS a
+                              fresh process adds by loading the taxonomy
+
+    python -m ts_shared_py3.config.behavior.taxonomy_loadtest <proj_root> [--hot-reload | --memory]
+"""
+
+from __future__ import annotations
+from typing import List
+
+
+def stressReadsDuringReload(readerThreads: int = 8, reloads: int = 20) -> int:
+    """hammer the singleton read APIs from many threads while views are swapped
+    returns (and prints) the # of failed reads;  should always be zero
+    """
+    import threading
+    import traceback
+    from .load_yaml import BehaviorSourceSingleton
+
+    bss = BehaviorSourceSingleton()
+    catCodes = [t[0] for t in bss.categoryCodesWithNames(True)]
+    catCodes += [t[0] for t in bss.categoryCodesWithNames(False)]
+    someCodes = list(bss.masterDict.keys())
+    failures: List[str] = []
+    stop = threading.Event()
+
+    def _reader(seed: int) -> None:
+        i = seed
+        try:
+            while not stop.is_set():
+                for catCode in catCodes:
+                    page = bss.getXBehaviorsForCatAfter(3, catCode)
+                    assert len(page) > 0, "empty page for " + catCode
+                    nextPage = bss.getXBehaviorsForCatAfter(3, catCode, page[-1].code)
+                    assert page[-1] not in nextPage, "paging restarted"
+                code = someCodes[i % len(someCodes)]
+                assert bss.bcnFromCode(code) is not None, "lost " + code
+                assert len(bss.behaviorListMsg.masterList) > 0
+                assert len(bss.categoryCodesWithNames()) > 0
+                assert len(bss.countsByCategory) > 0
+                bss.searchByKeyword("late", 5)
+                i += 1
+        except Exception:
+            failures.append(traceback.format_exc())
+
+    threads = [
+        threading.Thread(target=_reader, args=(n,), daemon=True)
+        for n in range(readerThreads)
+    ]
+    for t in threads:
+        t.start()
+    for _ in range(reloads):
+        bss.reload(force=True)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    for f in failures[:3]:
+        print(f)
+    print(
+        "{0} reader threads, {1} reloads:  {2} failures".format(
+            readerThreads, reloads, len(failures)
+        )
+    )
+    return len(failures)
+
+
+def hotReloadCheck(pollSecs: float = 0.05, timeoutSecs: float = 5.0) -> None:
+    """local check of the yaml watcher using temp copies of the yaml files
+    edits one behavior's text & waits for the watcher to swap it in
+    """
+    import os
+    import time
+    import shutil
+    import tempfile
+    import yaml
+    from .load_yaml import BehaviorSourceSingleton
+
+    bss = BehaviorSourceSingleton()
+    origCat, origBeh = bss._catPath, bss._behPath
+    seenGenerations: List[int] = []
+    bss.addReloadListener(lambda view: seenGenerations.append(view.generation))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        catPath = os.path.join(tmpDir, os.path.basename(origCat))
+        behPath = os.path.join(tmpDir, os.path.basename(origBeh))
+        shutil.copyfile(origCat, catPath)
+        shutil.copyfile(origBeh, behPath)
+
+        # same content, new paths:  still a reload (paths changed)
+        assert bss.reload(catPath, behPath), "reload from temp copies skipped"
+        assert not bss.reload(), "unchanged yaml should not swap"
+        startGen = bss.generation
+        bss.startWatcher(pollSecs)
+        try:
+            with open(behPath) as f:
+                rows = yaml.safe_load(f)
+            editedCode = rows[0]["code"]
+            rows[0]["text"] = "hot reloaded text"
+            with open(behPath, "w") as f:
+                yaml.safe_dump(rows, f)
+
+            deadline = time.monotonic() + timeoutSecs
+            while bss.generation == startGen and time.monotonic() < deadline:
+                time.sleep(pollSecs)
+            assert bss.generation == startGen + 1, "watcher never reloaded"
+            assert bss.bcnFromCode(editedCode).text == "hot reloaded text"
+
+            # a broken file must leave the current view in place
+            with open(behPath, "w") as f:
+                f.write("- code: [unclosed\n")
+            time.sleep(pollSecs * 10)
+            assert bss.generation == startGen + 1, "bad yaml replaced the view"
+        finally:
+            bss.stopWatcher()
+
+    bss.reload(origCat, origBeh)
+    print(
+        "hot reload ok:  listener saw generations {0}, now {1}".format(
+            seenGenerations, bss.generation
+        )
+    )
+
+
+def benchNodeMemory(projRoot: str) -> None:
+    """bytes held by the BehCatNodes of one view vs the old layout
+    (per-node __dict__, un-shared strings, keywords on every node)
+    & the RSS a fresh process adds by loading the taxonomy
+    """
+    import subprocess
+    import sys
+    import tracemalloc
+    from .load_yaml import BehaviorSourceSingleton, BehCatNode
+
+    class _DictNode(object):
+        pass
+
+    def _copyStr(val):
+        # a private copy, like yaml hands out per occurrence
+        return (val + ".")[:-1] if isinstance(val, str) else val
+
+    view = BehaviorSourceSingleton()._view
+    fieldNames = [
+        n for n in BehCatNode.__slots__ if n not in ("_keywords", "_keywordIndex")
+    ]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    legacy = []
+    for bcn in view.masterDict.values():
+        node = _DictNode()
+        for name in fieldNames:
+            setattr(node, name, _copyStr(getattr(bcn, name)))
+        node.keywords = view.keywordIndex.keywordsFor(bcn.code)
+        legacy.append(node)
+    legacyBytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del legacy
+
+    # current layout:  a copy of this view's nodes (strings & index shared)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = []
+    for bcn in view.masterDict.values():
+        node = BehCatNode()
+        for name in fieldNames:
+            setattr(node, name, getattr(bcn, name))
+        node.useKeywordIndex(view.keywordIndex)
+        nodes.append(node)
+    slottedBytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(
+        "{0} nodes:  dict layout {1:.1f}KB   slotted+interned {2:.1f}KB".format(
+            len(nodes), legacyBytes / 1024, slottedBytes / 1024
+        )
+    )
+
+    # whole load (nodes, index, payloads, columns ...) in a fresh process
+    rssBefore, rssAfter = subprocess.check_output(
+        [sys.executable, "-W", "ignore", "-c", _RSS_SCRIPT, projRoot],
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ).split()[-2:]
+    print(
+        "fresh process RSS:  {0:.1f}MB before load   {1:.1f}MB after   "
+        "(+{2:.1f}MB)".format(
+            int(rssBefore) / 1024,
+            int(rssAfter) / 1024,
+            (int(rssAfter) - int(rssBefore)) / 1024,
+        )
+    )
+
+
+# prints VmRSS (KB) before & after BehaviorSourceSingleton() loads
+_RSS_SCRIPT = """
+import sys
+from ts_shared_py3.config.env_vars import OsPathInfo
+from ts_shared_py3.config.behavior.load_yaml import BehaviorSourceSingleton
+
+def rssKb():
+    with open("/proc/self/status") as f:
+        return next(int(ln.split()[1]) for ln in f if ln.startswith("VmRSS:"))
+
+OsPathInfo().set_proj_root(sys.argv[1])
+before = rssKb()
+BehaviorSourceSingleton()
+print(before, rssKb())
+"""
+
+
+if __name__ == "__main__":
+    import sys
+    from ...utils.bench import benchArgs
+
+    _args = benchArgs("[--hot-reload | --memory]")
+    if "--hot-reload" in _args:
+        hotReloadCheck()
+        sys.exit(0)
+    if "--memory" in _args:
+        benchNodeMemory(sys.argv[1])
+        sys.exit(0)
+    sys.exit(1 if stressReadsDuringReload() else 0)
@@ -0,0 +1,161 @@
+"""
+immutable, fully-built read model for BehaviorSourceSingleton
+
+everything the singleton serves (lists, msgs, indexes) is derived here ONCE
+per (re)load and packed into a TaxonomyView (a NamedTuple)
+the singleton swaps its single view reference atomically, so:
+    read APIs grab one view and never see half of an old & half of a new taxonomy
+    nothing is built lazily (check-then-set) on the request path
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple, NamedTuple, Mapping, TYPE_CHECKING
+from types import MappingProxyType
+
+from ...api_data_classes.behavior import FullBehaviorListMsg, NodeListMsg
+from .beh_constants import SHOWALL_CODE_PREFIX
+from .keyword_index import KeywordIndex
+from .rendered_payload import RenderedPayload, renderBehaviorList
+from .sampler import SamplePool, buildSamplePool
+from .columnar import TaxonomyColumns
+
+if TYPE_CHECKING:
+    from .load_yaml import BehCatNode
+
+# (catCode, catName, iconName, isPositive)
+CatCodeWithName = Tuple[str, str, str, bool]
+
+
+class TaxonomyView(NamedTuple):
+    """read only;  never mutate anything reachable from here"""
+
+    masterDict: Mapping[str, BehCatNode]
+    topLevelCategoryCodes: Tuple[str, ...]
+    graph: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    keywordIndex: KeywordIndex
+    behaviorListMsg: FullBehaviorListMsg
+    # behaviorListMsg as ready-to-send json/gzip/brotli bytes + etag
+    behaviorListPayload: RenderedPayload
+    # paging index for getXBehaviorsForCatAfter
+    orderedBehByCat: Mapping[str, Tuple[BehCatNode, ...]]
+    behPositionByCat: Mapping[str, Mapping[str, int]]
+    negCatCodesWithNames: Tuple[CatCodeWithName, ...]
+    posCatCodesWithNames: Tuple[CatCodeWithName, ...]
+    # of neg beh/questions per top level category
+    countsByCategory: Mapping[str, int]
+    # code -> int id + numpy attribute arrays for batch lookups
+    columns: TaxonomyColumns
+    # candidates for getRandomBcns
+    posSamplePool: SamplePool
+    negSamplePool: SamplePool
+    # bumped on every reload;  lets dependent caches key on it
+    generation: int
+    # yamlSourceHash of the files this view was built from
+    sourceHash: bytes
+
+
+def buildTaxonomyView(
+    masterDict: Dict[str, BehCatNode],
+    topLevelCategoryCodes: List[str],
+    graph: List[Tuple[str, List[str]]],
+    generation: int = 1,
+    sourceHash: bytes = b"",
+) -> TaxonomyView:
+    """derive every cached structure up front (off the request path)"""
+    topCodes: Tuple[str, ...] = tuple(topLevelCategoryCodes)
+    frozenGraph = tuple((code, tuple(children)) for code, children in graph)
+    orderedByCat, positionByCat = _buildBehListsByCat(masterDict)
+    keywordIndex = KeywordIndex(masterDict)
+    behaviorListMsg = _toMsg(masterDict, topCodes, frozenGraph)
+    # from here on the index holds the only copy of the keywords
+    for bcn in masterDict.values():
+        bcn.useKeywordIndex(keywordIndex)
+
+    return TaxonomyView(
+        masterDict=MappingProxyType(dict(masterDict)),
+        topLevelCategoryCodes=topCodes,
+        graph=frozenGraph,
+        keywordIndex=keywordIndex,
+        behaviorListMsg=behaviorListMsg,
+        behaviorListPayload=renderBehaviorList(behaviorListMsg),
+        orderedBehByCat=MappingProxyType(orderedByCat),
+        behPositionByCat=MappingProxyType(
+            {cd: MappingProxyType(pos) for cd, pos in positionByCat.items()}
+        ),
+        negCatCodesWithNames=_buildCatCodeAndNameList(masterDict, topCodes, False),
+        posCatCodesWithNames=_buildCatCodeAndNameList(masterDict, topCodes, True),
+        countsByCategory=MappingProxyType(_makeCategoryCountDict(masterDict)),
+        columns=TaxonomyColumns(masterDict),
+        posSamplePool=buildSamplePool(masterDict, True),
+        negSamplePool=buildSamplePool(masterDict, False),
+        generation=generation,
+        sourceHash=sourceHash,
+    )
+
+
+def _buildBehListsByCat(
+    masterDict: Dict[str, BehCatNode],
+) -> Tuple[Dict[str, Tuple[BehCatNode, ...]], Dict[str, Dict[str, int]]]:
+    """for every top level category (pos & neg):
+        catCode -> behavior recs sorted by bcn.sort
+        catCode -> {behCode: position in that tuple}
+    so getXBehaviorsForCatAfter can resume paging in constant time
+    """
+    behListByCat: Dict[str, List[BehCatNode]] = dict()
+    for rec in masterDict.values():
+        if not rec.isCategory:
+            behListByCat.setdefault(rec.topCategoryCode, []).append(rec)
+
+    orderedByCat: Dict[str, Tuple[BehCatNode, ...]] = dict()
+    positionByCat: Dict[str, Dict[str, int]] = dict()
+    for catCode, behaveList in behListByCat.items():
+        ordered = tuple(sorted(behaveList, key=lambda r: r.sort))
+        orderedByCat[catCode] = ordered
+        positionByCat[catCode] = {b.code: i for i, b in enumerate(ordered)}
+    return orderedByCat, positionByCat
+
+
+def _buildCatCodeAndNameList(
+    masterDict: Dict[str, BehCatNode], topCodes: Tuple[str, ...], pos: bool = False
+) -> Tuple[CatCodeWithName, ...]:
+    # master list of tuples containing top level category (code, name, icon, pos)
+    # using specified sort order
+    lstTups = []
+    for cd in topCodes:
+        rec = masterDict.get(cd)
+        if (
+            rec is not None
+            and rec.positive == pos
+            and not rec.code.startswith(SHOWALL_CODE_PREFIX)
+        ):
+            lstTups.append((cd, rec.text.upper(), rec.iconName, rec.positive))
+    return tuple(lstTups)  # should already be sorted
+
+
+def _makeCategoryCountDict(masterDict: Dict[str, BehCatNode]) -> Dict[str, int]:
+    d: Dict[str, int] = dict()
+    for bcn in masterDict.values():
+        if bcn.isCategory or bcn.positive:
+            continue  # only count negative questions
+        cnt = d.setdefault(bcn.topCategoryCode, 0)
+        d[bcn.topCategoryCode] = cnt + 1
+    return d
+
+
+def _toMsg(
+    masterDict: Dict[str, BehCatNode],
+    topCodes: Tuple[str, ...],
+    graph: Tuple[Tuple[str, Tuple[str, ...]], ...],
+) -> FullBehaviorListMsg:
+    # remember to remove feelings from list
+    mastLst = [
+        b.toMsg() for b in masterDict.values() if not b.code.startswith("feelingReport")
+    ]
+    nodeList: List[NodeListMsg] = [
+        NodeListMsg(code=code, children=list(children)) for code, children in graph
+    ]
+    return FullBehaviorListMsg(
+        topCategoryCodes=list(topCodes),
+        graph=nodeList,
+        masterList=mastLst,
+    )
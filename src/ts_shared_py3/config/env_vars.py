@@ -121,6 +121,21 @@ class EnvVarVals(metaclass=Singleton):
     def REGION_ID(self: EnvVarVals) -> str:
         return os.environ.get("REGION_ID", "us-central1")
 
+    @property
+    def TASK_PAYLOAD_COMPRESS(self: EnvVarVals) -> bool:
+        # only once every task handler reads bodies with decodeTaskPayload
+        return os.environ.get("TASK_PAYLOAD_COMPRESS", "false") != "false"
+
+    @property
+    def TASK_PAYLOAD_SPILL(self: EnvVarVals) -> bool:
+        # only once every task handler reads bodies with decodeTaskPayload
+        return os.environ.get("TASK_PAYLOAD_SPILL", "false") != "false"
+
+    @property
+    def TASK_PAYLOAD_SPILL_BYTES(self: EnvVarVals) -> int:
+        # bodies over this go to BitBucket;  keep under the queue's task size cap
+        return int(os.environ.get("TASK_PAYLOAD_SPILL_BYTES", str(90 * 1024)))
+
     @property
     def HOST_URL(self: EnvVarVals) -> str:
         return os.environ.get("HOST_URL", "localhost")
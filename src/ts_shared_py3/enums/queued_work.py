@@ -41,6 +41,8 @@ class QueuedWorkTyp(AutoName):
     STATS_DAILY = auto()
     STATS_COMMITLEVEL = auto()
     STATS_DAILYFORGE = auto()
+    # rebuild the materialized BehaviorRollup aggregates
+    STATS_ROLLUPAGGREGATE = auto()
 
     # testing
     # Route('personscoresrecalc', handler='service_task.tracking_handlers.RescoreProspectsForUser', name='RescoreProspectsForUser'), = 1
@@ -110,6 +112,8 @@ class QueuedWorkTyp(AutoName):
             return "stats/daily"
         elif self is QueuedWorkTyp.STATS_COMMITLEVEL:
             return "stats/commitLevel"
+        elif self is QueuedWorkTyp.STATS_ROLLUPAGGREGATE:
+            return "stats/rollupAggregate"
 
         # test methods below
         elif self is QueuedWorkTyp.STATS_DAILYFORGE:
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Callable
+from typing import Callable, Dict, Iterable, Optional, Tuple
 from datetime import date
 from enum import IntEnum, unique
 from collections import namedtuple
@@ -23,6 +23,12 @@ MinPlusNotchForAppAndCommunity = namedtuple(
 
 StdCalcCallableSig = Callable[[float, float, list[float]], float]
 
+# min & notch math per rule type (see ScoreRuleType.minAndNotchForUserAndCommunity)
+_CALC_BEH_OR_FEELING = "behOrFeeling"  # 3 position slider
+_CALC_VAL_ASSESS = "valAssess"  # 4 position slider
+_CALC_INCIDENT = "incident"
+_CALC_COMMIT_CHANGE = "commitChange"  # n/a;  always 0.0
+
 
 @unique
 class ScoreRuleType(IntEnum):
@@ -73,92 +79,32 @@ class ScoreRuleType(IntEnum):
     # not sure why/when I need to do that??
     PRE_SCORED = 999
 
-    @property
-    def hasStaticCode(self: ScoreRuleType) -> bool:
-        return self in [
-            ScoreRuleType.INCIDENT,
-            ScoreRuleType.PROSPECT_STATUS_INCREASE,
-            ScoreRuleType.PROSPECT_STATUS_DECREASE,
-            ScoreRuleType.BREAKUP,
-        ]
-
-    @property
-    def staticIdCode(self: ScoreRuleType) -> str:
-        # simply to normalize recID values for locating recs in testing
-        if self == ScoreRuleType.INCIDENT:
-            return "cheatedOnMeWhenTempted"
-        else:
-            return "commitLevelChange"
-
-    @property
-    def isPositive(self: ScoreRuleType) -> bool:
-        return self in [
-            ScoreRuleType.BEHAVIOR_POSITIVE,
-            ScoreRuleType.FEELING_POSITIVE,
-            ScoreRuleType.PROSPECT_STATUS_INCREASE,
-        ]
-
-    @property
-    def usesBehaviorStruct(self: ScoreRuleType) -> bool:
-        # true if db model is Behavior or Feel Entry (pos or neg)
-        return 0 <= self.value <= 3
+    # per member attributes;  computed ONCE at import by _setMemberTraits below
+    # (these sit in the innermost scoring loops)
+    hasStaticCode: bool
+    staticIdCode: str
+    isPositive: bool
+    usesBehaviorStruct: bool
+    sliderRange: SliderRange
+    isValueAssesment: bool
+    isBehavior: bool
+    isFeeling: bool
+    isFeelingOrBehavior: bool
+    isCommitLevelChange: bool
+    isSevereNeg: bool
+    hasRippleEffect: bool
+    isRepeating: bool
+    hasEcho: bool
+    echoDistance: int
+    # min & notch math for minAndNotchForUserAndCommunity (None == n/a)
+    _minNotchCalc: Optional[str]
+    _allocType: Optional[AllocType]
 
     @property
     def allocWeightType(self: ScoreRuleType) -> AllocType:
-        if self.isBehavior:
-            return AllocType.BEHAVIOR
-        elif self.isFeeling:
-            return AllocType.FEELING
-        elif self.isValueAssesment:
-            return AllocType.ASSESS
-        elif self == ScoreRuleType.INCIDENT:
-            return AllocType.INCIDENT
-        elif self == ScoreRuleType.BREAKUP:
-            # breakup needs SPECIAL alloc type;  do not use isCommitLevelChange
-            return AllocType.BREAKUP
-        elif self in [
-            ScoreRuleType.PROSPECT_STATUS_INCREASE,
-            ScoreRuleType.PROSPECT_STATUS_DECREASE,
-        ]:
-            return AllocType.COMMITCHANGE
-        # elif self in [ScoreRuleType.COMMUNICATION_POSITIVE, ScoreRuleType.COMMUNICATION_NEGATIVE]:
-        #     return 1    # FIXME
-        elif self == ScoreRuleType.PRE_SCORED:
-            return AllocType.PRESCORE
-        else:
+        if self._allocType is None:
             raise ValueError
-
-    @property
-    def sliderRange(self: ScoreRuleType) -> SliderRange:
-        if self.isValueAssesment:
-            return SliderRange.FOUR
-        else:
-            return SliderRange.THREE
-
-    @property
-    def isValueAssesment(self: ScoreRuleType) -> bool:
-        return 10 <= self.value <= 13
-        # return self in VAL_ASSESS_TYPES
-
-    @property
-    def isBehavior(self: ScoreRuleType) -> bool:
-        return 0 <= self.value <= 1
-        # return self in [ScoreRuleType.BEHAVIOR_POSITIVE, ScoreRuleType.BEHAVIOR_NEGATIVE]
-
-    @property
-    def isFeeling(self: ScoreRuleType) -> bool:
-        return 2 <= self.value <= 3
-        # return self in [ScoreRuleType.FEELING_POSITIVE, ScoreRuleType.FEELING_NEGATIVE]
-
-    @property
-    def isFeelingOrBehavior(self: ScoreRuleType) -> bool:
-        return self.isFeeling or self.isBehavior
-
-    @property
-    def isCommitLevelChange(self: ScoreRuleType) -> bool:
-        # does NOT apply to allocWeights;  includes BREAKUP
-        return 40 <= self.value <= 41 or self.value == 20
-        # return self in [ScoreRuleType.PROSPECT_STATUS_INCREASE, ScoreRuleType.PROSPECT_STATUS_DECREASE, ScoreRuleType.BREAKUP]
+        return self._allocType
 
     def minAndNotchForUserAndCommunity(
         self: ScoreRuleType, staticAppImpact: float, stdCommunityHybrid: float
@@ -172,94 +118,34 @@ class ScoreRuleType(IntEnum):
 
         NOTCH should always have SAME SIGN as impact weight
         """
-        rp = IMPACT_WEIGHT_DECIMALS  # roundPrecision == 4
         # stdCommunityHybrid = (communityImpact * 0.700) + (staticAppImpact * 0.300)
-        communityImpact = stdCommunityHybrid
-
-        if self.isFeelingOrBehavior:
-            # based on 3 position slider
-            appNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
-                staticAppImpact, 3.0
-            )
-            appMin = staticAppImpact - appNotchSize
-            communityNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
-                communityImpact, 3.0
-            )
-            communityMin = stdCommunityHybrid - communityNotchSize
-            return MinPlusNotchForAppAndCommunity(
-                round(appMin, rp),
-                round(appNotchSize, rp),
-                round(communityMin, rp),
-                round(communityNotchSize, rp),
-            )
-
-        # elif self in [ScoreRuleType.FEELING_NEGATIVE, ScoreRuleType.FEELING_POSITIVE]:
-        #     return ScoreRuleType._behCalc()
-
-        elif self.isValueAssesment:
-            """based on 4 position slider
-            sliderFraction = 1.0 / float(self.sliderRange) == 0.25
-            note that userScore calc creates custom hybrid with user-concern-level
-
-            value assessment impact weights are almost always negative
-            but they CAN have positive vals when: "he never does this"
-            so assert test below is invalid
-
-            TODO: check math for +- below:
-            """
-            # assert appImpact <= 0 and communityImpact <= 0, "invalid valAssess weight A:{0}  C:{1}".format(appImpact, communityImpact)
-
-            appNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
-                staticAppImpact, 4.0
-            )
-            # 1.5 is CORRECT on a 4 slot slider
-            appMin = staticAppImpact - (1.5 * appNotchSize)
-            communityNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
-                stdCommunityHybrid, 4.0
-            )
-            communityMin = stdCommunityHybrid - (1.5 * communityNotchSize)
-            # print(
-            #     "Constructing MinPlusNotchAppPlusCommunity ValAss UM:{0}  UNS:{1}  AM:{2}  ANS:{3}  SAI:{4}  CI:{5}".format(
-            #         userMin,
-            #         userNotchSize,
-            #         appMin,
-            #         appNotchSize,
-            #         staticAppImpact,
-            #         communityImpact,
-            #     )
-            # )
-
-            return MinPlusNotchForAppAndCommunity(
-                round(appMin, rp),
-                round(appNotchSize, rp),
-                round(communityMin, rp),
-                round(communityNotchSize, rp),
-            )
-
-        elif self == ScoreRuleType.INCIDENT:
-            # using fraction of relationship length to bump up to max score of -1
+        calc = self._minNotchCalc
+        if calc is None:
+            return None
+        if calc == _CALC_INCIDENT:
             # notch & impact weights should have same sign
             assert (
-                staticAppImpact < -0.5 and communityImpact < -0.5
+                staticAppImpact < -0.5 and stdCommunityHybrid < -0.5
             ), "invalid incident impact weight {0}-{1}".format(
-                staticAppImpact, communityImpact
-            )
-
-            # subtracting a negative is same as adding
-            appNotchSize = -1 - staticAppImpact  # notch is delta up to max of -1
-
-            # app score user hybrid between the two
-            hybridNotchSize = -1 - stdCommunityHybrid
-            return MinPlusNotchForAppAndCommunity(
-                round(staticAppImpact, rp),
-                round(appNotchSize, rp),
-                round(stdCommunityHybrid, rp),
-                round(hybridNotchSize, rp),
+                staticAppImpact, stdCommunityHybrid
             )
+        # app & community halves use the same math;  see _minAndNotchFor
+        appMin, appNotch = _minAndNotchFor(calc, staticAppImpact)
+        communityMin, communityNotch = _minAndNotchFor(calc, stdCommunityHybrid)
+        return MinPlusNotchForAppAndCommunity(
+            appMin, appNotch, communityMin, communityNotch
+        )
 
-        elif self.isCommitLevelChange:
-            # min & notch is n/a for breakups & commitLevel changes
-            return MinPlusNotchForAppAndCommunity(0.0, 0.0, 0.0, 0.0)
+    @staticmethod
+    def precomputeMinAndNotch(impacts: Iterable[float]) -> None:
+        """fill the (calc, impact) -> (min, notch) cache for a known set of weights
+        (taxonomy app impacts & community hybrids)
+        """
+        for impact in impacts:
+            for calc in (_CALC_BEH_OR_FEELING, _CALC_VAL_ASSESS):
+                _minAndNotchFor(calc, float(impact))
+            if impact < -0.5:
+                _minAndNotchFor(_CALC_INCIDENT, float(impact))
 
     def appUserScoreFunc(self: ScoreRuleType) -> StdCalcCallableSig:
         """logic for this User (& most app) score calculations
@@ -454,58 +340,6 @@ class ScoreRuleType(IntEnum):
             elif self.hasEcho:
                 return magnification
 
-    @property
-    def isSevereNeg(self: ScoreRuleType) -> bool:
-        return self in [ScoreRuleType.BREAKUP, ScoreRuleType.INCIDENT]
-
-    # ripple related properties below
-    @property
-    def hasRippleEffect(self: ScoreRuleType) -> bool:
-        return self.isRepeating or self.hasEcho
-
-    @property
-    def isRepeating(self: ScoreRuleType) -> bool:
-        """e.g. repeating Prospect behavior
-        true if it affects scores indefinitely going forward
-            self in [ScoreRuleType.VAL_ASSESS_NEVER,
-                         ScoreRuleType.VAL_ASSESS_LITLE,
-                         ScoreRuleType.VAL_ASSESS_FREQUENT,
-                         ScoreRuleType.VAL_ASSESS_LOTS
-                    ]
-        """
-        return (
-            ScoreRuleType.VAL_ASSESS_LITTLE.value
-            <= self.value
-            <= ScoreRuleType.VAL_ASSESS_LOTS.value
-        )
-
-    @property
-    def hasEcho(self: ScoreRuleType) -> bool:
-        # true if it affects score BEYOND day in which it was recorded
-        return self in [
-            ScoreRuleType.BREAKUP,
-            ScoreRuleType.INCIDENT,
-            ScoreRuleType.PROSPECT_STATUS_INCREASE,
-            ScoreRuleType.PROSPECT_STATUS_DECREASE,
-        ]
-
-    @property
-    def echoDistance(self: ScoreRuleType) -> int:
-        """how many buckets / windows into the future should this affect score
-        TODO  make make another module for this???
-        """
-        if self.hasEcho:
-            return self._echoDist
-        else:
-            return 0
-
-    @property
-    def _echoDist(self: ScoreRuleType) -> int:
-        """TODO how many windows/buckets going fwd does this affect
-        should also specify rate of diminishing
-        """
-        return 4
-
     # all static methods
     @staticmethod
     def allIds() -> list[int]:
@@ -583,6 +417,285 @@ VAL_ASSESS_TYPES = [
 ]
 
 
+def _setMemberTraits() -> None:
+    """the old per-access properties, evaluated once per member"""
+    rt = ScoreRuleType
+    for srt in ScoreRuleType:
+        v = srt.value
+        srt.hasStaticCode = srt in (
+            rt.INCIDENT,
+            rt.PROSPECT_STATUS_INCREASE,
+            rt.PROSPECT_STATUS_DECREASE,
+            rt.BREAKUP,
+        )
+        # simply to normalize recID values for locating recs in testing
+        srt.staticIdCode = (
+            "cheatedOnMeWhenTempted" if srt == rt.INCIDENT else "commitLevelChange"
+        )
+        srt.isPositive = srt in (
+            rt.BEHAVIOR_POSITIVE,
+            rt.FEELING_POSITIVE,
+            rt.PROSPECT_STATUS_INCREASE,
+        )
+        # true if db model is Behavior or Feel Entry (pos or neg)
+        srt.usesBehaviorStruct = 0 <= v <= 3
+        srt.isValueAssesment = 10 <= v <= 13
+        srt.isBehavior = 0 <= v <= 1
+        srt.isFeeling = 2 <= v <= 3
+        srt.isFeelingOrBehavior = srt.isFeeling or srt.isBehavior
+        # does NOT apply to allocWeights;  includes BREAKUP
+        srt.isCommitLevelChange = 40 <= v <= 41 or v == 20
+        srt.sliderRange = (
+            SliderRange.FOUR if srt.isValueAssesment else SliderRange.THREE
+        )
+        srt.isSevereNeg = srt in (rt.BREAKUP, rt.INCIDENT)
+
+        # ripple related
+        # isRepeating:  e.g. repeating Prospect behavior
+        # true if it affects scores indefinitely going forward
+        srt.isRepeating = rt.VAL_ASSESS_LITTLE.value <= v <= rt.VAL_ASSESS_LOTS.value
+        # hasEcho:  true if it affects score BEYOND day in which it was recorded
+        srt.hasEcho = srt in (
+            rt.BREAKUP,
+            rt.INCIDENT,
+            rt.PROSPECT_STATUS_INCREASE,
+            rt.PROSPECT_STATUS_DECREASE,
+        )
+        srt.hasRippleEffect = srt.isRepeating or srt.hasEcho
+        # how many buckets / windows into the future should this affect score
+        # TODO: should also specify rate of diminishing
+        srt.echoDistance = 4 if srt.hasEcho else 0
+
+        if srt.isBehavior:
+            srt._allocType = AllocType.BEHAVIOR
+        elif srt.isFeeling:
+            srt._allocType = AllocType.FEELING
+        elif srt.isValueAssesment:
+            srt._allocType = AllocType.ASSESS
+        elif srt == rt.INCIDENT:
+            srt._allocType = AllocType.INCIDENT
+        elif srt == rt.BREAKUP:
+            # breakup needs SPECIAL alloc type;  do not use isCommitLevelChange
+            srt._allocType = AllocType.BREAKUP
+        elif srt in (rt.PROSPECT_STATUS_INCREASE, rt.PROSPECT_STATUS_DECREASE):
+            srt._allocType = AllocType.COMMITCHANGE
+        # elif self in [ScoreRuleType.COMMUNICATION_POSITIVE, ScoreRuleType.COMMUNICATION_NEGATIVE]:
+        #     return 1    # FIXME
+        elif srt == rt.PRE_SCORED:
+            srt._allocType = AllocType.PRESCORE
+        else:
+            srt._allocType = None  # allocWeightType raises
+
+        if srt.isFeelingOrBehavior:
+            srt._minNotchCalc = _CALC_BEH_OR_FEELING
+        elif srt.isValueAssesment:
+            srt._minNotchCalc = _CALC_VAL_ASSESS
+        elif srt == rt.INCIDENT:
+            srt._minNotchCalc = _CALC_INCIDENT
+        elif srt.isCommitLevelChange:
+            srt._minNotchCalc = _CALC_COMMIT_CHANGE
+        else:
+            srt._minNotchCalc = None
+
+
+_setMemberTraits()
+
+
+# (calc, impact) -> (min, notch);  impacts & hybrids are rounded to
+# IMPACT_WEIGHT_DECIMALS so the key space is small & finite
+_minAndNotchCache: Dict[Tuple[str, float], Tuple[float, float]] = dict()
+MIN_NOTCH_CACHE_MAX = 100000  # guard against unrounded inputs
+
+
+def _minAndNotchFor(calc: str, impact: float) -> Tuple[float, float]:
+    key = (calc, impact)
+    cached = _minAndNotchCache.get(key)
+    if cached is not None:
+        return cached
+
+    rp = IMPACT_WEIGHT_DECIMALS  # roundPrecision == 4
+    if calc == _CALC_BEH_OR_FEELING:
+        # based on 3 position slider
+        notchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(impact, 3.0)
+        minAndNotch = (round(impact - notchSize, rp), round(notchSize, rp))
+    elif calc == _CALC_VAL_ASSESS:
+        """based on 4 position slider
+        sliderFraction = 1.0 / float(self.sliderRange) == 0.25
+        note that userScore calc creates custom hybrid with user-concern-level
+
+        value assessment impact weights are almost always negative
+        but they CAN have positive vals when: "he never does this"
+
+        TODO: check math for +- below:
+        """
+        notchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(impact, 4.0)
+        # 1.5 is CORRECT on a 4 slot slider
+        minAndNotch = (round(impact - (1.5 * notchSize), rp), round(notchSize, rp))
+    elif calc == _CALC_INCIDENT:
+        # using fraction of relationship length to bump up to max score of -1
+        # subtracting a negative is same as adding
+        # notch is delta up to max of -1
+        minAndNotch = (round(impact, rp), round(-1 - impact, rp))
+    else:
+        # min & notch is n/a for breakups & commitLevel changes
+        minAndNotch = (0.0, 0.0)
+
+    if len(_minAndNotchCache) >= MIN_NOTCH_CACHE_MAX:
+        _minAndNotchCache.clear()
+    _minAndNotchCache[key] = minAndNotch
+    return minAndNotch
+
+
+def benchRuleTypeTraits(loops: int = 200000) -> None:
+    """old per-access property bodies vs the per-member attributes & cache"""
+    from ..utils.bench import bestMs
+
+    rt = ScoreRuleType
+
+    def _oldIsPositive(srt: ScoreRuleType) -> bool:
+        return srt in [
+            rt.BEHAVIOR_POSITIVE,
+            rt.FEELING_POSITIVE,
+            rt.PROSPECT_STATUS_INCREASE,
+        ]
+
+    def _oldHasEcho(srt: ScoreRuleType) -> bool:
+        return srt in [
+            rt.BREAKUP,
+            rt.INCIDENT,
+            rt.PROSPECT_STATUS_INCREASE,
+            rt.PROSPECT_STATUS_DECREASE,
+        ]
+
+    def _oldAlloc(srt: ScoreRuleType) -> AllocType:
+        if 0 <= srt.value <= 1:
+            return AllocType.BEHAVIOR
+        elif 2 <= srt.value <= 3:
+            return AllocType.FEELING
+        elif 10 <= srt.value <= 13:
+            return AllocType.ASSESS
+        elif srt == rt.INCIDENT:
+            return AllocType.INCIDENT
+        elif srt == rt.BREAKUP:
+            return AllocType.BREAKUP
+        elif srt in [rt.PROSPECT_STATUS_INCREASE, rt.PROSPECT_STATUS_DECREASE]:
+            return AllocType.COMMITCHANGE
+        return AllocType.PRESCORE
+
+    def _oldMinAndNotch(
+        self: ScoreRuleType, staticAppImpact: float, stdCommunityHybrid: float
+    ) -> MinPlusNotchForAppAndCommunity:
+        # the baseline method body (uncached;  both halves on every call)
+        rp = IMPACT_WEIGHT_DECIMALS  # roundPrecision == 4
+        communityImpact = stdCommunityHybrid
+
+        if self.isFeelingOrBehavior:
+            # based on 3 position slider
+            appNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
+                staticAppImpact, 3.0
+            )
+            appMin = staticAppImpact - appNotchSize
+            communityNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
+                communityImpact, 3.0
+            )
+            communityMin = stdCommunityHybrid - communityNotchSize
+            return MinPlusNotchForAppAndCommunity(
+                round(appMin, rp),
+                round(appNotchSize, rp),
+                round(communityMin, rp),
+                round(communityNotchSize, rp),
+            )
+
+        elif self.isValueAssesment:
+            appNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
+                staticAppImpact, 4.0
+            )
+            # 1.5 is CORRECT on a 4 slot slider
+            appMin = staticAppImpact - (1.5 * appNotchSize)
+            communityNotchSize = ScoreRuleType._getBoundedNotchSizeBySliderScale(
+                stdCommunityHybrid, 4.0
+            )
+            communityMin = stdCommunityHybrid - (1.5 * communityNotchSize)
+            return MinPlusNotchForAppAndCommunity(
+                round(appMin, rp),
+                round(appNotchSize, rp),
+                round(communityMin, rp),
+                round(communityNotchSize, rp),
+            )
+
+        elif self == ScoreRuleType.INCIDENT:
+            assert (
+                staticAppImpact < -0.5 and communityImpact < -0.5
+            ), "invalid incident impact weight {0}-{1}".format(
+                staticAppImpact, communityImpact
+            )
+
+            # subtracting a negative is same as adding
+            appNotchSize = -1 - staticAppImpact  # notch is delta up to max of -1
+
+            # app score user hybrid between the two
+            hybridNotchSize = -1 - stdCommunityHybrid
+            return MinPlusNotchForAppAndCommunity(
+                round(staticAppImpact, rp),
+                round(appNotchSize, rp),
+                round(stdCommunityHybrid, rp),
+                round(hybridNotchSize, rp),
+            )
+
+        elif self.isCommitLevelChange:
+            # min & notch is n/a for breakups & commitLevel changes
+            return MinPlusNotchForAppAndCommunity(0.0, 0.0, 0.0, 0.0)
+
+    scoreable = [srt for srt in ScoreRuleType if srt._allocType is not None]
+    members = [scoreable[i % len(scoreable)] for i in range(loops)]
+    behs = [rt.BEHAVIOR_NEGATIVE, rt.VAL_ASSESS_LOTS] * (loops // 20)
+    impacts = [-round(0.05 + (i % 90) / 100, 2) for i in range(len(behs))]
+
+    # same answers (the new side from a cold cache)
+    _minAndNotchCache.clear()
+    incidents = [(rt.INCIDENT, -0.6 - i / 100) for i in range(30)]
+    for srt in scoreable:
+        assert srt.isPositive == _oldIsPositive(srt) and srt.hasEcho == _oldHasEcho(srt)
+        assert srt.allocWeightType == _oldAlloc(srt)
+    for srt, imp in list(zip(behs[:200], impacts[:200])) + incidents:
+        assert _oldMinAndNotch(
+            srt, imp, imp * 0.9
+        ) == srt.minAndNotchForUserAndCommunity(imp, imp * 0.9), (srt, imp)
+    for srt in (rt.BREAKUP, rt.PROSPECT_STATUS_INCREASE):
+        assert _oldMinAndNotch(srt, -0.7, -0.7) == srt.minAndNotchForUserAndCommunity(
+            -0.7, -0.7
+        )
+    _minAndNotchCache.clear()  # the timed run starts cold too
+
+    rows = (
+        (
+            "isPositive + hasEcho",
+            lambda: [_oldIsPositive(m) or _oldHasEcho(m) for m in members],
+            lambda: [m.isPositive or m.hasEcho for m in members],
+        ),
+        (
+            "allocWeightType",
+            lambda: [_oldAlloc(m) for m in members],
+            lambda: [m.allocWeightType for m in members],
+        ),
+        (
+            "minAndNotch",
+            lambda: [_oldMinAndNotch(m, i, i) for m, i in zip(behs, impacts)],
+            lambda: [
+                m.minAndNotchForUserAndCommunity(i, i) for m, i in zip(behs, impacts)
+            ],
+        ),
+    )
+    for label, old, new in rows:
+        # 1 round:  the new minAndNotch run includes filling its cache
+        oldMs, newMs = bestMs(old, 1), bestMs(new, 1)
+        print(
+            "{0:<22} old {1:7.1f}ms   new {2:6.1f}ms   x{3:.1f}".format(
+                label, oldMs, newMs, oldMs / newMs
+            )
+        )
+
+
 class NdbScoringRuleProp(model.IntegerProperty):
     #
     def _validate(self, value):
@@ -1158,3 +1271,7 @@ class ScoreRuleTypeSerialized(fields.Enum):
 # #     # def fromEntryRow(er):
 # #     #     # method EXCLUSIVELY for testing
 # #     #     return ValueAssessRawEntry(er.code, er.val1, er.val2, er.date)
+
+
+if __name__ == "__main__":
+    benchRuleTypeTraits()
@@ -2,11 +2,14 @@ from __future__ import annotations
 import sys
 import random
 import json
-from typing import Union, TypeVar
+import threading
+import time
+from typing import Union, TypeVar, NamedTuple
 from datetime import date, datetime, timedelta
-import copy
 from collections import namedtuple
 
+import numpy as np
+
 import google.cloud.ndb as ndb
 
 # FIXME
@@ -21,7 +24,25 @@ from ..schemas.behavior import (
     BehStatMsgAdapter,
 )
 from ..config.behavior.load_yaml import BehaviorSourceSingleton
-
+from ..config.behavior.beh_constants import SHOWALL_CODE_PREFIX
+from .beh_shards import (
+    PER_BEHAVIOR_SHARDS,
+    BehaviorShardConfig,
+    currentShardConfig,
+    shardCountFor,
+    noteWrites,
+)
+from .beh_rollup_tensor import RollupTensor
+from ..services.firebase.stats_publisher import dailyStatsPublisher
+from .rolling_stats_store import (
+    TOTAL_FIELD,
+    RollingStatsStore,
+    rollingStatsStore,
+    currentBucket,
+    windowBuckets,
+    categoryField,
+    parseField,
+)
 
 behaviorDataShared = BehaviorSourceSingleton()  # read only singleton
 
@@ -41,7 +62,9 @@ for all behavior record entries (both experience & values-assesment)
 """
 
 
-PER_BEHAVIOR_SHARDS = 20  # dont reduce this # or counts will be missed
+# loadAllStats serves BehaviorRollupAggregate recs younger than this
+# (a background job rebuilds them;  stale/missing recs are rebuilt inline)
+ROLLUP_AGGREGATE_MAX_AGE = timedelta(hours=2)
 
 GLOBAL_PERCENT_INCREASE = 0.5  # when firebase updates are required
 
@@ -217,6 +240,13 @@ class CountTotals:
     def fromJson(json_str):
         return json.loads(json_str, cls=CountTotalsDecoder)
 
+    @staticmethod
+    def fromMsg(msg: BehVoteStatsMsg) -> CountTotals:
+        # wrap an already merged msg (eg from RollupTensor.toVoteStatsMsg)
+        ct = CountTotals.__new__(CountTotals)
+        ct.msg = msg
+        return ct
+
     @staticmethod
     def default(behCode):
         # returns an empty totals count rec
@@ -351,6 +381,19 @@ class VoteTypeRollup(ndb.Model):
         # print("post-update")
         # print(self)
 
+    def add(self, slot: int, votes: int):
+        """add many votes for one slot (buffered flush path)"""
+        assert 1 <= slot <= 4, "oops? slot: {0}".format(slot)
+        self.count += votes
+        if slot == 1:
+            self.s1 += votes
+        elif slot == 2:
+            self.s2 += votes
+        elif slot == 3:
+            self.s3 += votes
+        else:
+            self.s4 += votes
+
     def append(self, otherVtr):
         self.count += otherVtr.count
         self.s1 += otherVtr.s1
@@ -425,6 +468,18 @@ class BehaviorRollup(ndb.Model):
         # else:
         #     self.unknownCounts = perSexList
 
+    def _applyDeltas(self: BehaviorRollup, deltas: dict[tuple[int, int, int], int]):
+        """add accumulated vote counts
+        deltas is {(sex, voteType, slot): votes} from BehaviorVoteBuffer
+        """
+        for (sex, voteType, slot), votes in deltas.items():
+            for vtr in self._statsListBySex(sex):
+                if vtr.matchesVoteType(voteType):
+                    vtr.add(slot, votes)
+                    break
+            else:
+                assert False, "no VoteTypeRollup for type {0}".format(voteType)
+
     def save(self: BehaviorRollup):
         # store to ndb
         self.put()
@@ -442,11 +497,17 @@ class BehaviorRollup(ndb.Model):
         return getattr(self, sexName, None)  #  default= []
 
     @staticmethod
-    def loadAllStats(voteType: VoteType, pos: bool = False):
+    def loadAllStats(
+        voteType: VoteType,
+        pos: bool = False,
+        maxAge: timedelta = ROLLUP_AGGREGATE_MAX_AGE,
+    ):
         """
         roll up all stats (across all behaviors) by vote type
         combine all totals (across many shards) into one VoteTypeRollup (ignoring its sex)
         and store in dict keyed by behCode
+        served from the materialized BehaviorRollupAggregate (one read)
+        unless it is missing or older than maxAge (timedelta(0) forces a shard read)
         return:
             aggregateCounts is a {negBehCode: VoteTypeRollup}
         """
@@ -454,20 +515,45 @@ class BehaviorRollup(ndb.Model):
             # only negative behaviors have "concern" votes
             return dict()
 
+        agg = _makeRollupAggregateKey(voteType, pos).get()
+        if agg is not None and agg.isFresh(maxAge):
+            return agg.toVtrDict()
+        return BehaviorRollup.rebuildAggregates(pos, [voteType])[voteType]
+
+    @staticmethod
+    def rebuildAggregates(pos: bool, voteTypes: list[VoteType] = None):
+        """read every shard ONCE & store a BehaviorRollupAggregate per vote type
+        run from the background job (see StatsTasks.rebuildRollupAggregatesTask)
+        returns {voteType: {behCode: VoteTypeRollup}}
+        """
+        if voteTypes is None:
+            voteTypes = [VoteType.FEELING, VoteType.FREQUENCY]
+            if not pos:
+                voteTypes.append(VoteType.CONCERN)
+
+        builtAt = datetime.utcnow()  # before the read so staleness is conservative
+        # one numpy merge of every shard;  see beh_rollup_tensor.py
+        summed = RollupTensor.fromRollups(BehaviorRollup._loadAllShards(pos))
+        summed = summed.sumByCode()
+        aggs = [
+            BehaviorRollupAggregate.fromTensor(voteType, pos, summed, builtAt)
+            for voteType in voteTypes
+        ]
+        ndb.put_multi(aggs)
+        return {voteType: agg.toVtrDict() for voteType, agg in zip(voteTypes, aggs)}
+
+    @staticmethod
+    def _loadAllShards(pos: bool) -> list[BehaviorRollup]:
         allBehCodes = behaviorDataShared.allBehaviorCodes(pos)
+        shardConfig = currentShardConfig()  # one uncached read for every code
         allStatRecKeys = []
         for behCode in allBehCodes:
-            allStatRecKeys.extend(BehaviorRollup.all_keys(behCode))
+            allStatRecKeys.extend(BehaviorRollup.all_keys(behCode, shardConfig))
 
         # if there are 200 negative behaviors; and 10 shards for each, this list could be 2000 long
         allRecsPlusNoneIfRecNotExists = ndb.get_multi(allStatRecKeys)
         # get_multi returns None at keyIndex for recs that dont exist
-        allRecs = [r for r in allRecsPlusNoneIfRecNotExists if r is not None]
-
-        aggregateCounts = dict()  # ref obj updated inside of _unifyStats
-        for bru in allRecs:
-            bru._unifyStats(voteType, aggregateCounts)
-        return aggregateCounts
+        return [r for r in allRecsPlusNoneIfRecNotExists if r is not None]
 
     @staticmethod
     def updateStats(listVoteInfo: list[VoteInfo]):
@@ -480,6 +566,17 @@ class BehaviorRollup(ndb.Model):
         assert len(listVoteInfo) == 1 or (
             firstVoteInfo.behCode == listVoteInfo[1].behCode
         ), "all must be for same behCode"
+
+        # when the write-behind buffer is running, votes are batched
+        # into one get_multi/put_multi per flush instead of a get+put per call
+        from .beh_vote_buffer import BehaviorVoteBuffer
+
+        voteBuffer = BehaviorVoteBuffer()
+        # add() refuses once the buffer is stopping;  then write directly
+        if voteBuffer.isRunning and voteBuffer.add(listVoteInfo):
+            RollingStatWindowManager.updateRollingStatCount(firstVoteInfo)
+            return
+
         rec = BehaviorRollup._loadOrCreateRec(firstVoteInfo)
         for vi in listVoteInfo:
             rec._update(vi)
@@ -491,6 +588,7 @@ class BehaviorRollup(ndb.Model):
         # save
         # print(rec.maleCounts, rec.femaleCounts)
         rec.save()
+        noteWrites(firstVoteInfo.behCode)  # may grow this code's shard count
 
     @staticmethod
     def _loadOrCreateRec(voteInfo: VoteInfo):
@@ -499,7 +597,7 @@ class BehaviorRollup(ndb.Model):
         do not update stats here
         that is done by caller in the _update method
         """
-        shardID = random.randint(0, PER_BEHAVIOR_SHARDS - 1)
+        shardID = random.randint(0, shardCountFor(voteInfo.behCode) - 1)
         key = _makeBehStatsShardKey(voteInfo.behCode, shardID)
         rec = key.get()
         if rec is None:
@@ -583,28 +681,31 @@ class BehaviorRollup(ndb.Model):
             print("Err: no global stats data found for behavior " + behCode)
             return CountTotals.default(behCode).toMsg()
 
-        totalRec = CountTotals(activeShards[0])  # init from first
-        for bru in activeShards[1:]:
-            totalRec.append(bru)
-
-        totalRec.convertAllCountsToPct()
+        # merge shards & convert to pct in numpy (see beh_rollup_tensor.py)
+        summed = RollupTensor.fromRollups(activeShards).sumByCode()
+        totalRec = CountTotals.fromMsg(
+            summed.toVoteStatsMsg(0, activeShards[0].categoryName, asPct=True)
+        )
         jsn = totalRec.toJson
         ttl = 3600 if date.today() > date(2020, 3, 2) else 4
         # memcache.add(behCode, jsn, time=ttl)  # ttl
         return totalRec.toMsg()
 
     @staticmethod
-    def all_keys(behCode: str):
+    def all_keys(behCode: str, shardConfig: BehaviorShardConfig = None):
         """Returns all possible keys for the counter name given the config.
         Args:
             name: The name of the counter.
+            shardConfig: defaults to an uncached currentShardConfig()
+                (the cached count can miss shards another instance added)
         Returns:
             The full list of ndb.Key values corresponding to all the possible
-                counter shards that could exist.
+                counter shards that could exist (per-code count;  see beh_shards.py)
         """
+        shardConfig = shardConfig or currentShardConfig()
         return [
             _makeBehStatsShardKey(behCode, index)
-            for index in range(PER_BEHAVIOR_SHARDS)
+            for index in range(shardConfig.countFor(behCode))
         ]
 
     @property
@@ -675,421 +776,329 @@ class BehaviorRollup(ndb.Model):
         return PerSexVoteTotals(female=femCount, male=maleCount, unknown=unkCount)
 
 
-def _makeBehStatsShardKey(code: str, instanceID: int):
-    # assert instanceID > 0, "invalid ID"
-    strID = "{0}_{1:d}".format(code, instanceID)
-    return ndb.Key(BehaviorRollup, strID)
-
-
-class RollingStatWindow:
-    """
-    {
-        GlobalCount int,
-        LastUpdateTime[<windowIndex>] datetime,
-        PositiveTotals["<category>"][<windowIndex>] int
-        NegativeTotals["<category>"][<windowIndex>] int
-    }
-
-    __init__():         initializes blank stat window data
-    loadFromMemcache(): loads rolling stat window data from memcache
-    saveToMemcache():   saves rolling stat window data to memcache
-    updateFirebase():   convert to firebase format and sync with firebase
-
-    # TODO: move the following to the json encoder pattern, but for now...
-    toJson():
-    fromJson():
+class BehaviorRollupAggregate(ndb.Model):
+    """materialized result of BehaviorRollup.loadAllStats
+    one rec per VoteType & polarity;  key == _makeRollupAggregateKey
+    counts is {behCode: [count, s1, s2, s3, s4]}
     """
 
-    def __init__(
-        self: RollingStatWindow,
-        globalCount: int = 0,
-        lastUpdateTime=[],
-        positiveTotals={},
-        negativeTotals={},
-    ):
-        # initialize basic structure
-        self.GlobalCount = globalCount
-        self.LastUpdateTime = lastUpdateTime
-        self.PositiveTotals = positiveTotals
-        self.NegativeTotals = negativeTotals
-
-        if self.LastUpdateTime == []:
-            # print("INIT TIMES")
-            for _ in range(24):
-                self.LastUpdateTime.append(datetime.min)
-
-        # get POSITIVE codes
-        if self.PositiveTotals == {}:
-            # set zero counts for all categories
-            for cat in behaviorDataShared.categoryCodesWithNames(False):
-                self.PositiveTotals[cat[0]] = {
-                    "catName": cat[1],
-                    "iconName": cat[2],
-                    "isPositive": cat[3],
-                    "subTot": [],
-                }
-                for _ in range(24):
-                    self.PositiveTotals[cat[0]]["subTot"].append(0)
-
-        # get NEGATIVE codes
-        if self.NegativeTotals == {}:
-            # set zero counts for all categories
-            for cat in behaviorDataShared.categoryCodesWithNames():
-                self.NegativeTotals[cat[0]] = {
-                    "catName": cat[1],
-                    "iconName": cat[2],
-                    "isPositive": cat[3],
-                    "subTot": [],
-                }
-                for _ in range(24):
-                    self.NegativeTotals[cat[0]]["subTot"].append(0)
-
-    def copy(self: RollingStatWindow):
-        return RollingStatWindow(
-            self.GlobalCount,
-            copy.deepcopy(self.LastUpdateTime),
-            copy.deepcopy(self.PositiveTotals),
-            copy.deepcopy(self.NegativeTotals),
-        )
-
-    # calculate the total sum of a list of category window
-    # return a list of dicts containing catName, iconName, isPositive,
-    # and the actual summed count
-    def _sumWindowedTotals(self: RollingStatWindow, isPositive: bool):
-        summedStatsList = []
-
-        # BDM TODO: factor out - this is used in multiple places
-        # determine ignored categories based on pos/neg list
-        if isPositive:
-            totalsList = self.PositiveTotals
-            ignoreCat = "ShowAll_Pos"
-        else:
-            totalsList = self.NegativeTotals
-            ignoreCat = "ShowAll_Neg"
-
-        for cat in totalsList:
-            total = 0
-
-            # ignore specified categories
-            if cat == ignoreCat:
-                continue
-
-            # sum each window subtotal into actual vote count
-            for subTot in totalsList[cat]["subTot"]:
-                total = total + subTot
-
-            summedStatsList.append(
-                {
-                    "catName": totalsList[cat]["catName"],
-                    "iconName": totalsList[cat]["iconName"],
-                    "isPos": totalsList[cat]["isPositive"],
-                    "actCount": total,
-                }
+    voteType = NdbVoteTypeProp(required=True)
+    positive = ndb.BooleanProperty(indexed=False, default=False)
+    counts = ndb.JsonProperty(compressed=True)
+    builtAt = ndb.DateTimeProperty(indexed=False)
+
+    def isFresh(self: BehaviorRollupAggregate, maxAge: timedelta) -> bool:
+        return datetime.utcnow() - self.builtAt <= maxAge
+
+    def toVtrDict(self: BehaviorRollupAggregate) -> dict[str, VoteTypeRollup]:
+        # new objects on every call;  callers may mutate them
+        vtrDict = dict()
+        for behCode, (count, s1, s2, s3, s4) in self.counts.items():
+            vtrDict[behCode] = VoteTypeRollup(
+                voterSex=Sex.UNKNOWN,
+                voteType=self.voteType,
+                count=count,
+                s1=s1,
+                s2=s2,
+                s3=s3,
+                s4=s4,
             )
+        return vtrDict
 
-        return summedStatsList
+    @staticmethod
+    def fromTensor(
+        voteType: VoteType,
+        pos: bool,
+        tensor: RollupTensor,
+        builtAt: datetime,
+    ) -> BehaviorRollupAggregate:
+        codes, counts, slots = tensor.unifiedArrays(voteType)
+        agg = BehaviorRollupAggregate(
+            voteType=voteType,
+            positive=pos,
+            counts={
+                behCode: [count] + slotList
+                for behCode, count, slotList in zip(
+                    codes, counts.tolist(), slots.tolist()
+                )
+            },
+            builtAt=builtAt,
+        )
+        agg.key = _makeRollupAggregateKey(voteType, pos)
+        return agg
 
-    def loadFromMemcache(self: RollingStatWindow):
-        # read memcache! (stored as json)
-        data = None  # memcache.get(key="RollingStatsWindow")
 
-        # set internal window to memcache window
-        if data is not None:
-            # DEBUGGING
-            # print("rolling stats window - memcache hit!")
-            # print(data)
+def _makeRollupAggregateKey(voteType: VoteType, pos: bool):
+    strID = "{0}_{1}".format(VoteType(voteType).name, "pos" if pos else "neg")
+    return ndb.Key(BehaviorRollupAggregate, strID)
 
-            stats = RollingStatWindow.fromJson(data)
-            self.GlobalCount = stats.GlobalCount
-            self.LastUpdateTime = stats.LastUpdateTime
-            self.PositiveTotals = stats.PositiveTotals
-            self.NegativeTotals = stats.NegativeTotals
-            return
 
-        # DEBUGGING
-        # print("rolling stats window - memcache miss!")
+def _makeBehStatsShardKey(code: str, instanceID: int):
+    # assert instanceID > 0, "invalid ID"
+    strID = "{0}_{1:d}".format(code, instanceID)
+    return ndb.Key(BehaviorRollup, strID)
 
-    def saveToMemcache(self: RollingStatWindow):
-        data = RollingStatWindow.toJson(self)
-        # print("saving %s to memecache!" % data)
 
-        # calculate memcache expiration
-        expiration = datetime.utcnow() + timedelta(days=1)
-        epoch = datetime.utcfromtimestamp(0)
-        expiration_secs = (expiration - epoch).total_seconds()
+# rolling window column layout;  one column per category (positives first)
+# key: taxonomy generation;  dropped when behaviors.yaml reloads
+class CategoryLayout(NamedTuple):
+    fields: tuple[str, ...]  # categoryField(catCode, isPositive) per column
+    names: tuple[str, ...]
+    icons: tuple[str, ...]
+    catIsPositive: tuple[bool, ...]  # the category's own flag (published as isPos)
+    isPositive: np.ndarray  # bool;  which totals list the column belongs to
+    colIdx: np.ndarray  # 0..n-1 (tie break for ranking == old dict order)
+    colByField: dict[str, int]
 
-        # store in memcache
-        # memcache.set(key="RollingStatsWindow", value=data, time=expiration_secs)
-        return
 
-    def percentIncreased(self: RollingStatWindow, rate: float, oldStats):
-        # DEBUGGING
-        # print("rate = %d oldStats = %s" %(rate, oldStats))
+_layoutCache: dict[int, CategoryLayout] = dict()
 
-        # avoid divide by zero
-        if oldStats.GlobalCount == 0:
-            # if global count is zero and this function is called,
-            # it means the count is increasing to at least 1,
-            # infinite/undefined increase is worth updating firebase :)
-            return True
 
-        # calculate percentage increase
-        percentageIncreased = (self.GlobalCount - oldStats.GlobalCount) / float(
-            oldStats.GlobalCount
+def _categoryLayout() -> CategoryLayout:
+    generation = behaviorDataShared.generation
+    layout = _layoutCache.get(generation)
+    if layout is None:
+        cols = [
+            (cat, isPositive)
+            for isPositive in (True, False)
+            for cat in behaviorDataShared.categoryCodesWithNames(not isPositive)
+            # ShowAll_* are pseudo categories;  never counted or ranked
+            if not cat[0].startswith(SHOWALL_CODE_PREFIX)
+        ]
+        fields = tuple(categoryField(cat[0], isPos) for cat, isPos in cols)
+        layout = CategoryLayout(
+            fields=fields,
+            names=tuple(cat[1] for cat, _ in cols),
+            icons=tuple(cat[2] for cat, _ in cols),
+            catIsPositive=tuple(cat[3] for cat, _ in cols),
+            isPositive=np.array([isPos for _, isPos in cols], dtype=bool),
+            colIdx=np.arange(len(cols)),
+            colByField={field: i for i, field in enumerate(fields)},
         )
+        _layoutCache[generation] = layout
+    return layout
 
-        # DEBUGGING
-        # print("rate = %f" % percentageIncreased)
 
-        # return true if greater than threshold rate of increase!
-        if percentageIncreased > rate:
-            return True
+def _onTaxonomyReload(view) -> None:
+    # old generations can never be requested again;  columns may have changed
+    _layoutCache.clear()
+    RollingStatWindowManager.dropLiveWindow()
 
-        return False
 
-    def isReordered(self: RollingStatWindow, oldStats):
-        # get summed total lists
-        PosList_prev = oldStats._sumWindowedTotals(True)
-        PosList = self._sumWindowedTotals(True)
-        NegList_prev = oldStats._sumWindowedTotals(False)
-        NegList = self._sumWindowedTotals(False)
-
-        # sort the lists
-        PosList_prev.sort(reverse=True, key=lambda cat: cat["actCount"])
-        PosList.sort(reverse=True, key=lambda cat: cat["actCount"])
-        NegList_prev.sort(reverse=True, key=lambda cat: cat["actCount"])
-        NegList.sort(reverse=True, key=lambda cat: cat["actCount"])
-
-        if len(PosList_prev) != len(PosList):
-            print("POS - NUM CATEGORIES CHANGED! UPDATE")
-            return True
+behaviorDataShared.addReloadListener(_onTaxonomyReload)
 
-        # for i in range(len(PosList)):
-        #     print("CURR: %s = %d" % (PosList[i]["catName"], PosList[i]["actCount"]))
-        #     print("PREV: %s = %d" % (PosList_prev[i]["catName"], PosList_prev[i]["actCount"]))
 
-        for i in range(len(PosList)):
-            if PosList_prev[i]["catName"] != PosList[i]["catName"]:
-                if PosList_prev[i]["actCount"] != PosList[i]["actCount"]:
-                    # print("POS LIST REORDER!")
-                    # print("CURR: %s = %d" % (PosList[i]["catName"], PosList[i]["actCount"]))
-                    # print("PREV: %s = %d" % (PosList_prev[i]["catName"], PosList_prev[i]["actCount"]))
-                    return True
+class RollingStatWindow:
+    """
+    24 hourly slots (ring buffer) of per-category vote counts
 
-        if len(NegList_prev) != len(NegList):
-            # print("NEG LIST - NUM CATEGORIES CHANGED! UPDATE")
-            return True
+        counts[slot, column]    votes per hour & category (column == CategoryLayout)
+        slotTotals[slot]        all votes in the hour (incl. unknown categories)
+        catTotals[column]       running sum of counts over the window
+        GlobalCount             running sum of slotTotals
+        headBucket              utc epoch hour of the newest slot (slot == bucket % 24)
 
-        for i in range(len(NegList_prev)):
-            if NegList_prev[i]["catName"] != NegList[i]["catName"]:
-                if NegList_prev[i]["actCount"] != NegList[i]["actCount"]:
-                    # print("NEG LIST REORDER!")
-                    # print("CURR: %s = %d" % (NegList[i]["catName"], NegList[i]["actCount"]))
-                    # print("PREV: %s = %d" % (NegList_prev[i]["catName"], NegList_prev[i]["actCount"]))
-                    return True
+    advanceTo() moves the head lazily & zeroes only the slots that expired
+    increment() is O(1) plus an O(categories) "did the ranking change" check
+    nothing is copied or re-sorted per vote
+    """
 
-        return False
+    SLOTS = 24
 
-    def updateFirebase(self: RollingStatWindow):
-        # extract relevant data for firebase
-        dailyStatsPos = {}
-        dailyStatsNeg = {}
-
-        # BDM TODO! refactor to use the _summedWindowTotals function!
-        for cat in self.PositiveTotals:
-            if cat == "ShowAll_Pos":
-                continue
-            total = 0
-            for subTot in self.PositiveTotals[cat]["subTot"]:
-                # print(subTot)
-                total = total + subTot
-            dailyStatsPos[cat] = {
-                "catName": self.PositiveTotals[cat]["catName"],
-                "iconName": self.PositiveTotals[cat]["iconName"],
-                "isPos": self.PositiveTotals[cat]["isPositive"],
-                "actCount": total,
-            }
+    def __init__(
+        self: RollingStatWindow, layout: CategoryLayout = None, headBucket: int = None
+    ):
+        self.layout = layout if layout is not None else _categoryLayout()
+        cols = len(self.layout.fields)
+        self.counts = np.zeros((RollingStatWindow.SLOTS, cols), np.int64)
+        self.slotTotals = np.zeros(RollingStatWindow.SLOTS, np.int64)
+        self.catTotals = np.zeros(cols, np.int64)
+        self.GlobalCount = 0
+        self.headBucket = headBucket if headBucket is not None else currentBucket()
+
+    def advanceTo(self: RollingStatWindow, bucket: int) -> bool:
+        """expire the hours that left the window;  True if the head moved"""
+        if bucket <= self.headBucket:
+            return False
+        firstNew = max(self.headBucket + 1, bucket - RollingStatWindow.SLOTS + 1)
+        for b in range(firstNew, bucket + 1):
+            slot = b % RollingStatWindow.SLOTS
+            self.catTotals -= self.counts[slot]
+            self.GlobalCount -= int(self.slotTotals[slot])
+            self.counts[slot] = 0
+            self.slotTotals[slot] = 0
+        self.headBucket = bucket
+        return True
+
+    def increment(self: RollingStatWindow, field: str) -> tuple[int, bool]:
+        """count one vote in the head slot
+        returns (GlobalCount before the vote, category ranking changed)
+        """
+        slot = self.headBucket % RollingStatWindow.SLOTS
+        priorGlobal = self.GlobalCount
+        self.GlobalCount += 1
+        self.slotTotals[slot] += 1
+        col = self.layout.colByField.get(field)
+        if col is None:
+            # TODO: BDM please log error here
+            return priorGlobal, False
+        reordered = self._rankChangesOnIncrement(col)
+        self.counts[slot, col] += 1
+        self.catTotals[col] += 1
+        return priorGlobal, reordered
+
+    def _rankChangesOnIncrement(self: RollingStatWindow, col: int) -> bool:
+        """would +1 on col move it in its (pos or neg) list ranked by count?
+        ties rank by column order, so it moves iff it passes a same-count
+        category ahead of it or joins a higher-count one that sits behind it
+        """
+        layout = self.layout
+        before = self.catTotals[col]
+        samePolarity = layout.isPositive == layout.isPositive[col]
+        passes = samePolarity & (self.catTotals == before) & (layout.colIdx < col)
+        joins = samePolarity & (self.catTotals == before + 1) & (layout.colIdx > col)
+        return bool(passes.any() or joins.any())
+
+    def percentIncreased(self: RollingStatWindow, rate: float, priorGlobal: int):
+        # avoid divide by zero
+        if priorGlobal == 0:
+            # if global count is zero and this function is called,
+            # it means the count is increasing to at least 1,
+            # infinite/undefined increase is worth updating firebase :)
+            return True
+        return (self.GlobalCount - priorGlobal) / float(priorGlobal) > rate
 
-        for cat in self.NegativeTotals:
-            if cat == "ShowAll_Neg":
-                continue
-            total = 0
-            for subTot in self.NegativeTotals[cat]["subTot"]:
-                # print(subTot)
-                total = total + subTot
-            dailyStatsNeg[cat] = {
-                "catName": self.NegativeTotals[cat]["catName"],
-                "iconName": self.NegativeTotals[cat]["iconName"],
-                "isPos": self.NegativeTotals[cat]["isPositive"],
-                "actCount": total,
+    def loadFromStore(
+        self: RollingStatWindow, store: RollingStatsStore, now: datetime = None
+    ):
+        """replace all slots with the last 24 store buckets"""
+        buckets = windowBuckets(now)
+        loaded = store.loadBuckets(buckets)
+        colByField = self.layout.colByField
+        self.counts[:] = 0
+        self.slotTotals[:] = 0
+        for bucket in buckets:
+            slot = bucket % RollingStatWindow.SLOTS
+            for field, count in loaded[bucket].items():
+                if field == TOTAL_FIELD:
+                    self.slotTotals[slot] = count
+                elif field in colByField:
+                    self.counts[slot, colByField[field]] = count
+        self.catTotals = self.counts.sum(axis=0)
+        self.GlobalCount = int(self.slotTotals.sum())
+        self.headBucket = buckets[-1]
+
+    def summedTotals(self: RollingStatWindow, isPositive: bool) -> dict[str, dict]:
+        """{catCode: {catName, iconName, isPos, actCount}} for one polarity"""
+        layout = self.layout
+        totals = self.catTotals.tolist()
+        summed = dict()
+        for col in np.flatnonzero(layout.isPositive == isPositive).tolist():
+            catCode, _ = parseField(layout.fields[col])
+            summed[catCode] = {
+                "catName": layout.names[col],
+                "iconName": layout.icons[col],
+                "isPos": layout.catIsPositive[col],
+                "actCount": totals[col],
             }
+        return summed
 
-    # FIXME:
-    # place firebase tasks on queue
-    # StatsTasks.updateDailyStatsTask("/dailyStatsPos/", dailyStatsPos)
-    # StatsTasks.updateDailyStatsTask("/dailyStatsNeg/", dailyStatsNeg)
-
-    # BDM TODO: refactor these methods to use the proper encoder/decoder
-    #           for json & classes.
-
-    @staticmethod
-    def toJson(rst):
-        data = rst.__dict__.copy()
-        data["LastUpdateTime"] = []
-
-        # convert times to iso string format
-        for t in rst.LastUpdateTime:
-            data["LastUpdateTime"].append(t.isoformat())
-
-        # DEBUGGING
-        # print(data)
-        # print("dumping data...")
-
-        return json.dumps(data)
+    def updateFirebase(self: RollingStatWindow):
+        # extract relevant data for firebase
+        dailyStatsPos = self.summedTotals(True)
+        dailyStatsNeg = self.summedTotals(False)
+
+        # debounced & diffed;  never blocks the vote on the network
+        publisher = dailyStatsPublisher()
+        publisher.submit("dailyStatsPos", dailyStatsPos)
+        publisher.submit("dailyStatsNeg", dailyStatsNeg)
+        return dailyStatsPos, dailyStatsNeg
+
+    def toJson(self: RollingStatWindow) -> str:
+        # columns saved by field so a reloaded taxonomy can still read it
+        return json.dumps(
+            {
+                "headBucket": self.headBucket,
+                "fields": self.layout.fields,
+                "counts": self.counts.tolist(),
+                "slotTotals": self.slotTotals.tolist(),
+            }
+        )
 
     @staticmethod
-    def fromJson(data):
+    def fromJson(data: str) -> RollingStatWindow:
         stats = json.loads(data)
-        rsw = RollingStatWindow()
-        rsw.GlobalCount = stats["GlobalCount"]
-
-        # convert times from iso string format
-        rsw.LastUpdateTime = []
-        for t in stats["LastUpdateTime"]:
-            rsw.LastUpdateTime.append(dateutil.parser.parse(t))
+        rsw = RollingStatWindow(headBucket=stats["headBucket"])
+        colByField = rsw.layout.colByField
+        cols = [colByField.get(field, -1) for field in stats["fields"]]
+        known = [i for i, col in enumerate(cols) if col >= 0]
+        saved = np.array(stats["counts"], np.int64).reshape(
+            RollingStatWindow.SLOTS, len(cols)
+        )
+        rsw.counts[:, [cols[i] for i in known]] = saved[:, known]
+        rsw.slotTotals[:] = stats["slotTotals"]
+        rsw.catTotals = rsw.counts.sum(axis=0)
+        rsw.GlobalCount = int(rsw.slotTotals.sum())
+        return rsw
 
-        rsw.PositiveTotals = stats["PositiveTotals"]
-        rsw.NegativeTotals = stats["NegativeTotals"]
 
-        return rsw
+# live window is re-read from the store this often (other instances' votes)
+WINDOW_SYNC_SECS = 60
 
 
 class RollingStatWindowManager:
     """this is BDM object to manage logic for updating Firebase
     with rolling system stats
+
+    keeps one live RollingStatWindow per process;  votes are applied to it
+    in memory & atomically to the shared store, which it re-reads every
+    WINDOW_SYNC_SECS
     """
 
-    @staticmethod
-    def _currentWindow():
-        # DEBUGGING
-        # print("current window is %d" % datetime.datetime.utcnow().hour)
-        return datetime.utcnow().hour
+    _lock = threading.Lock()
+    _window: RollingStatWindow = None
+    _syncedAt: float = 0.0
 
     @staticmethod
-    def _outOfDateWindow(t):
-        t_now = datetime.utcnow()
-        if t.hour <= t_now.hour and t.day != t_now.day:
-            return True
-        return False
+    def dropLiveWindow():
+        with RollingStatWindowManager._lock:
+            RollingStatWindowManager._window = None
 
-    # given the current DtTm, find out how many rolling
-    # windows are now out of date and clear counts.
-    # return True if any windows are cleared.
     @staticmethod
-    def _clearOldWindows(stats):
-        windows_cleared = False
-        outdated_windows = []
-
-        # check latest update time for every window
-        idx = 0
-        for t in stats.LastUpdateTime:
-            if RollingStatWindowManager._outOfDateWindow(t):
-                # signal windows / values have been cleared / changed.
-                # print("DEBUG - WINDOW %d CLEARED AT TIME: %s!" % (idx, t.isoformat()))
-                windows_cleared = True
-
-                # set latest update time to NOW
-                stats.LastUpdateTime[idx] = datetime.utcnow()
-
-                # get NEGATIVE codes
-                # set zero counts for all categories
-                for cat in behaviorDataShared.categoryCodesWithNames():
-                    # decrement global total
-                    stats.GlobalCount = (
-                        stats.GlobalCount - stats.NegativeTotals[cat[0]]["subTot"][idx]
-                    )
-
-                    # zero out existing total counts for expired data.
-                    stats.NegativeTotals[cat[0]]["subTot"][idx] = 0
-
-                # get POSITIVE codes
-                # set zero counts for all categories
-                for cat in behaviorDataShared.categoryCodesWithNames(False):
-                    # decrement global total
-                    stats.GlobalCount = (
-                        stats.GlobalCount - stats.PositiveTotals[cat[0]]["subTot"][idx]
-                    )
-
-                    # zero out existing total counts for expired data.
-                    stats.PositiveTotals[cat[0]]["subTot"][idx] = 0
-
-            idx = idx + 1
-
-        # print(stats.LastUpdateTime)
-
-        return windows_cleared
-
-    @staticmethod
-    def _incrementVoteCount(stats, vote):
-        cat = vote.categoryCode
-        w = RollingStatWindowManager._currentWindow()
-
-        # increment global count
-        stats.GlobalCount = stats.GlobalCount + 1
-
-        curDict = stats.PositiveTotals if vote.positive else stats.NegativeTotals
-        localStatRec = curDict.get(cat)
-        if localStatRec is None:
-            # TODO: BDM please log error here
-            return
-
-        curCount = localStatRec["subTot"][w]
-        # update catagory count by category and window
-        localStatRec["subTot"][w] = curCount + 1
-
-        # if vote.positive:
-        #     stats.PositiveTotals[cat]["subTot"][w] = stats.PositiveTotals[cat]["subTot"][w] + 1
-        # else:
-        #     stats.NegativeTotals[cat]["subTot"][w] = stats.NegativeTotals[cat]["subTot"][w] + 1
-
-        # set last update time to now
-        # print(stats.LastUpdateTime)
-        # print("window is %s" % window)
-        # print(stats.LastUpdateTime[window])
-        stats.LastUpdateTime[w] = datetime.utcnow()
-
-        return stats
+    def _liveWindow(store: RollingStatsStore, now: datetime) -> RollingStatWindow:
+        # call with _lock held
+        mgr = RollingStatWindowManager
+        if mgr._window is None or time.monotonic() - mgr._syncedAt > WINDOW_SYNC_SECS:
+            window = RollingStatWindow()
+            window.loadFromStore(store, now)
+            mgr._window = window
+            mgr._syncedAt = time.monotonic()
+        return mgr._window
 
     @staticmethod
     def updateRollingStatCount(vote):
         """vote argument is of VoteInfo type"""
-        updateFirebase = False
-        stats = RollingStatWindow()
-
-        # get memcache
-        stats.loadFromMemcache()
-
-        # check if windows are out of date (date rollover)!
-        # clears old windows - returns true if anything had to be cleared
-        if RollingStatWindowManager._clearOldWindows(stats):
-            # print("old windows! update firebase!")
-            updateFirebase = True
-
-        # update stats (and data)
-        oldStats = stats.copy()
-        RollingStatWindowManager._incrementVoteCount(stats, vote)
-
-        # check firebase updates are required
-        if stats.percentIncreased(GLOBAL_PERCENT_INCREASE, oldStats):
-            # print("global increase! update firebase!!")
-            updateFirebase = True
-        elif stats.isReordered(oldStats):
-            # print("stats need reordering! update firebase!")
-            updateFirebase = True
-
-        # update memcache
-        stats.saveToMemcache()
-
-        # if needed, update firebase
-        if updateFirebase:
-            stats.updateFirebase()
+        store = rollingStatsStore()
+        now = datetime.utcnow()
+        bucket = currentBucket(now)
+        field = categoryField(vote.categoryCode, vote.positive)
+
+        with RollingStatWindowManager._lock:
+            stats = RollingStatWindowManager._liveWindow(store, now)
+            stats.advanceTo(bucket)
+            # first vote of a new hour:  the oldest hour just left the window
+            newHour = stats.slotTotals[bucket % RollingStatWindow.SLOTS] == 0
+            priorGlobal, reordered = stats.increment(field)
+
+            # check firebase updates are required
+            updateFirebase = (
+                newHour
+                or stats.percentIncreased(GLOBAL_PERCENT_INCREASE, priorGlobal)
+                or reordered
+            )
+            # if needed, update firebase
+            if updateFirebase:
+                stats.updateFirebase()
+
+        # atomic in the store;  concurrent votes on other instances all count
+        store.increment(bucket, {field: 1, TOTAL_FIELD: 1})
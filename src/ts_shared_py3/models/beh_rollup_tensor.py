@@ -0,0 +1,260 @@
+"""
+array form of many BehaviorRollup shard recs
+
+    slots[row, sex, voteType, slot]   int64 (slot 0-3 == s1-s4)
+    counts[row, sex, voteType]        int64 (VoteTypeRollup.count)
+    codes[row]                        behCode of each row
+sex axis follows SEX_ORDER & voteType axis follows VOTE_TYPE_ORDER
+(the same order as VoteTypeMsg fields & VoteTypeRollup.vtrListAllTypes)
+
+ndb models are converted only at the edges (fromRollups / writeInto / msgs);
+shard merges, percentages & consensus weights are numpy ops over all rows
+
+benchmark (2000 shards):  python -m ts_shared_py3.models.beh_rollup_tensor <proj_root>
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from ..enums.sex import Sex
+from ..enums.voteType import VoteType
+from ..api_data_classes.behavior import BehStatMsg, VoteTypeMsg, BehVoteStatsMsg
+
+if TYPE_CHECKING:
+    from .beh_global import BehaviorRollup
+
+
+SEX_ORDER = (Sex.FEMALE, Sex.MALE, Sex.UNKNOWN)
+VOTE_TYPE_ORDER = (VoteType.FEELING, VoteType.CONCERN, VoteType.FREQUENCY)
+SLOT_COUNT = 4
+
+_typePos: Dict[int, int] = {vt.value: i for i, vt in enumerate(VOTE_TYPE_ORDER)}
+# count + 4 slots per (sex, voteType)
+_CELL = SLOT_COUNT + 1
+_SEX_STRIDE = len(VOTE_TYPE_ORDER) * _CELL
+_ROW_STRIDE = len(SEX_ORDER) * _SEX_STRIDE
+
+
+class RollupTensor(object):
+    def __init__(
+        self: RollupTensor,
+        codes: Tuple[str, ...],
+        slots: np.ndarray,
+        counts: np.ndarray,
+    ) -> None:
+        self.codes = codes
+        self.slots = slots
+        self.counts = counts
+
+    def __len__(self: RollupTensor) -> int:
+        return len(self.codes)
+
+    @staticmethod
+    def fromRollups(recs: Sequence[BehaviorRollup]) -> RollupTensor:
+        # one python pass over the ndb structs;  everything after is numpy
+        flat = [0] * (len(recs) * _ROW_STRIDE)
+        for r, rec in enumerate(recs):
+            sexLists = (rec.femaleCounts, rec.maleCounts, rec.unknownCounts)
+            for s, vtrList in enumerate(sexLists):
+                base = r * _ROW_STRIDE + s * _SEX_STRIDE
+                for vtr in vtrList:
+                    at = base + _typePos[int(vtr.voteType)] * _CELL
+                    flat[at : at + _CELL] = (vtr.count, vtr.s1, vtr.s2, vtr.s3, vtr.s4)
+        cells = np.array(flat, dtype=np.int64).reshape(
+            len(recs), len(SEX_ORDER), len(VOTE_TYPE_ORDER), _CELL
+        )
+        return RollupTensor(
+            tuple(rec.code for rec in recs), cells[..., 1:], cells[..., 0]
+        )
+
+    def sumByCode(self: RollupTensor) -> RollupTensor:
+        """merge all shard rows of each code (codes keep first-seen order)"""
+        rowByCode = {cd: i for i, cd in enumerate(dict.fromkeys(self.codes))}
+        if len(rowByCode) == len(self.codes):
+            return self
+        rows = np.fromiter((rowByCode[cd] for cd in self.codes), np.intp)
+        slots = np.zeros((len(rowByCode),) + self.slots.shape[1:], np.int64)
+        counts = np.zeros((len(rowByCode),) + self.counts.shape[1:], np.int64)
+        np.add.at(slots, rows, self.slots)
+        np.add.at(counts, rows, self.counts)
+        return RollupTensor(tuple(rowByCode), slots, counts)
+
+    def unifiedArrays(
+        self: RollupTensor, voteType: VoteType
+    ) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+        """per code totals for one vote type, all sexes combined
+        (what BehaviorRollup._unifyStats builds):  (codes, counts[n], slots[n, 4])
+        """
+        summed = self.sumByCode()
+        t = _typePos[int(voteType)]
+        return (
+            summed.codes,
+            summed.counts[:, :, t].sum(axis=1),
+            summed.slots[:, :, t, :].sum(axis=1),
+        )
+
+    def pctSlots(self: RollupTensor) -> np.ndarray:
+        # CountTotals._slotsToPct for every row, sex & vote type at once
+        return _slotsToPct(self.slots, self.counts)
+
+    def consensusWeights(self: RollupTensor, voteType: VoteType) -> np.ndarray:
+        """VoteTypeRollup.consensusWeight per [row, sex]
+        nan where a cell has no votes (the scalar version divides by zero)
+        """
+        t = _typePos[int(voteType)]
+        slots = self.slots[:, :, t, :]
+        weighted = slots @ np.asarray(VoteType(voteType).consensusWeights)
+        votes = slots.sum(axis=-1)
+        return np.divide(
+            weighted, votes, out=np.full(weighted.shape, np.nan), where=votes > 0
+        )
+
+    def toVoteStatsMsg(
+        self: RollupTensor, row: int, categoryName: str = "", asPct: bool = False
+    ) -> BehVoteStatsMsg:
+        """BehVoteStatsMsg for one row (percent slots like convertAllCountsToPct)"""
+        counts = self.counts[row]
+        slots = _slotsToPct(self.slots[row], counts) if asPct else self.slots[row]
+        countList, slotList = counts.tolist(), slots.tolist()
+
+        def _voteTypeMsg(s: int) -> VoteTypeMsg:
+            feeling, concern, frequency = (
+                BehStatMsg(totCount=countList[s][t], slotCounts=slotList[s][t])
+                for t in range(len(VOTE_TYPE_ORDER))
+            )
+            return VoteTypeMsg(feeling=feeling, concern=concern, frequency=frequency)
+
+        msg = BehVoteStatsMsg(
+            behaviorCode=self.codes[row],
+            female=_voteTypeMsg(0),
+            male=_voteTypeMsg(1),
+            unknown=_voteTypeMsg(2),
+        )
+        msg.categoryName = categoryName
+        return msg
+
+    def writeInto(self: RollupTensor, row: int, rec: BehaviorRollup) -> None:
+        # persistence boundary:  copy one row back onto an ndb rec
+        countList, slotList = self.counts[row].tolist(), self.slots[row].tolist()
+        sexLists = (rec.femaleCounts, rec.maleCounts, rec.unknownCounts)
+        for s, vtrList in enumerate(sexLists):
+            for vtr in vtrList:
+                t = _typePos[int(vtr.voteType)]
+                vtr.count = countList[s][t]
+                vtr.s1, vtr.s2, vtr.s3, vtr.s4 = slotList[s][t]
+
+
+def _slotsToPct(slots: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # same truncation & data checks as CountTotals._slotsToPct
+    votes = slots.sum(axis=-1)
+    bad = np.where(counts <= 1, votes >= 2, votes != counts)
+    assert not bad.any(), "bad data: slot sums {0} != counts {1}".format(
+        votes[bad].tolist(), counts[bad].tolist()
+    )
+    totals = np.maximum(counts, 1)[..., None].astype(np.float64)
+    return np.trunc(slots / totals * 100).astype(np.int64)
+
+
+def benchRollupTensor(shards: int = 2000, codes: int = 100, seed: int = 7) -> None:
+    """old per-VoteTypeRollup loops vs the tensor on a synthetic rollup"""
+    import random
+    from ..utils.bench import bestMs
+    from .beh_global import BehaviorRollup, CountTotals, VoteInfo, behaviorDataShared
+
+    rnd = random.Random(seed)
+    behCodes = behaviorDataShared.allBehaviorCodes(False)[:codes]
+    recs: List[BehaviorRollup] = []
+    for i in range(shards):
+        behCode = behCodes[i % len(behCodes)]
+        cat, subCat = behaviorDataShared.catAndSubForCode(behCode)
+        rec = BehaviorRollup._newBehaviorRollup(
+            VoteInfo(Sex.FEMALE, VoteType.FEELING, 1, behCode, cat, subCat, False)
+        )
+        for vtr in rec.femaleCounts + rec.maleCounts + rec.unknownCounts:
+            for slot in range(1, 5):
+                vtr.add(slot, rnd.randint(0, 50))
+        recs.append(rec)
+
+    def _oldUnify() -> Dict[VoteType, Dict]:
+        byType = dict()
+        for voteType in VOTE_TYPE_ORDER:
+            aggDict = dict()
+            for rec in recs:
+                rec._unifyStats(voteType, aggDict)
+            byType[voteType] = aggDict
+        return byType
+
+    def _newUnify(tensor: RollupTensor) -> Dict[VoteType, Tuple]:
+        summed = tensor.sumByCode()
+        return {vt: summed.unifiedArrays(vt) for vt in VOTE_TYPE_ORDER}
+
+    def _oldStatsMsgs() -> List[BehVoteStatsMsg]:
+        byCode: Dict[str, CountTotals] = dict()
+        for rec in recs:
+            if rec.code in byCode:
+                byCode[rec.code].append(rec)
+            else:
+                byCode[rec.code] = CountTotals(rec)
+        for totals in byCode.values():
+            totals.convertAllCountsToPct()
+        return [totals.toMsg() for totals in byCode.values()]
+
+    def _newStatsMsgs(tensor: RollupTensor) -> List[BehVoteStatsMsg]:
+        summed = tensor.sumByCode()
+        names = {rec.code: rec.categoryName for rec in recs[: len(summed)]}
+        return [
+            summed.toVoteStatsMsg(i, names[cd], asPct=True)
+            for i, cd in enumerate(summed.codes)
+        ]
+
+    tensor = RollupTensor.fromRollups(recs)
+
+    # parity
+    old, new = _oldUnify(), _newUnify(tensor)
+    for vt in VOTE_TYPE_ORDER:
+        newCodes, newCounts, newSlots = new[vt]
+        for i, cd in enumerate(newCodes):
+            vtr = old[vt][cd]
+            assert vtr.count == newCounts[i] and vtr.slotsAsList == newSlots[i].tolist()
+    assert _oldStatsMsgs() == _newStatsMsgs(tensor), "msg mismatch"
+    for s, vtrs in ((0, "femaleCounts"), (1, "maleCounts")):
+        oldWt = [getattr(rec, vtrs)[1].consensusWeight for rec in recs]
+        assert np.allclose(oldWt, tensor.consensusWeights(VoteType.CONCERN)[:, s])
+
+    convertMs = bestMs(lambda: RollupTensor.fromRollups(recs))
+    print(
+        "{0} shards x {1} codes   (fromRollups {2:.1f}ms)".format(
+            shards, len(behCodes), convertMs
+        )
+    )
+    print(
+        "unify 3 vote types:   loops {0:.1f}ms   tensor {1:.1f}ms".format(
+            bestMs(_oldUnify), bestMs(lambda: _newUnify(tensor))
+        )
+    )
+    print(
+        "merge + pct msgs:     loops {0:.1f}ms   tensor {1:.1f}ms".format(
+            bestMs(_oldStatsMsgs), bestMs(lambda: _newStatsMsgs(tensor))
+        )
+    )
+    print(
+        "consensus weights:    loops {0:.1f}ms   tensor {1:.2f}ms".format(
+            bestMs(
+                lambda: [
+                    vtr.consensusWeight
+                    for rec in recs
+                    for vtr in (rec.femaleCounts[1], rec.maleCounts[1])
+                ]
+            ),
+            bestMs(lambda: tensor.consensusWeights(VoteType.CONCERN)),
+        )
+    )
+
+
+if __name__ == "__main__":
+    from ..utils.bench import benchArgs
+
+    benchArgs()
+    benchRollupTensor()
@@ -0,0 +1,288 @@
+"""
+adaptive shard counts for BehaviorRollup
+
+one BehaviorShardConfig rec holds the shard count per behCode
+    codes listed in shardsByCode use that count
+    all other codes use defaultShards
+counts only ever GROW (a shrink would hide the votes in the dropped shards)
+
+writers report load with noteWrites / noteContention;  when a code goes over
+SHARD_WRITES_PER_SEC (per shard, as seen by this instance) or has
+SHARD_CONTENTION_LIMIT retried txns within one SHARD_LOAD_WINDOW_SECS window
+its count is raised to what the rate needs (at least x2 on contention)
+capped at MAX_BEHAVIOR_SHARDS
+
+legacy data is spread over all PER_BEHAVIOR_SHARDS shards so a new config
+starts with defaultShards = PER_BEHAVIOR_SHARDS;  seedShardCounts() records
+the shards each code actually uses & drops the default to MIN_BEHAVIOR_SHARDS
+run it twice, SHARD_CONFIG_CACHE_SECS apart:  the 2nd pass picks up votes
+written by instances still using the old (cached) config
+
+writers use the cached counts (shardCountFor, refreshed single flight);
+readers use currentShardConfig() (uncached) so they never miss shards that
+another instance grew within the cache window
+
+simulation (no datastore):  python -m ts_shared_py3.models.beh_shards
+"""
+
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import logging
+import math
+import threading
+import time
+
+import google.cloud.ndb as ndb
+
+PER_BEHAVIOR_SHARDS = 20  # dont reduce this # or counts will be missed
+MIN_BEHAVIOR_SHARDS = 4  # default for codes once seedShardCounts has run
+MAX_BEHAVIOR_SHARDS = 64
+SHARD_WRITES_PER_SEC = 1.0  # sustained writes one entity should take
+SHARD_CONTENTION_LIMIT = 3  # retried txns per window before growing
+SHARD_LOAD_WINDOW_SECS = 60
+SHARD_CONFIG_CACHE_SECS = 300
+
+_CONFIG_ID = "behaviorRollup"
+
+
+class BehaviorShardConfig(ndb.Model):
+    """shard count per behCode for BehaviorRollup;  key == _configKey()"""
+
+    defaultShards = ndb.IntegerProperty(indexed=False, default=PER_BEHAVIOR_SHARDS)
+    shardsByCode = ndb.JsonProperty()  # {behCode: shardCount}
+    updatedAt = ndb.DateTimeProperty(indexed=False, auto_now=True)
+
+    def countFor(self: BehaviorShardConfig, behCode: str) -> int:
+        return (self.shardsByCode or {}).get(behCode, self.defaultShards)
+
+
+def _configKey():
+    return ndb.Key(BehaviorShardConfig, _CONFIG_ID)
+
+
+# (loadedAt, defaultShards, shardsByCode);  read without the lock
+_cachedCounts: Optional[Tuple[float, int, Dict[str, int]]] = None
+# guards _cachedCounts & _fetching;  never held during an RPC
+_cacheCond = threading.Condition()
+_fetching = False
+
+
+def shardCountFor(behCode: str) -> int:
+    """# of shards behCode WRITES to (cached;  needs an ndb context)
+    readers use currentShardConfig():  another instance may have grown it
+    """
+    _, default, byCode = _currentCounts()
+    return byCode.get(behCode, default)
+
+
+def currentShardConfig() -> BehaviorShardConfig:
+    """uncached config for readers (needs an ndb context)
+    counts only grow, so this covers every shard any instance wrote to
+    """
+    rec = _configKey().get() or BehaviorShardConfig(key=_configKey())
+    _cacheConfig(rec)
+    return rec
+
+
+def _currentCounts() -> Tuple[float, int, Dict[str, int]]:
+    # single flight:  one thread fetches an expired config while the others
+    # keep using the stale counts (or wait, when there are none yet)
+    global _fetching
+    cached = _cachedCounts
+    if cached is not None and time.monotonic() - cached[0] < SHARD_CONFIG_CACHE_SECS:
+        return cached
+    with _cacheCond:
+        while True:
+            cached = _cachedCounts
+            fresh = (
+                cached is not None
+                and time.monotonic() - cached[0] < SHARD_CONFIG_CACHE_SECS
+            )
+            if fresh or (_fetching and cached is not None):
+                return cached
+            if not _fetching:
+                _fetching = True
+                break
+            _cacheCond.wait()
+
+    try:
+        _cacheConfig(_configKey().get() or BehaviorShardConfig(key=_configKey()))
+    finally:
+        # on an error a waiting thread takes over the fetch
+        with _cacheCond:
+            _fetching = False
+            _cacheCond.notify_all()
+    return _cachedCounts
+
+
+def _cacheConfig(rec: BehaviorShardConfig) -> None:
+    global _cachedCounts
+    with _cacheCond:
+        _cachedCounts = (
+            time.monotonic(),
+            rec.defaultShards,
+            dict(rec.shardsByCode or {}),
+        )
+        _cacheCond.notify_all()
+
+
+def shardsNeeded(current: int, writesPerSec: float, retriedTxns: int) -> int:
+    """growth policy (pure;  also drives the simulation)"""
+    needed = current
+    if writesPerSec / current > SHARD_WRITES_PER_SEC:
+        needed = math.ceil(writesPerSec / SHARD_WRITES_PER_SEC)
+    if retriedTxns >= SHARD_CONTENTION_LIMIT:
+        needed = max(needed, current * 2)
+    return min(max(needed, current), MAX_BEHAVIOR_SHARDS)
+
+
+def growShards(newCounts: Dict[str, int]) -> None:
+    """raise shard counts (never lowers one)"""
+
+    @ndb.transactional(retries=3)
+    def _grow() -> BehaviorShardConfig:
+        rec = _configKey().get() or BehaviorShardConfig(key=_configKey())
+        byCode = dict(rec.shardsByCode or {})
+        for behCode, count in newCounts.items():
+            byCode[behCode] = min(
+                max(count, rec.countFor(behCode)), MAX_BEHAVIOR_SHARDS
+            )
+        rec.shardsByCode = byCode
+        rec.put()
+        return rec
+
+    rec = _grow()
+    _cacheConfig(rec)
+    logging.info("BehaviorRollup shards grown: {0}".format(newCounts))
+
+
+def seedShardCounts() -> Dict[str, int]:
+    """record the shards each code already uses & lower the default
+    keys-only scan of BehaviorRollup;  see module doc before running
+    """
+    usedByCode: Dict[str, int] = dict()
+    for key in ndb.Query(kind="BehaviorRollup").iter(keys_only=True):
+        behCode, _, idx = key.id().rpartition("_")
+        usedByCode[behCode] = max(usedByCode.get(behCode, 0), int(idx) + 1)
+
+    @ndb.transactional(retries=3)
+    def _seed() -> BehaviorShardConfig:
+        rec = _configKey().get() or BehaviorShardConfig(key=_configKey())
+        byCode = dict(rec.shardsByCode or {})
+        for behCode, used in usedByCode.items():
+            byCode[behCode] = max(used, MIN_BEHAVIOR_SHARDS, byCode.get(behCode, 0))
+        rec.shardsByCode = byCode
+        rec.defaultShards = MIN_BEHAVIOR_SHARDS
+        rec.put()
+        return rec
+
+    _cacheConfig(_seed())
+    return usedByCode
+
+
+# write load seen by this instance in the current window
+_loadLock = threading.Lock()
+_windowStart = time.monotonic()
+_writesByCode: Counter = Counter()
+_retriesByCode: Counter = Counter()
+
+
+def noteWrites(behCode: str, entities: int = 1) -> None:
+    # call after each shard put
+    with _loadLock:
+        _writesByCode[behCode] += entities
+    _maybeRollWindow()
+
+
+def noteContention(behCodes: Iterable[str]) -> None:
+    # call when a shard txn had to be retried (or failed)
+    with _loadLock:
+        _retriesByCode.update(behCodes)
+    _maybeRollWindow()
+
+
+def _maybeRollWindow() -> None:
+    global _windowStart, _writesByCode, _retriesByCode
+    now = time.monotonic()
+    if now - _windowStart < SHARD_LOAD_WINDOW_SECS:
+        return
+    with _loadLock:
+        elapsed = now - _windowStart
+        if elapsed < SHARD_LOAD_WINDOW_SECS:
+            return  # another thread rolled it
+        writes, retries = _writesByCode, _retriesByCode
+        _writesByCode, _retriesByCode = Counter(), Counter()
+        _windowStart = now
+
+    # runs after votes were written:  a config read/write error must not
+    # reach (& fail) the caller
+    try:
+        grow: Dict[str, int] = dict()
+        for behCode in set(writes) | set(retries):
+            current = shardCountFor(behCode)
+            needed = shardsNeeded(current, writes[behCode] / elapsed, retries[behCode])
+            if needed > current:
+                grow[behCode] = needed
+        if len(grow) > 0:
+            growShards(grow)
+    except Exception:
+        # try again after the next window
+        logging.exception("BehaviorRollup shard growth failed")
+
+
+def simulateZipf(
+    codes: int = 200,
+    votesPerSec: float = 200.0,
+    minutes: int = 60,
+    zipfS: float = 1.1,
+    seed: int = 7,
+) -> None:
+    """skewed (Zipfian) vote load:  fixed PER_BEHAVIOR_SHARDS vs adaptive counts
+    direct write path (one shard put per vote);  no datastore involved
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    probs = 1.0 / np.arange(1, codes + 1) ** zipfS
+    probs /= probs.sum()
+
+    fixed = np.full(codes, PER_BEHAVIOR_SHARDS)
+    adaptive = np.full(codes, MIN_BEHAVIOR_SHARDS)
+    grownAt: List[int] = []
+    for minute in range(minutes):
+        writes = rng.multinomial(int(votesPerSec * SHARD_LOAD_WINDOW_SECS), probs)
+        rates = writes / SHARD_LOAD_WINDOW_SECS
+        for i in np.nonzero(rates / adaptive > SHARD_WRITES_PER_SEC)[0]:
+            adaptive[i] = shardsNeeded(int(adaptive[i]), float(rates[i]), 0)
+            grownAt.append(minute)
+
+    rates = probs * votesPerSec  # steady state
+    for label, counts in (("fixed", fixed), ("adaptive", adaptive)):
+        perShard = rates / counts
+        print(
+            "{0:<9} keys per full read {1:>5}   hottest shard {2:.2f} writes/s   "
+            "codes over {3}/s per shard: {4}".format(
+                label,
+                int(counts.sum()),
+                float(perShard.max()),
+                SHARD_WRITES_PER_SEC,
+                int((perShard > SHARD_WRITES_PER_SEC).sum()),
+            )
+        )
+    print(
+        "{0} codes, {1} votes/s, zipf s={2}:  {3} growth steps (last at minute {4}), "
+        "max shards {5}".format(
+            codes,
+            votesPerSec,
+            zipfS,
+            len(grownAt),
+            grownAt[-1] if grownAt else "-",
+            int(adaptive.max()),
+        )
+    )
+
+
+if __name__ == "__main__":
+    simulateZipf()
+    simulateZipf(votesPerSec=20.0)
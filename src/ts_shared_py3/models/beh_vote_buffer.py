@@ -0,0 +1,260 @@
+"""
+write-behind buffer for BehaviorRollup vote counts
+
+BehaviorRollup.updateStats used to cost a shard get + put for EVERY vote
+while the buffer is running, updateStats only adds the vote to an
+in-process delta table:
+    {behCode: {(sex, voteType, slot): votes}}
+and a daemon thread flushes it every VOTE_FLUSH_SECS
+(or sooner once VOTE_FLUSH_MAX_PENDING votes are waiting)
+
+each flush picks one random shard per behCode and writes them in chunks of
+VOTE_FLUSH_CODES_PER_TXN with one get_multi + put_multi inside a transaction
+a chunk that fails is merged back into the buffer (retried next flush)
+along with the chunks after it;  committed chunks are never requeued
+stop() (also registered with atexit) closes the buffer to new votes (add()
+then returns False & callers write directly) and keeps flushing until empty
+
+    BehaviorVoteBuffer().start()        # at app startup
+    BehaviorRollup.updateStats([...])   # unchanged for callers
+
+load test (datastore emulator):  see beh_vote_loadtest.py
+"""
+
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import atexit
+import json
+import logging
+import random
+import threading
+
+import google.cloud.ndb as ndb
+
+from ..utils.singleton import Singleton
+from .beh_global import BehaviorRollup, VoteInfo, _makeBehStatsShardKey
+from .beh_shards import shardCountFor, noteWrites, noteContention
+
+VOTE_FLUSH_SECS = 5.0
+VOTE_FLUSH_MAX_PENDING = 500  # votes waiting before an early flush
+VOTE_FLUSH_CODES_PER_TXN = 25  # shard recs written per transaction
+VOTE_FLUSH_TXN_RETRIES = 3
+VOTE_FLUSH_SHUTDOWN_ATTEMPTS = 3
+
+# (sex, voteType, slot) -> votes
+SlotDeltas = Dict[Tuple[int, int, int], int]
+
+
+class BehaviorVoteBuffer(metaclass=Singleton):
+    """thread safe;  one per process"""
+
+    def __init__(self: BehaviorVoteBuffer, ndbClient: ndb.Client = None) -> None:
+        self._ndbClient: Optional[ndb.Client] = ndbClient
+        self._lock = threading.Lock()  # guards _pending & _pendingVotes
+        self._flushLock = threading.Lock()  # one flush at a time
+        self._pending: Dict[str, SlotDeltas] = dict()
+        self._pendingVotes: int = 0
+        self._accepting = False  # guarded by _lock;  False once stop() begins
+        # first VoteInfo seen per behCode;  used to create missing shard recs
+        self._voteInfoByCode: Dict[str, VoteInfo] = dict()
+        self._flushNow = threading.Event()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._atexitRegistered = False
+
+    @property
+    def isRunning(self: BehaviorVoteBuffer) -> bool:
+        return self._flusher is not None and self._flusher.is_alive()
+
+    @property
+    def pendingVotes(self: BehaviorVoteBuffer) -> int:
+        return self._pendingVotes
+
+    def add(self: BehaviorVoteBuffer, listVoteInfo: List[VoteInfo]) -> bool:
+        """False (nothing buffered) when stopped or stopping;  write directly"""
+        with self._lock:
+            if not self._accepting:
+                return False
+            for vi in listVoteInfo:
+                self._voteInfoByCode.setdefault(vi.behCode, vi)
+                deltas = self._pending.setdefault(vi.behCode, dict())
+                slotKey = (vi.sex, vi.voteType, vi.voteSlot)
+                deltas[slotKey] = deltas.get(slotKey, 0) + 1
+            self._pendingVotes += len(listVoteInfo)
+            full = self._pendingVotes >= VOTE_FLUSH_MAX_PENDING
+        if full:
+            self._flushNow.set()
+        return True
+
+    def start(self: BehaviorVoteBuffer, flushSecs: float = VOTE_FLUSH_SECS) -> None:
+        if self.isRunning:
+            return
+        if not self._atexitRegistered:
+            atexit.register(self.stop)
+            self._atexitRegistered = True
+        self._stopping.clear()
+        with self._lock:
+            self._accepting = True
+        self._flusher = threading.Thread(
+            target=self._flushLoop,
+            args=(flushSecs,),
+            name="behaviorVoteFlusher",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def stop(self: BehaviorVoteBuffer) -> None:
+        """stop the flusher & write everything still buffered"""
+        with self._lock:
+            # after this no add() can land behind the final drain
+            self._accepting = False
+        self._stopping.set()
+        self._flushNow.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+        for _ in range(VOTE_FLUSH_SHUTDOWN_ATTEMPTS):
+            if self._pendingVotes == 0:
+                return
+            self.flush()
+        if self._pendingVotes > 0:
+            # out of options;  leave the counts in the log so they can be replayed
+            logging.error(
+                "BehaviorVoteBuffer: {0} votes NOT written at shutdown: {1}".format(
+                    self._pendingVotes, json.dumps(self._pendingAsJson())
+                )
+            )
+
+    def flush(self: BehaviorVoteBuffer) -> int:
+        """write all buffered deltas;  returns # of votes written"""
+        with self._flushLock:
+            with self._lock:
+                pending, self._pending = self._pending, dict()
+                self._pendingVotes = 0
+                voteInfoByCode = dict(self._voteInfoByCode)
+            if len(pending) == 0:
+                return 0
+            writing: List[bool] = []  # set once _writeAll owns the requeue
+
+            def _write() -> int:
+                writing.append(True)
+                return self._writeAll(pending, voteInfoByCode)
+
+            try:
+                return self._inNdbContext(_write)
+            except Exception:
+                if len(writing) == 0:
+                    # no ndb context / client;  nothing was written
+                    self._requeue(pending)
+                raise
+
+    def _writeAll(
+        self: BehaviorVoteBuffer,
+        pending: Dict[str, SlotDeltas],
+        voteInfoByCode: Dict[str, VoteInfo],
+    ) -> int:
+        # requeues every code not committed, however this exits
+        codes = list(pending.keys())
+        committed: Set[str] = set()
+        written = 0
+        try:
+            # outside the txns:  the config rec must not join their read sets
+            shardCounts = {cd: shardCountFor(cd) for cd in codes}
+            for start in range(0, len(codes), VOTE_FLUSH_CODES_PER_TXN):
+                chunk = codes[start : start + VOTE_FLUSH_CODES_PER_TXN]
+                attempts = [0]
+                try:
+                    ndb.transaction(
+                        lambda: _writeChunk(
+                            chunk, pending, voteInfoByCode, shardCounts, attempts
+                        ),
+                        retries=VOTE_FLUSH_TXN_RETRIES,
+                    )
+                except Exception:
+                    logging.exception("BehaviorVoteBuffer flush failed;  requeued")
+                    _noteLoad(noteContention, chunk)
+                    break
+                committed.update(chunk)
+                written += sum(sum(pending[cd].values()) for cd in chunk)
+                if attempts[0] > 1:
+                    _noteLoad(noteContention, chunk)
+                for behCode in chunk:
+                    _noteLoad(noteWrites, behCode)
+        finally:
+            if len(committed) < len(codes):
+                self._requeue(
+                    {cd: d for cd, d in pending.items() if cd not in committed}
+                )
+        return written
+
+    def _requeue(self: BehaviorVoteBuffer, unwritten: Dict[str, SlotDeltas]) -> None:
+        # merge back under anything added since the flush began
+        with self._lock:
+            for behCode, deltas in unwritten.items():
+                current = self._pending.setdefault(behCode, dict())
+                for slotKey, votes in deltas.items():
+                    current[slotKey] = current.get(slotKey, 0) + votes
+                self._pendingVotes += sum(deltas.values())
+
+    def _flushLoop(self: BehaviorVoteBuffer, flushSecs: float) -> None:
+        while not self._stopping.is_set():
+            self._flushNow.wait(flushSecs)
+            self._flushNow.clear()
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("BehaviorVoteBuffer flush loop")
+
+    def _inNdbContext(self: BehaviorVoteBuffer, work: Callable[[], int]) -> int:
+        # flusher thread & atexit have no request context of their own
+        if ndb.context.get_context(False) is not None:
+            return work()
+        if self._ndbClient is None:
+            from ..services.ndb.client import get_ndb_client
+
+            self._ndbClient = get_ndb_client()
+        with self._ndbClient.context():
+            return work()
+
+    def _pendingAsJson(self: BehaviorVoteBuffer) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                behCode: {
+                    "{0}-{1}-{2}".format(*slotKey): votes
+                    for slotKey, votes in deltas.items()
+                }
+                for behCode, deltas in self._pending.items()
+            }
+
+
+def _noteLoad(noteFunc: Callable, arg) -> None:
+    # shard load bookkeeping after a commit must never fail (& requeue) the flush
+    try:
+        noteFunc(arg)
+    except Exception:
+        logging.exception("BehaviorVoteBuffer shard load bookkeeping")
+
+
+def _writeChunk(
+    chunk: List[str],
+    pending: Dict[str, SlotDeltas],
+    voteInfoByCode: Dict[str, VoteInfo],
+    shardCounts: Dict[str, int],
+    attempts: List[int],
+) -> None:
+    # runs inside a transaction (may be retried, so no side effects besides ndb)
+    attempts[0] += 1  # > 1 means the txn was retried (contention)
+    keys = [
+        _makeBehStatsShardKey(behCode, random.randint(0, shardCounts[behCode] - 1))
+        for behCode in chunk
+    ]
+    recs = ndb.get_multi(keys)
+    for i, behCode in enumerate(chunk):
+        rec = recs[i]
+        if rec is None:
+            rec = BehaviorRollup._newBehaviorRollup(voteInfoByCode[behCode])
+            rec.key = keys[i]
+            recs[i] = rec
+        rec._applyDeltas(pending[behCode])
+    ndb.put_multi(recs)
@@ -0,0 +1,92 @@
+"""
+votes/sec for BehaviorRollup.updateStats:  direct (get + put per vote)
+vs the write-behind BehaviorVoteBuffer
+
+runs against the datastore emulator only:
+    gcloud beta emulators datastore start --no-store-on-disk
+    $(gcloud beta emulators datastore env-init)
+    python -m ts_shared_py3.models.beh_vote_loadtest <proj_root> [votes] [threads]
+"""
+
+from __future__ import annotations
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def loadTest(votes: int = 2000, threads: int = 8) -> None:
+    # imported here so the proj_root can be set first
+    import google.cloud.ndb as ndb
+    from ..enums.sex import Sex
+    from ..enums.voteType import VoteType
+    from .beh_global import BehaviorRollup, VoteInfo, behaviorDataShared
+    from .beh_vote_buffer import BehaviorVoteBuffer
+    from .beh_shards import currentShardConfig
+
+    assert os.environ.get("DATASTORE_EMULATOR_HOST"), "start the emulator first"
+    client = ndb.Client(project=os.environ.get("DATASTORE_PROJECT_ID", "ts-local"))
+
+    behCodes = behaviorDataShared.allBehaviorCodes(False)[:40]
+    sexes = [Sex.FEMALE, Sex.MALE, Sex.UNKNOWN]
+    voteTypes = [VoteType.FEELING, VoteType.CONCERN, VoteType.FREQUENCY]
+
+    def _randomVote() -> VoteInfo:
+        behCode = random.choice(behCodes)
+        cat, subCat = behaviorDataShared.catAndSubForCode(behCode)
+        return VoteInfo(
+            random.choice(sexes),
+            random.choice(voteTypes),
+            random.randint(1, 3),
+            behCode,
+            cat,
+            subCat,
+            False,
+        )
+
+    def _totalStoredVotes() -> int:
+        with client.context():
+            shardConfig = currentShardConfig()
+            keys = [
+                k for cd in behCodes for k in BehaviorRollup.all_keys(cd, shardConfig)
+            ]
+            recs = [r for r in ndb.get_multi(keys) if r is not None]
+        return sum(
+            vtr.count
+            for r in recs
+            for vtr in r.femaleCounts + r.maleCounts + r.unknownCounts
+        )
+
+    def _vote(_) -> None:
+        with client.context():
+            BehaviorRollup.updateStats([_randomVote()])
+
+    voteBuffer = BehaviorVoteBuffer(client)
+    for label, buffered in (("direct", False), ("buffered", True)):
+        if buffered:
+            voteBuffer.start()
+        before = _totalStoredVotes()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(_vote, range(votes)))
+        if buffered:
+            voteBuffer.stop()  # final flush counts toward the time
+        elapsed = time.perf_counter() - start
+
+        # direct writes race on the same shard (no txn) so they can lose votes
+        stored = _totalStoredVotes() - before
+        print(
+            "{0:<9} {1} votes / {2} threads in {3:.2f}s = {4:.0f} votes/sec  "
+            "(stored {5})".format(
+                label, votes, threads, elapsed, votes / elapsed, stored
+            )
+        )
+        if buffered:
+            assert stored == votes, "buffer lost {0} votes".format(votes - stored)
+
+
+if __name__ == "__main__":
+    from ..utils.bench import benchArgs
+
+    loadTest(*[int(a) for a in benchArgs("[votes] [threads]")[:2]])
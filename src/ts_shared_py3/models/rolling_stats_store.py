@@ -0,0 +1,304 @@
+"""
+storage for the 24 hour rolling vote stats (RollingStatWindow)
+
+votes are counted in hourly buckets (bucket == utc epoch hour);  each bucket
+holds per-category counters ("p:<catCode>" / "n:<catCode>") plus TOTAL_FIELD
+a window is simply the last WINDOW_HOURS buckets, so old hours expire by
+falling out of the read range (backends also drop them:  EXPIRE / prune / TTL)
+
+every backend makes increment() atomic across threads & instances:
+    InProcessStatsStore     dict + lock;  one process only (default)
+    RedisStatsStore         HINCRBY in a MULTI pipeline;  any redis-py
+                            compatible client (pip install redis)
+    FakeRedis               tiny in-memory stand-in for the redis client
+    DatastoreStatsStore     sharded RollingStatBucket recs, one txn per vote
+
+    setRollingStatsStore(RedisStatsStore(redis.Redis(host=...)))  # app startup
+
+concurrency check:  python -m ts_shared_py3.models.rolling_stats_store
+"""
+
+from __future__ import annotations
+from typing import Dict, Iterable, List, Tuple
+from collections import Counter
+from datetime import datetime, timedelta
+import random
+import threading
+import time
+
+import google.cloud.ndb as ndb
+
+WINDOW_HOURS = 24
+TOTAL_FIELD = "_total"
+REDIS_KEY_PREFIX = "rollingStats:"
+DATASTORE_BUCKET_SHARDS = 10
+
+# field -> count for one hourly bucket
+BucketCounts = Dict[str, int]
+
+
+def currentBucket(now: datetime = None) -> int:
+    # utc epoch hour;  bucket % 24 == utc hour of day (the window slot)
+    now = now or datetime.utcnow()
+    return int((now - datetime(1970, 1, 1)).total_seconds() // 3600)
+
+
+def bucketStart(bucket: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(hours=bucket)
+
+
+def windowBuckets(now: datetime = None) -> List[int]:
+    # oldest first;  last one is the current hour
+    cur = currentBucket(now)
+    return list(range(cur - WINDOW_HOURS + 1, cur + 1))
+
+
+def categoryField(catCode: str, positive: bool) -> str:
+    return "{0}:{1}".format("p" if positive else "n", catCode)
+
+
+def parseField(field: str) -> Tuple[str, bool]:
+    # inverse of categoryField:  (catCode, positive)
+    return field[2:], field[0] == "p"
+
+
+class RollingStatsStore(object):
+    """backend interface"""
+
+    def increment(self: RollingStatsStore, bucket: int, fields: BucketCounts) -> None:
+        """atomically add every field's amount in one hourly bucket"""
+        raise NotImplementedError()
+
+    def loadBuckets(
+        self: RollingStatsStore, buckets: Iterable[int]
+    ) -> Dict[int, BucketCounts]:
+        """counts for each requested bucket ({} for empty/expired ones)"""
+        raise NotImplementedError()
+
+
+class InProcessStatsStore(RollingStatsStore):
+    def __init__(self: InProcessStatsStore) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Counter] = dict()
+
+    def increment(self: InProcessStatsStore, bucket: int, fields: BucketCounts) -> None:
+        with self._lock:
+            self._buckets.setdefault(bucket, Counter()).update(fields)
+            # expire hours that left the window
+            oldest = bucket - WINDOW_HOURS
+            for old in [b for b in self._buckets if b <= oldest]:
+                del self._buckets[old]
+
+    def loadBuckets(
+        self: InProcessStatsStore, buckets: Iterable[int]
+    ) -> Dict[int, BucketCounts]:
+        with self._lock:
+            return {b: dict(self._buckets.get(b, {})) for b in buckets}
+
+
+class RedisStatsStore(RollingStatsStore):
+    """one redis hash per bucket;  expires an hour after it leaves the window"""
+
+    def __init__(self: RedisStatsStore, client) -> None:
+        self._client = client
+        self._ttlSecs = (WINDOW_HOURS + 1) * 3600
+
+    def increment(self: RedisStatsStore, bucket: int, fields: BucketCounts) -> None:
+        key = REDIS_KEY_PREFIX + str(bucket)
+        pipe = self._client.pipeline(transaction=True)
+        for field, amount in fields.items():
+            pipe.hincrby(key, field, amount)
+        pipe.expire(key, self._ttlSecs)
+        pipe.execute()
+
+    def loadBuckets(
+        self: RedisStatsStore, buckets: Iterable[int]
+    ) -> Dict[int, BucketCounts]:
+        buckets = list(buckets)
+        pipe = self._client.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(REDIS_KEY_PREFIX + str(bucket))
+        loaded = dict()
+        for bucket, raw in zip(buckets, pipe.execute()):
+            loaded[bucket] = {_text(f): int(v) for f, v in (raw or {}).items()}
+        return loaded
+
+
+def _text(field) -> str:
+    return field.decode("utf-8") if isinstance(field, bytes) else field
+
+
+class FakeRedis(object):
+    """the slice of the redis-py client RedisStatsStore uses
+    (hincrby, hgetall, expire, pipeline) for local runs & tests
+    """
+
+    def __init__(self: FakeRedis, clock=time.monotonic) -> None:
+        self._lock = threading.RLock()
+        self._hashes: Dict[str, Dict[bytes, int]] = dict()
+        self._expiresAt: Dict[str, float] = dict()
+        self._clock = clock
+
+    def hincrby(self: FakeRedis, key: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            self._dropIfExpired(key)
+            fields = self._hashes.setdefault(key, dict())
+            name = field.encode("utf-8")
+            fields[name] = fields.get(name, 0) + amount
+            return fields[name]
+
+    def hgetall(self: FakeRedis, key: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            self._dropIfExpired(key)
+            return {
+                f: str(v).encode("utf-8") for f, v in self._hashes.get(key, {}).items()
+            }
+
+    def expire(self: FakeRedis, key: str, secs: int) -> bool:
+        with self._lock:
+            if key not in self._hashes:
+                return False
+            self._expiresAt[key] = self._clock() + secs
+            return True
+
+    def pipeline(self: FakeRedis, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    def _dropIfExpired(self: FakeRedis, key: str) -> None:
+        expiresAt = self._expiresAt.get(key)
+        if expiresAt is not None and self._clock() >= expiresAt:
+            self._hashes.pop(key, None)
+            del self._expiresAt[key]
+
+
+class _FakePipeline(object):
+    # queues calls & runs them under the client lock (MULTI/EXEC)
+
+    def __init__(self: _FakePipeline, client: FakeRedis) -> None:
+        self._client = client
+        self._calls: List[Tuple[str, tuple]] = []
+
+    def __getattr__(self: _FakePipeline, name: str):
+        def _queue(*args):
+            self._calls.append((name, args))
+            return self
+
+        return _queue
+
+    def execute(self: _FakePipeline) -> list:
+        with self._client._lock:
+            results = [getattr(self._client, name)(*args) for name, args in self._calls]
+        self._calls = []
+        return results
+
+
+class RollingStatBucket(ndb.Model):
+    """one shard of an hourly bucket;  key == _makeBucketShardKey
+    set a datastore TTL policy on expireAt to delete old hours
+    """
+
+    counts = ndb.JsonProperty()  # {field: count}
+    expireAt = ndb.DateTimeProperty(indexed=True)
+
+
+def _makeBucketShardKey(bucket: int, shard: int):
+    return ndb.Key(RollingStatBucket, "{0}_{1:d}".format(bucket, shard))
+
+
+class DatastoreStatsStore(RollingStatsStore):
+    """fallback without redis;  a window read is WINDOW_HOURS x shards keys"""
+
+    def __init__(
+        self: DatastoreStatsStore, shards: int = DATASTORE_BUCKET_SHARDS
+    ) -> None:
+        self._shards = shards
+
+    def increment(self: DatastoreStatsStore, bucket: int, fields: BucketCounts) -> None:
+        key = _makeBucketShardKey(bucket, random.randint(0, self._shards - 1))
+
+        @ndb.transactional(retries=3)
+        def _add() -> None:
+            rec = key.get() or RollingStatBucket(
+                key=key,
+                counts=dict(),
+                expireAt=bucketStart(bucket) + timedelta(hours=WINDOW_HOURS + 1),
+            )
+            counts = dict(rec.counts or {})
+            for field, amount in fields.items():
+                counts[field] = counts.get(field, 0) + amount
+            rec.counts = counts
+            rec.put()
+
+        _add()
+
+    def loadBuckets(
+        self: DatastoreStatsStore, buckets: Iterable[int]
+    ) -> Dict[int, BucketCounts]:
+        buckets = list(buckets)
+        keys = [
+            _makeBucketShardKey(b, shard)
+            for b in buckets
+            for shard in range(self._shards)
+        ]
+        loaded: Dict[int, Counter] = {b: Counter() for b in buckets}
+        for key, rec in zip(keys, ndb.get_multi(keys)):
+            if rec is not None:
+                loaded[int(key.id().split("_")[0])].update(rec.counts or {})
+        return {b: dict(c) for b, c in loaded.items()}
+
+
+_store: RollingStatsStore = InProcessStatsStore()
+
+
+def rollingStatsStore() -> RollingStatsStore:
+    return _store
+
+
+def setRollingStatsStore(store: RollingStatsStore) -> None:
+    global _store
+    _store = store
+
+
+def concurrencyCheck(threads: int = 8, votes: int = 2000) -> None:
+    """no lost increments under concurrent votes;  hourly expiry"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    now = datetime(2024, 5, 1, 13, 30)
+    bucket = currentBucket(now)
+    fakeClock = [0.0]
+    stores = [
+        ("in-process", InProcessStatsStore()),
+        ("fake redis", RedisStatsStore(FakeRedis(lambda: fakeClock[0]))),
+    ]
+    for label, store in stores:
+
+        def _vote(i: int) -> None:
+            field = categoryField("cat{0}".format(i % 5), i % 2 == 0)
+            store.increment(bucket - (i % 3), {field: 1, TOTAL_FIELD: 1})
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(_vote, range(threads * votes)))
+        elapsed = time.perf_counter() - start
+
+        loaded = store.loadBuckets(windowBuckets(now))
+        total = sum(c.get(TOTAL_FIELD, 0) for c in loaded.values())
+        perCat = sum(
+            v for c in loaded.values() for f, v in c.items() if f != TOTAL_FIELD
+        )
+        assert total == perCat == threads * votes, "lost increments"
+
+        # a day later every bucket has left the window
+        fakeClock[0] += (WINDOW_HOURS + 1) * 3600
+        store.increment(bucket + WINDOW_HOURS + 1, {TOTAL_FIELD: 1})
+        later = store.loadBuckets(range(bucket - 2, bucket + 1))
+        assert all(len(c) == 0 for c in later.values()), "old buckets not expired"
+        print(
+            "{0:<11} {1} increments / {2} threads in {3:.2f}s:  counts ok, expiry ok".format(
+                label, threads * votes, threads, elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    concurrencyCheck()
@@ -1,4 +1,4 @@
-import logging, json
+import logging, json, time
 from typing import Dict, Any
 
 #
@@ -37,6 +37,17 @@ class StatsTasks:
         #     raise
         #     # assert False, "catch me"
 
+    @staticmethod
+    def rebuildRollupAggregatesTask(pos: bool = False, everyMins: int = 30):
+        # handler calls BehaviorRollup.rebuildAggregates(pos)
+        # task name is per time bucket so overlapping crons only queue one rebuild
+        bucket = int(time.time() // (everyMins * 60))
+        do_background_work(
+            QueuedWorkTyp.STATS_ROLLUPAGGREGATE,
+            json.dumps({"positive": pos}),
+            taskName="rollupAggregate-{0}-{1}".format("pos" if pos else "neg", bucket),
+        )
+
     @staticmethod
     def postForgeDailyStatsTask(forgeStatsMsg):
         # put arguements into json format for queue.
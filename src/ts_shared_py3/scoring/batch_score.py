@@ -0,0 +1,348 @@
+"""
+vectorized ScoreRuleType scoring for many entries at once
+
+the scalar path, per InputEntryAdapter:
+    mpn = ruleType.minAndNotchForUserAndCommunity(appImpact, communityHybrid)
+    appScore = ruleType.appUserScoreFunc()(mpn.appMin, mpn.appNotch, dataVals)
+    commScore = ruleType.communityHybridScoreFunc()(
+        mpn.communityMin, mpn.communityNotch, dataVals
+    )
+here each step is one numpy pass over aligned arrays:
+    minAndNotchBatch   ->  appMin, appNotch, communityMin, communityNotch
+    scoreBatch         ->  scores for one scope (min & notch arrays)
+    scoreEntriesBatch  ->  (appScores, communityScores)
+same rounding (round() to IMPACT_WEIGHT_DECIMALS), notch bounding & clamping
+as the scalar code;  the scalar asserts become one check over the batch
+(AssertionError naming the bad rows)
+
+commit level changes (incl BREAKUP) get min & notch 0.0 and score == minWeight
+(_clChangehCalc);  pass posOrNegPoints as minWeight to scoreBatch for those
+
+parity check & benchmark:  python -m ts_shared_py3.scoring.batch_score
+"""
+
+from __future__ import annotations
+from typing import Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+from ..enums.scoreRuleType import ScoreRuleType
+from ..constants import IMPACT_WEIGHT_DECIMALS
+
+# calc kind per ruleType int (index == ScoreRuleType value)
+KIND_NONE = 0  # no scoring method (communication, pre-scored)
+KIND_BEH_OR_FEELING = 1
+KIND_VAL_ASSESS = 2
+KIND_INCIDENT = 3
+KIND_COMMIT_CHANGE = 4
+
+
+def _buildKindTable() -> np.ndarray:
+    kinds = np.zeros(max(rt.value for rt in ScoreRuleType) + 1, np.int8)
+    for rt in ScoreRuleType:
+        if rt.isFeelingOrBehavior:
+            kinds[rt.value] = KIND_BEH_OR_FEELING
+        elif rt.isValueAssesment:
+            kinds[rt.value] = KIND_VAL_ASSESS
+        elif rt == ScoreRuleType.INCIDENT:
+            kinds[rt.value] = KIND_INCIDENT
+        elif rt.isCommitLevelChange:
+            kinds[rt.value] = KIND_COMMIT_CHANGE
+    kinds.flags.writeable = False
+    return kinds
+
+
+_KIND_BY_RULE = _buildKindTable()
+
+
+class MinAndNotchArrays(NamedTuple):
+    # MinPlusNotchForAppAndCommunity, one row per entry
+    appMin: np.ndarray
+    appNotch: np.ndarray
+    communityMin: np.ndarray
+    communityNotch: np.ndarray
+
+
+class EntryArrays(NamedTuple):
+    """the scoring inputs of many InputEntryAdapter recs"""
+
+    ruleTypes: np.ndarray  # int ScoreRuleType values
+    codes: Tuple[str, ...]  # strArgs[0] (behCode / static code)
+    # numArgs[0] & [1]:  feeling slider | concern & frequency sliders
+    # | overlapDays & relationshipLength | posOrNegPoints;  0.0 when missing
+    val0: np.ndarray
+    val1: np.ndarray
+
+    @staticmethod
+    def fromAdapters(adapters: Iterable) -> EntryArrays:
+        # one python pass over the ndb recs;  all scoring after is numpy
+        adapters = list(adapters)
+        count = len(adapters)
+        return EntryArrays(
+            np.fromiter((a.ruleTypeInt for a in adapters), np.int64, count),
+            tuple(a.strArgs[0] if a.strArgs else "" for a in adapters),
+            np.fromiter(
+                (a.numArgs[0] if len(a.numArgs) > 0 else 0.0 for a in adapters),
+                np.float64,
+                count,
+            ),
+            np.fromiter(
+                (a.numArgs[1] if len(a.numArgs) > 1 else 0.0 for a in adapters),
+                np.float64,
+                count,
+            ),
+        )
+
+
+def kindsFor(ruleTypes: np.ndarray) -> np.ndarray:
+    ruleTypes = np.asarray(ruleTypes, np.int64)
+    known = (ruleTypes >= 0) & (ruleTypes < len(_KIND_BY_RULE))
+    _check(known, "unknown ruleType", ruleTypes)
+    return _KIND_BY_RULE[ruleTypes]
+
+
+def minAndNotchBatch(
+    ruleTypes: np.ndarray, appImpacts: np.ndarray, communityHybrids: np.ndarray
+) -> MinAndNotchArrays:
+    """ScoreRuleType.minAndNotchForUserAndCommunity for every row"""
+    kinds = kindsFor(ruleTypes)
+    app = np.asarray(appImpacts, np.float64)
+    comm = np.asarray(communityHybrids, np.float64)
+    _check(kinds != KIND_NONE, "no min & notch for ruleType", ruleTypes)
+
+    isVal = kinds == KIND_VAL_ASSESS
+    isIncident = kinds == KIND_INCIDENT
+    _check(
+        ~isIncident | ((app < -0.5) & (comm < -0.5)),
+        "invalid incident impact weight",
+        app,
+        comm,
+    )
+
+    # beh & feeling:  3 slot slider, min is one notch below the middle
+    # val assess:  4 slot slider, min is 1.5 notches below
+    scale = np.where(isVal, 4.0, 3.0)
+    notchMultiple = np.where(isVal, 1.5, 1.0)
+    appNotch = _boundedNotchSize(app, scale)
+    commNotch = _boundedNotchSize(comm, scale)
+    # 1.0 * notch is exact so beh & feeling match  impact - notch
+    appMin = app - notchMultiple * appNotch
+    commMin = comm - notchMultiple * commNotch
+
+    # incident:  min is the impact;  notch is the delta up to max of -1
+    appMin = np.where(isIncident, app, appMin)
+    commMin = np.where(isIncident, comm, commMin)
+    appNotch = np.where(isIncident, -1 - app, appNotch)
+    commNotch = np.where(isIncident, -1 - comm, commNotch)
+
+    # commit level change:  n/a
+    isCl = kinds == KIND_COMMIT_CHANGE
+    rp = IMPACT_WEIGHT_DECIMALS
+    return MinAndNotchArrays(
+        *(
+            np.where(isCl, 0.0, roundLikePython(arr, rp))
+            for arr in (appMin, appNotch, commMin, commNotch)
+        )
+    )
+
+
+def scoreBatch(
+    ruleTypes: np.ndarray,
+    minWeights: np.ndarray,
+    notchSizes: np.ndarray,
+    val0: np.ndarray,
+    val1: np.ndarray,
+) -> np.ndarray:
+    """appUserScoreFunc / communityHybridScoreFunc for every row
+    (both scopes use the same math;  only min & notch differ)
+    """
+    kinds = kindsFor(ruleTypes)
+    _check(kinds != KIND_NONE, "unknow data-type without scoring method", ruleTypes)
+    minW = np.asarray(minWeights, np.float64)
+    notch = np.asarray(notchSizes, np.float64)
+    val0 = np.asarray(val0, np.float64)
+    val1 = np.asarray(val1, np.float64)
+    scores = minW.copy()  # commit level change:  posOrNegPoints passed as min
+
+    # beh & feeling:  _behAndFeelingsCalc
+    rows = np.flatnonzero(kinds == KIND_BEH_OR_FEELING)
+    if len(rows) > 0:
+        sliderPos = np.trunc(val0[rows])  # int()
+        _check((sliderPos >= 1) & (sliderPos <= 3), "_behCalc", sliderPos)
+        score = minW[rows] + ((sliderPos - 1) * notch[rows])
+        scores[rows] = np.where(np.abs(score) > 1, np.sign(score), score)
+
+    # val assess:  _valCalcUserApp == _valCalcCommunityHybrid
+    rows = np.flatnonzero(kinds == KIND_VAL_ASSESS)
+    if len(rows) > 0:
+        concern, frequ, rowMin = val0[rows], val1[rows], minW[rows]
+        _check((concern >= 1) & (concern <= 4), "_valCalc", concern, frequ)
+        _check((frequ > 1.0) | (rowMin > 0), "weird condition", frequ, rowMin)
+        score = rowMin + ((frequ - 1) * notch[rows])
+        score = np.where(rowMin > 0, np.minimum(1, score), np.maximum(-1, score))
+        # freq slider at 1 (NEVER):  small positive min score
+        scores[rows] = np.where(frequ < 2.0, rowMin, score)
+
+    # incident:  _incidentCalc
+    rows = np.flatnonzero(kinds == KIND_INCIDENT)
+    if len(rows) > 0:
+        overlapDays = val0[rows]
+        relationshipLength = np.maximum(val1[rows], overlapDays)
+        if not (relationshipLength != 0).all():
+            raise ZeroDivisionError("incident with 0 relationshipLength")
+        overlapRatio = overlapDays / relationshipLength
+        scores[rows] = minW[rows] + (notch[rows] * overlapRatio)
+
+    return scores
+
+
+def scoreEntriesBatch(
+    ruleTypes: np.ndarray,
+    appImpacts: np.ndarray,
+    communityHybrids: np.ndarray,
+    val0: np.ndarray,
+    val1: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(appScores, communityScores) for every row"""
+    mpn = minAndNotchBatch(ruleTypes, appImpacts, communityHybrids)
+    return (
+        scoreBatch(ruleTypes, mpn.appMin, mpn.appNotch, val0, val1),
+        scoreBatch(ruleTypes, mpn.communityMin, mpn.communityNotch, val0, val1),
+    )
+
+
+def _boundedNotchSize(sliderMiddleScore: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    # ScoreRuleType._getBoundedNotchSizeBySliderScale over arrays
+    estimatedNotchSize = sliderMiddleScore / scale
+    highThreshold = np.where(scale < 4.0, 0.7510, 0.7279)
+    gapToOneOnHighSide = 1 - np.abs(sliderMiddleScore)
+    bounded = np.where(scale == 4.0, gapToOneOnHighSide * 0.6667, gapToOneOnHighSide)
+    bounded = bounded * np.where(sliderMiddleScore > 0, 1, -1)
+    return np.where(sliderMiddleScore < highThreshold, estimatedNotchSize, bounded)
+
+
+def roundLikePython(values: np.ndarray, decimals: int) -> np.ndarray:
+    """round(v, decimals) for every element
+    np.round scales first, so it can land on the other side of a .5 tie;
+    the few elements that sit that close to a tie are rounded by python
+    """
+    scale = 10.0**decimals
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    nearTie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(nearTie).tolist():
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+
+def _check(ok: np.ndarray, msg: str, *columns: np.ndarray) -> None:
+    # the scalar asserts, once per batch
+    if ok.all():
+        return
+    bad = np.flatnonzero(~ok)
+    raise AssertionError(
+        "{0}: rows {1} {2}".format(
+            msg,
+            bad[:10].tolist(),
+            [np.asarray(col)[bad[:10]].tolist() for col in columns],
+        )
+    )
+
+
+def _randomEntries(count: int, seed: int = 7) -> Tuple[np.ndarray, ...]:
+    # valid inputs for every scoreable rule type (incl high-side notch bounding)
+    rng = np.random.default_rng(seed)
+    scoreable = [rt.value for rt in ScoreRuleType if _KIND_BY_RULE[rt.value] != 0]
+    ruleTypes = rng.choice(scoreable, count)
+    kinds = _KIND_BY_RULE[ruleTypes]
+    sign = np.where(rng.random(count) < 0.5, -1.0, 1.0)
+    app = np.round(sign * rng.uniform(0.05, 0.99, count), 4)
+    comm = np.round(sign * rng.uniform(0.05, 0.99, count), 4)
+    val0 = rng.integers(1, 4, count).astype(np.float64)
+    val1 = rng.integers(1, 5, count).astype(np.float64)
+
+    isVal = kinds == KIND_VAL_ASSESS
+    val0 = np.where(isVal, rng.integers(1, 5, count), val0)
+    # NEVER (freq 1) only with a positive weight
+    val1 = np.where(isVal & (app <= 0), np.maximum(val1, 2), val1)
+    val1 = np.where(isVal & (comm <= 0), np.maximum(val1, 2), val1)
+    isIncident = kinds == KIND_INCIDENT
+    app = np.where(isIncident, -rng.uniform(0.51, 0.99, count), app)
+    comm = np.where(isIncident, -rng.uniform(0.51, 0.99, count), comm)
+    val0 = np.where(isIncident, rng.integers(1, 200, count), val0)
+    val1 = np.where(isIncident, rng.integers(1, 400, count), val1)
+    isCl = kinds == KIND_COMMIT_CHANGE
+    val0 = np.where(isCl, np.round(rng.uniform(-1, 1, count), 4), val0)
+    return ruleTypes, app, comm, val0, val1
+
+
+def _scalarScores(
+    ruleTypes, app, comm, val0, val1
+) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    # the per-entry path this module replaces
+    appScores, commScores = [], []
+    for rt, a, c, v0, v1 in zip(
+        ruleTypes.tolist(), app.tolist(), comm.tolist(), val0.tolist(), val1.tolist()
+    ):
+        ruleType = ScoreRuleType(rt)
+        mpn = ruleType.minAndNotchForUserAndCommunity(a, c)
+        dataVals = [v0, v1]
+        appScores.append(
+            ruleType.appUserScoreFunc()(mpn.appMin, mpn.appNotch, dataVals)
+        )
+        commScores.append(
+            ruleType.communityHybridScoreFunc()(
+                mpn.communityMin, mpn.communityNotch, dataVals
+            )
+        )
+    return tuple(appScores), tuple(commScores)
+
+
+def parityCheck(count: int = 50000) -> None:
+    """batch == scalar, bit for bit, on random valid entries"""
+    entries = _randomEntries(count)
+    batchApp, batchComm = scoreEntriesBatch(*entries)
+    scalarApp, scalarComm = _scalarScores(*entries)
+    for label, batch, scalar in (
+        ("app", batchApp, scalarApp),
+        ("community", batchComm, scalarComm),
+    ):
+        bad = np.flatnonzero(batch != np.array(scalar))
+        assert len(bad) == 0, "{0} score mismatch rows {1}".format(label, bad[:10])
+
+    # ties & near ties
+    ties = np.array([0.00005, 0.00015, 0.12345, -0.12345, 2.675e-4, 1.00005, 0.5])
+    ties = np.concatenate([ties, np.random.default_rng(3).uniform(-1, 1, 100000)])
+    rounded = roundLikePython(ties, IMPACT_WEIGHT_DECIMALS)
+    assert rounded.tolist() == [round(v, IMPACT_WEIGHT_DECIMALS) for v in ties.tolist()]
+
+    # bad slider value fails like the scalar assert
+    try:
+        scoreBatch(np.array([1]), np.array([-0.3]), np.array([-0.1]), [4.0], [0.0])
+        raise RuntimeError("slider 4 accepted for a behavior")
+    except AssertionError:
+        pass
+    print("parity ok:  {0} entries, app & community scores identical".format(count))
+
+
+def benchBatchScore(count: int = 20000) -> None:
+    from ..utils.bench import bestMs
+
+    entries = _randomEntries(count)
+
+    scalarMs = bestMs(lambda: _scalarScores(*entries), 3)
+    batchMs = bestMs(lambda: scoreEntriesBatch(*entries))
+    print(
+        "{0} entries:  scalar {1:.1f}ms ({2:.0f}/s)   batch {3:.2f}ms ({4:.0f}/s)".format(
+            count,
+            scalarMs,
+            count / scalarMs * 1000,
+            batchMs,
+            count / batchMs * 1000,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parityCheck()
+    benchBatchScore()
@@ -3,7 +3,17 @@ from __future__ import annotations
 # import logging
 
 # from logging import error   # , warning, info
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Mapping, NamedTuple, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+import copy
+import logging
+import threading
+import time
+
+import numpy as np
+import google.cloud.ndb as ndb
 
 # ************ for local file testing
 # remember to restore NDB in scoringRuleType.py AFTER testing
@@ -23,6 +33,7 @@ from ..utils.singleton import Singleton
 
 # from common.models.behGlobal import BehaviorRollup, VoteTypeRollup
 from ..enums.voteType import VoteType
+from ..enums.scoreRuleType import ScoreRuleType
 from ..config.behavior.load_yaml import BehCatNode, BehaviorSourceSingleton
 
 #
@@ -37,6 +48,9 @@ behStaticLookup = BehaviorSourceSingleton()
 
 COMMIT_CHNG_FAKE_CCIW = None  # set below after class declaration
 
+CONSENSUS_REFRESH_SECS = 60 * 60
+CONSENSUS_RETRY_SECS = 60  # after a failed refresh
+
 
 class AppCommHybridImpactWt(object):
     """wrapper for community impact weight
@@ -174,6 +188,43 @@ if COMMIT_CHNG_FAKE_CCIW is None:
     )
 
 
+class ConsensusSnapshot(NamedTuple):
+    """one published set of community impact weights
+    never changed after it is swapped in so readers need no lock
+    a refresh builds & swaps a whole new one
+    """
+
+    # behCode -> weight;  negs + the positives derived from them
+    weights: Mapping[str, AppCommHybridImpactWt]
+    # negBehCode -> weight (what community votes update)
+    negWeights: Mapping[str, AppCommHybridImpactWt]
+    # posBehCode -> negBehCode
+    posToNeg: Mapping[str, str]
+    # None until the 1st refresh from community votes (defaults only)
+    refreshedAt: Optional[datetime]
+
+    @staticmethod
+    def build(
+        negWeights: Dict[str, AppCommHybridImpactWt],
+        posToNeg: Mapping[str, str],
+        refreshedAt: Optional[datetime],
+    ) -> ConsensusSnapshot:
+        # positives are derived here, every time the negs change
+        weights = _derivePositiveWeights(negWeights)
+        weights.update(negWeights)
+        # warm the scoring min & notch cache for every weight scoring will see
+        ScoreRuleType.precomputeMinAndNotch(
+            [w.userAppImpactWeight for w in weights.values()]
+            + [w.hybridImpactWeight for w in weights.values()]
+        )
+        return ConsensusSnapshot(
+            MappingProxyType(weights),
+            MappingProxyType(negWeights),
+            MappingProxyType(dict(posToNeg)),
+            refreshedAt,
+        )
+
+
 class CommImpactConsensus(metaclass=Singleton):
     """singleton object with all cummulative community
     consensus status rolled into a vote
@@ -181,26 +232,61 @@ class CommImpactConsensus(metaclass=Singleton):
     community only votes on negative behaviors
     so we flip those votes for positive ones
 
-    WARNING:  likely to have race conditions on this object under load
-
+    stale-while-revalidate:  refreshIfNeeded starts ONE background refresh
+    (across all threads) & returns at once;  requests keep reading the
+    previous ConsensusSnapshot until the new one is swapped in
     """
 
     def __init__(self: CommImpactConsensus) -> None:
         if self.init_completed:
             return
-        # dict of CommConsensusImpactWt
-        self.impactWeightByComm: map[str, AppCommHybridImpactWt] = dict()
-        # dict: key = posBehCode; val = negBehCode
-        self.posToNegMap: map[str, str] = dict()
-
-        self.lastRefresh = datetime.now() - timedelta(days=1)
-        self._isRefreshing = False
+        self._snapshot: ConsensusSnapshot = ConsensusSnapshot.build(
+            dict(), dict(), None
+        )
+        # guards _inFlight & snapshot swaps (never held during datastore io)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="commConsensusRefresh"
+        )
+        self._inFlight: Optional[Future] = None
+        self._failedAt: float = 0.0
+        self._ndbClient = None
+        self._metrics: Dict[str, float] = dict(
+            refreshes=0, failures=0, lastDurationSecs=0.0, maxDurationSecs=0.0
+        )
 
         self._populateDefaultDict()
-        # print("CommImpactConsensus single created w:")
-        # print(list(self.posToNegMap.values()))
-        # print("\n\n")
-        # print(list(self.impactWeightByComm.keys()))
+        # rebuild defaults when behaviors.yaml is hot reloaded
+        behStaticLookup.addReloadListener(self._onTaxonomyReload)
+
+    @property
+    def impactWeightByComm(
+        self: CommImpactConsensus,
+    ) -> Mapping[str, AppCommHybridImpactWt]:
+        # read only;  neg & derived pos codes
+        return self._snapshot.weights
+
+    @property
+    def posToNegMap(self: CommImpactConsensus) -> Mapping[str, str]:
+        return self._snapshot.posToNeg
+
+    @property
+    def lastRefresh(self: CommImpactConsensus) -> Optional[datetime]:
+        return self._snapshot.refreshedAt
+
+    @property
+    def refreshMetrics(self: CommImpactConsensus) -> Dict[str, float]:
+        """refresh counts & durations plus the age of the served weights"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["refreshing"] = self._inFlight is not None
+        refreshedAt = self._snapshot.refreshedAt
+        metrics["ageSecs"] = (
+            None
+            if refreshedAt is None
+            else (datetime.now() - refreshedAt).total_seconds()
+        )
+        return metrics
 
     def getCommunityImpactAssessment(
         self: CommImpactConsensus, behNode: BehCatNode
@@ -211,143 +297,152 @@ class CommImpactConsensus(metaclass=Singleton):
         and then updated from user data as people vote
 
         positive impact consensus weight vals are DERRIVED
-        and created on the fly based on existing negative values
+        from the negative values whenever those change (ConsensusSnapshot.build)
+        so this is only a dict read
         """
         behCode: str = behNode.code
         if behCode == COMMIT_CHNG_CODE_CONST:
             return COMMIT_CHNG_FAKE_CCIW
 
-        # next lookup ONLY works INITIALLY on negative codes (default vals)
-        # but derived community weights for Positive entries will be added on the fly
-        # if it fails, treat behCode as positive & use negative to derive community consensus vote
-        ccw: AppCommHybridImpactWt = self.impactWeightByComm.get(behCode)
+        # next lookup works for neg AND pos codes (positives derived at refresh)
+        ccw: AppCommHybridImpactWt = self._snapshot.weights.get(behCode)
         if ccw is not None:
             # ccw may be pos or neg
             return ccw
 
-        # behNode must be positive below here or else error
-        behIsPositive: bool = behNode.positive
-        if not behIsPositive:
+        if not behNode.positive:
             # log error;  all negs should be in the impactWeightByComm dict
             m = "Ser.Error:  Neg behCode '{0}' missing from impactWeightByComm dict".format(
                 behCode
             )
-            # logging.error(m)
-            # return AppCommHybridImpactWt(behCode, 0.0, 0.0)
-            raise Exception(m)
-
-        # received a positive behCode; find its sibling
-        negBehCode: str = behNode.oppositeCode
-
-        # find negative rec & then flip it to positive
-        impactWeightsForNegBeh: AppCommHybridImpactWt
-        if negBehCode in self.impactWeightByComm:
-            impactWeightsForNegBeh = self.impactWeightByComm[negBehCode]
         else:
-            # impactWeightsForNegBeh = AppCommHybridImpactWt.default(negBehCode)
-            raise Exception(
-                "Err:  behCode {0} not found; all negs should be found".format(
-                    negBehCode
-                )
+            m = "Err:  behCode {0} not found; no usable weight for neg {1}".format(
+                behCode, behNode.oppositeCode
             )
-
-        # print(negCCW)
-        # pos is generally HIGHER impact than neg behaviors
-        ratioOfPosWeightToNeg: float = 1.0 + (
-            1.0 - abs(impactWeightsForNegBeh.userAppImpactWeight / behNode.impact)
-        )
-
-        # create new pos record with all positve vals
-        impactWeightsForPosBeh: AppCommHybridImpactWt = AppCommHybridImpactWt(
-            behCode,
-            ratioOfPosWeightToNeg * impactWeightsForNegBeh.communityImpactWeight * -1,
-            behNode.impact,
-        )
-        # memoize:  now store in dict for fast access later
-        self.setDerrivedPositiveCommWeight(impactWeightsForPosBeh)
-        return impactWeightsForPosBeh
-
-    def setDerrivedPositiveCommWeight(
-        self: CommImpactConsensus, posCcw: AppCommHybridImpactWt
-    ) -> None:
-        """
-        store community impact weight for positive behCode
-        positives will get replaced every time negatives
-        are updated from community votes
-        """
-        if posCcw.behCode not in self.impactWeightByComm:
-            self.impactWeightByComm[posCcw.behCode] = posCcw
+        # logging.error(m)
+        raise Exception(m)
 
     # def _negCodeFromPosCode(self: CommImpactConsensus, posCode: str):
     #     # WARN: returns invalid code if not found
     #     return self.posToNegMap.get(posCode, FEELING_ONLY_CODE_NEG)
 
-    def refreshIfNeeded(self: CommImpactConsensus):
-        if not self._needsRefresh:
-            return
-        self._isRefreshing = True
-        self._refresh()
-        self._isRefreshing = False
+    def refreshIfNeeded(
+        self: CommImpactConsensus, wait: bool = False
+    ) -> Optional[Future]:
+        """start a background refresh when the weights are stale
+        returns at once (unless wait) with the in-flight refresh or None
+        """
+        with self._lock:
+            if self._inFlight is None and self._needsRefresh:
+                self._inFlight = self._executor.submit(self._refreshInBackground)
+            future = self._inFlight
+        if wait and future is not None:
+            future.result()
+        return future
 
     @property
-    def _needsRefresh(self: CommImpactConsensus):
-        # reload & recalc every hour (60 * 60)
+    def _needsRefresh(self: CommImpactConsensus) -> bool:
+        # reload & recalc every CONSENSUS_REFRESH_SECS;  back off after a failure
+        if time.monotonic() - self._failedAt < CONSENSUS_RETRY_SECS:
+            return False
+        refreshedAt = self._snapshot.refreshedAt
         return (
-            not self._isRefreshing
-            and (datetime.now() - self.lastRefresh).seconds > 3600
+            refreshedAt is None
+            or (datetime.now() - refreshedAt).total_seconds() > CONSENSUS_REFRESH_SECS
         )
 
+    def _refreshInBackground(self: CommImpactConsensus) -> None:
+        start = time.perf_counter()
+        try:
+            self._inNdbContext(self._refresh)
+        except Exception:
+            # keep serving the old snapshot
+            logging.exception("CommImpactConsensus refresh failed")
+            with self._lock:
+                self._failedAt = time.monotonic()
+                self._metrics["failures"] += 1
+                self._inFlight = None
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._metrics["refreshes"] += 1
+            self._metrics["lastDurationSecs"] = elapsed
+            self._metrics["maxDurationSecs"] = max(
+                elapsed, self._metrics["maxDurationSecs"]
+            )
+            self._inFlight = None
+
+    def _inNdbContext(self: CommImpactConsensus, work: Callable[[], None]) -> None:
+        # the refresh thread has no request context of its own
+        if ndb.context.get_context(False) is not None:
+            return work()
+        if self._ndbClient is None:
+            from ..services.ndb.client import get_ndb_client
+
+            self._ndbClient = get_ndb_client()
+        with self._ndbClient.context():
+            return work()
+
     def _refresh(self: CommImpactConsensus):
         """
         negValAssessVTRDict has:
             key: string == behCode  (negatives only
             value: VoteTypeRollup (ndb) record
 
-        this is a singleton obj so don't change data that is being read
-            leave impactWeightByComm readable while doing this work
-
-        we replace self.impactWeightByComm with ONLY negative values
-        because newest communityImpactWeight needs to be inverted again for positive recs
-
-        shallowCopyNegOnly is new dict but holds ref to same NEG objects in impactWeightByComm
+        readers keep using the current snapshot while this runs
+        weights are copied before updating (never changed in place)
+        and all positives are derived again from the new negs
         """
-        shallowCopy = self.impactWeightByComm.copy()
-        # must skip positives and let them be derived again from neg
-        shallowCopyNegOnly = {
-            code: cciw
-            for (code, cciw) in shallowCopy.iteritems()
-            if not cciw.isPositive
-        }
+        # imported here:  beh_global pulls in most of the models package
+        from ..models.beh_global import BehaviorRollup
 
         negValAssessVTRDict = BehaviorRollup.loadAllStats(VoteType.CONCERN, False)
-        for code, vtr in negValAssessVTRDict.iteritems():
-            # vtr is a VoteTypeRollup()
-            # these are all negative behCodes that community has ranked
-            impactWeightForBeh = shallowCopyNegOnly.get(code)
-            if impactWeightForBeh is not None:
-                # update with latest derived community consensusWeight
-                impactWeightForBeh.updateCommConsensus(vtr.consensusWeight)
-            else:
-                # should not happen while running;  log me
-                bcn = behStaticLookup.bcnFromCode(code)
-                impactWeightForBeh = AppCommHybridImpactWt(
-                    code, vtr.consensusWeight, bcn.impact
-                )
-                shallowCopyNegOnly[code] = impactWeightForBeh
 
-        # intentionally replace whole dict so that Positive impacts are re-derived
-        # from latest community votes
-        self.impactWeightByComm = shallowCopyNegOnly
-        self.lastRefresh = datetime.now()
+        # build on whatever is current now (a taxonomy reload may have swapped it)
+        with self._lock:
+            snap = self._snapshot
+            weights = dict(snap.negWeights)
+            for code, vtr in negValAssessVTRDict.items():
+                # vtr is a VoteTypeRollup()
+                # these are all negative behCodes that community has ranked
+                if vtr.derivedCount == 0:
+                    continue  # no votes yet;  keep the default
+                impactWeightForBeh = weights.get(code)
+                if impactWeightForBeh is not None:
+                    # update a copy with latest derived community consensusWeight
+                    impactWeightForBeh = copy.copy(impactWeightForBeh)
+                    impactWeightForBeh.updateCommConsensus(vtr.consensusWeight)
+                else:
+                    # should not happen while running;  log me
+                    bcn = behStaticLookup.bcnFromCode(code)
+                    if bcn is None:
+                        continue
+                    impactWeightForBeh = AppCommHybridImpactWt(
+                        code, vtr.consensusWeight, bcn.impact
+                    )
+                weights[code] = impactWeightForBeh
+            self._snapshot = ConsensusSnapshot.build(
+                weights, snap.posToNeg, datetime.now()
+            )
 
     def _populateDefaultDict(self: CommImpactConsensus):
         # only runs a server startup & builds negative defaults
-        # positive will be the inverse when requested
+        # positives are derived from them in ConsensusSnapshot.build
+        weights, posToNeg = self._buildDefaultDicts()
+        self._snapshot = ConsensusSnapshot.build(weights, posToNeg, None)
+
+    def _buildDefaultDicts(
+        self: CommImpactConsensus,
+    ) -> tuple[map[str, AppCommHybridImpactWt], map[str, str]]:
         negCodesWithWeights: list[tuple[str, float]] = _defaultNegCommImpactWeights()
         mapBehCodeToCcIw: map[str, AppCommHybridImpactWt] = dict()
-        for defaultInitialNegCommWeightEstimate in negCodesWithWeights:
+        posToNegMap: map[str, str] = dict()
+        # one batch lookup instead of bcnFromCode per code
+        negBcns = behStaticLookup.lookupMany(cw[0] for cw in negCodesWithWeights)
+        for defaultInitialNegCommWeightEstimate, negBcn in zip(
+            negCodesWithWeights, negBcns
+        ):
             negBehCode: str = defaultInitialNegCommWeightEstimate[0]
-            negBcn: BehCatNode = behStaticLookup.bcnFromCode(negBehCode)
             if negBcn is None:
                 print(
                     "Err: bcn not found for {0} (all negs should be here w defaults)".format(
@@ -362,8 +457,74 @@ class CommImpactConsensus(metaclass=Singleton):
                 negBehCode, float(defaultInitialNegCommWeightEstimate[1]), negBcn.impact
             )
             # keep a dict to convert posBehCode into its negative sibling
-            self.posToNegMap[negBcn.oppositeCode] = negBehCode
-        self.impactWeightByComm = mapBehCodeToCcIw
+            posToNegMap[negBcn.oppositeCode] = negBehCode
+        return mapBehCodeToCcIw, posToNegMap
+
+    def _onTaxonomyReload(self: CommImpactConsensus, view) -> None:
+        """behavior yaml was hot reloaded (see BehaviorSourceSingleton.reload)
+        rebuild neg defaults against the new app impacts & opposite codes
+        but keep the latest community consensus for neg codes that still exist
+        positives are derived again from the new negs
+        """
+        newByComm, newPosToNeg = self._buildDefaultDicts()
+        with self._lock:
+            snap = self._snapshot
+            for code, oldCciw in snap.negWeights.items():
+                newCciw = newByComm.get(code)
+                if newCciw is not None:
+                    newCciw.updateCommConsensus(oldCciw.communityImpactWeight)
+            # whole snapshot replaced (same as _refresh) so readers never see a partial one
+            self._snapshot = ConsensusSnapshot.build(
+                newByComm, newPosToNeg, snap.refreshedAt
+            )
+
+
+def _derivePositiveWeights(
+    negWeights: Mapping[str, AppCommHybridImpactWt],
+) -> Dict[str, AppCommHybridImpactWt]:
+    """weights for every positive behavior whose oppositeCode is in negWeights
+    pos is generally HIGHER impact than neg behaviors:
+        ratio = 1 + (1 - |negUserApp / posImpact|)
+        posComm = ratio * negComm * -1
+    math is done over all pairs at once;  pairs outside the
+    AppCommHybridImpactWt range (0 < |posComm| <= 1) are left out & logged
+    """
+    cols = behStaticLookup.columns
+    posIds = np.flatnonzero(cols.positive & ~cols.isCategory & (cols.oppositeId >= 0))
+    negCodes = cols.codesFor(cols.oppositeId[posIds])
+    keep = [i for i, negCode in enumerate(negCodes) if negCode in negWeights]
+    if len(keep) == 0:
+        return dict()
+    posIds = posIds[keep]
+    negs = [negWeights[negCodes[i]] for i in keep]
+
+    negUserApp = np.fromiter(
+        (w.userAppImpactWeight for w in negs), np.float64, len(negs)
+    )
+    negComm = np.fromiter(
+        (w.communityImpactWeight for w in negs), np.float64, len(negs)
+    )
+    posImpact = cols.impact[posIds]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratioOfPosWeightToNeg = 1.0 + (1.0 - np.abs(negUserApp / posImpact))
+        posComm = ratioOfPosWeightToNeg * negComm * -1
+    usable = np.isfinite(posComm) & (np.abs(posComm) > 0.0) & (np.abs(posComm) <= 1.0)
+    if not usable.all():
+        logging.warning(
+            "CommImpactConsensus: no positive weight for {0}".format(
+                cols.codesFor(posIds[~usable])
+            )
+        )
+
+    codes = cols.codes
+    return {
+        codes[posId]: AppCommHybridImpactWt(codes[posId], comm, impact)
+        for posId, comm, impact in zip(
+            posIds[usable].tolist(),
+            posComm[usable].tolist(),
+            posImpact[usable].tolist(),
+        )
+    }
 
 
 def _defaultNegCommImpactWeights() -> list[tuple[str, float]]:
@@ -0,0 +1,304 @@
+"""
+coalesces rescore tasks per (user, prospect)
+
+every stored entry used to enqueue its own full rescore;  now the first one
+sets a pending marker holding its ETA & enqueues, and later entries are
+suppressed while that marker is pending (the queued rescore reads all
+entries stored before it runs)
+    a marker is pending only until its ETA:  from then on the rescore may
+    have run already, so the next entry enqueues again (the recalc handler
+    runs in the scoring service & can't be relied on to clear markers;
+    rescoreStarted() is there for handlers that share the store)
+    an entry that needs a rescore more than EARLIER_ETA_SLACK_SECS before the
+    pending one still enqueues (& moves the marker up);  the slack absorbs the
+    random minute in free user ETAs
+
+marker stores (like models/rolling_stats_store.py):
+    InProcessPendingStore   dict + lock;  one process only (default)
+    DatastorePendingStore   PendingRescore recs, claimed in a txn;  all instances
+
+namedTasks=True also sends a task name so cloud tasks drops duplicates that
+slip past the markers (eg in-process stores on many instances);  a rejected
+name counts as deduped.  the ETA is rounded UP to the next
+TASK_NAME_WINDOW_SECS boundary & named after it:  racing instances pick the
+same name, while a task queued after an earlier one's ETA always gets a new
+one (its boundary is past that ETA)
+
+with startAsyncDispatch, un-named rescore tasks are only queued:  enqueued
+counts tasks handed to the dispatcher & a task it later fails to create
+(after its retries) shows up in the dispatcher metrics, not here.  named tasks
+are still sent blocking, so deduped stays exact
+
+    setRescoreCoalescer(RescoreCoalescer(DatastorePendingStore()))  # app startup
+
+check with a fake tasks client:  python -m ts_shared_py3.scoring.rescore_coalescer
+"""
+
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+from datetime import datetime, timedelta
+import logging
+import re
+import threading
+
+import google.cloud.ndb as ndb
+
+from ..constants import IS_RUNNING_LOCAL, LOCAL_PUBLIC_URL_SCORING, GAEQ_FOR_SCORING
+from ..services.taskq_dispatch import do_background_work_get
+
+EARLIER_ETA_SLACK_SECS = 3600
+TASK_NAME_WINDOW_SECS = 60  # named tasks:  ETAs rounded up to this (extra delay)
+
+# (userId, prospectId, eta, taskName, dedupeByName) -> False if cloud tasks deduped it
+SendFunc = Callable[[str, int, datetime, str, bool], bool]
+
+
+def _markerId(userId: str, prospectId: int) -> str:
+    return "{0}_{1}".format(userId, prospectId)
+
+
+class PendingRescoreStore(object):
+    """backend interface"""
+
+    def claim(
+        self: PendingRescoreStore, markerId: str, eta: datetime, now: datetime
+    ) -> bool:
+        """atomically:  True (& marker set to eta) unless a marker that is still
+        pending at now covers eta (see _isCovered)
+        """
+        raise NotImplementedError()
+
+    def clear(self: PendingRescoreStore, markerId: str) -> None:
+        raise NotImplementedError()
+
+
+def _isCovered(pendingEta: Optional[datetime], eta: datetime, now: datetime) -> bool:
+    # the pending rescore will run in time for this entry
+    if pendingEta is None:
+        return False
+    # once the ETA passes the task may be running (or done):  not covered
+    stillPending = now < pendingEta
+    return stillPending and pendingEta <= eta + timedelta(
+        seconds=EARLIER_ETA_SLACK_SECS
+    )
+
+
+class InProcessPendingStore(PendingRescoreStore):
+    def __init__(self: InProcessPendingStore) -> None:
+        self._lock = threading.Lock()
+        self._etas: Dict[str, datetime] = dict()
+
+    def claim(
+        self: InProcessPendingStore, markerId: str, eta: datetime, now: datetime
+    ) -> bool:
+        with self._lock:
+            if _isCovered(self._etas.get(markerId), eta, now):
+                return False
+            self._etas[markerId] = eta
+            # drop markers whose rescore is due
+            if len(self._etas) > 10000:
+                self._etas = {k: v for k, v in self._etas.items() if v > now}
+            return True
+
+    def clear(self: InProcessPendingStore, markerId: str) -> None:
+        with self._lock:
+            self._etas.pop(markerId, None)
+
+
+class PendingRescore(ndb.Model):
+    """pending rescore marker;  key id == _markerId
+    set a datastore TTL policy on expireAt to delete stale markers
+    """
+
+    eta = ndb.DateTimeProperty(indexed=False)
+    expireAt = ndb.DateTimeProperty(indexed=True)
+
+
+class DatastorePendingStore(PendingRescoreStore):
+    """shared by all instances;  costs a txn per stored batch (needs an ndb context)"""
+
+    def claim(
+        self: DatastorePendingStore, markerId: str, eta: datetime, now: datetime
+    ) -> bool:
+        key = ndb.Key(PendingRescore, markerId)
+
+        @ndb.transactional(retries=3)
+        def _claim() -> bool:
+            rec = key.get()
+            if _isCovered(rec.eta if rec else None, eta, now):
+                return False
+            PendingRescore(key=key, eta=eta, expireAt=eta).put()
+            return True
+
+        return _claim()
+
+    def clear(self: DatastorePendingStore, markerId: str) -> None:
+        ndb.Key(PendingRescore, markerId).delete()
+
+
+def _sendRescoreTask(
+    userId: str, prospectId: int, eta: datetime, taskName: str, dedupeByName: bool
+) -> bool:
+    scoreSvcOrRelUrl = LOCAL_PUBLIC_URL_SCORING if IS_RUNNING_LOCAL else ""
+    url = scoreSvcOrRelUrl + "/scoring/recalc/{0}/{1}".format(userId, prospectId)
+    delay_secs: int = (eta - datetime.now()).total_seconds()
+    return do_background_work_get(
+        url, GAEQ_FOR_SCORING, delay_secs, taskName, dedupeByName
+    )
+
+
+class RescoreCoalescer(object):
+    """thread safe;  see module doc"""
+
+    def __init__(
+        self: RescoreCoalescer,
+        store: PendingRescoreStore = None,
+        namedTasks: bool = False,
+        sendFunc: SendFunc = None,
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.store = store or InProcessPendingStore()
+        self.namedTasks = namedTasks
+        self._send: SendFunc = sendFunc or _sendRescoreTask
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = dict(
+            requested=0,
+            enqueued=0,
+            coalesced=0,  # suppressed by a pending marker
+            deduped=0,  # rejected by cloud tasks as a duplicate name
+        )
+
+    @property
+    def metrics(self: RescoreCoalescer) -> Dict[str, int]:
+        """counter snapshot;  saved == rescore tasks not created"""
+        with self._lock:
+            counts = dict(self._counts)
+        counts["saved"] = counts["coalesced"] + counts["deduped"]
+        return counts
+
+    def dispatch(
+        self: RescoreCoalescer, userId: str, prospectId: int, eta: datetime
+    ) -> bool:
+        """enqueue a rescore unless one is already pending;  True if enqueued"""
+        self._count("requested")
+        now = self._clock()
+        eta = max(eta, now)  # free user ETAs can be earlier today
+        if self.namedTasks:
+            eta = _nextNameWindow(eta)
+        markerId = _markerId(userId, prospectId)
+        if not self.store.claim(markerId, eta, now):
+            self._count("coalesced")
+            return False
+
+        taskName = "rescore-{0}-{1}".format(userId, prospectId)
+        if self.namedTasks:
+            window = int(eta.timestamp()) // TASK_NAME_WINDOW_SECS
+            taskName = _taskNameSafe("{0}-{1}".format(taskName, window))
+        try:
+            sent = self._send(userId, prospectId, eta, taskName, self.namedTasks)
+        except Exception:
+            # let the next entry try again
+            self.store.clear(markerId)
+            raise
+        self._count("enqueued" if sent is not False else "deduped")
+        return sent is not False
+
+    def rescoreStarted(self: RescoreCoalescer, userId: str, prospectId: int) -> None:
+        """optional:  for a handler sharing the store (eg DatastorePendingStore)
+        to release the marker before its ETA
+        """
+        self.store.clear(_markerId(userId, prospectId))
+
+    def _count(self: RescoreCoalescer, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+
+def _nextNameWindow(eta: datetime) -> datetime:
+    # first window boundary strictly after eta
+    window = int(eta.timestamp()) // TASK_NAME_WINDOW_SECS + 1
+    return datetime.fromtimestamp(window * TASK_NAME_WINDOW_SECS)
+
+
+def _taskNameSafe(name: str) -> str:
+    # cloud tasks ids:  letters, digits, hyphens & underscores;  max 500 chars
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name)[:500]
+
+
+_coalescer: RescoreCoalescer = RescoreCoalescer()
+
+
+def rescoreCoalescer() -> RescoreCoalescer:
+    return _coalescer
+
+
+def setRescoreCoalescer(coalescer: RescoreCoalescer) -> None:
+    global _coalescer
+    _coalescer = coalescer
+
+
+def coalesceCheck(users: int = 5, entriesPerUser: int = 40) -> None:
+    """duplicate suppression, rescoreStarted & named task dedupe
+    against FakeTasksClient
+    """
+    from ..services.taskq_dispatch import FakeTasksClient, setTaskClient
+
+    fakeNow = [datetime(2024, 5, 1, 9, 0)]
+    clock = lambda: fakeNow[0]
+    eta = lambda: fakeNow[0] + timedelta(minutes=3)
+
+    tasks = FakeTasksClient()
+    previousClient = setTaskClient(tasks)
+    try:
+        coalescer = RescoreCoalescer(clock=clock)
+        for i in range(entriesPerUser):
+            for u in range(users):
+                coalescer.dispatch("user{0}".format(u), u + 1, eta())
+            fakeNow[0] += timedelta(seconds=1)
+        assert len(tasks.tasks) == users, "{0} tasks".format(len(tasks.tasks))
+        metrics = coalescer.metrics
+        assert metrics["saved"] == users * (entriesPerUser - 1)
+
+        # a paid rescore (now + 3 mins) is not covered by a pending free one (noon)
+        noon = fakeNow[0].replace(hour=12)
+        assert coalescer.dispatch("free", 7, noon)
+        assert not coalescer.dispatch("free", 7, noon.replace(minute=40))
+        assert coalescer.dispatch("free", 7, eta())
+        # a handler sharing the store can release the marker early
+        coalescer.rescoreStarted("user1", 2)
+        assert coalescer.dispatch("user1", 2, eta())
+        # user2's rescore is due 9:03;  by 9:04 it may have run, so a new entry
+        # must enqueue again (nobody called rescoreStarted)
+        fakeNow[0] = datetime(2024, 5, 1, 9, 4)
+        assert coalescer.dispatch("user2", 3, eta())
+        assert not coalescer.dispatch("user2", 3, eta())
+
+        # 2 instances with their own in-process markers:  cloud tasks drops the 2nd
+        named = [RescoreCoalescer(namedTasks=True, clock=clock) for _ in range(2)]
+        sentBefore = len(tasks.tasks)
+        assert named[0].dispatch("user@x.com", 9, eta())
+        assert not named[1].dispatch("user@x.com", 9, eta())
+        assert len(tasks.tasks) == sentBefore + 1
+        assert named[1].metrics["deduped"] == 1
+        firstName = tasks.tasks[-1].name
+        assert "/tasks/rescore-user_x_com-9-" in firstName
+        # after that ETA a new entry gets a new name (not lost as a duplicate),
+        # even with an ETA of right now
+        fakeNow[0] = named[0].store._etas["user@x.com_9"] + timedelta(seconds=1)
+        assert named[0].dispatch("user@x.com", 9, fakeNow[0])
+        assert tasks.tasks[-1].name != firstName
+    finally:
+        setTaskClient(previousClient)
+
+    print(
+        "{0} entries for {1} user/prospects:  {2} rescore tasks, {3} saved".format(
+            metrics["requested"], users, metrics["enqueued"], metrics["saved"]
+        )
+    )
+    print("earlier ETA, rescoreStarted, due markers & named task dedupe:  ok")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    coalesceCheck()
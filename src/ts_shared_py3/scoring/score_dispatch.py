@@ -1,13 +1,16 @@
 import logging
 from random import randint
-from typing import Type
-from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Type, Union, TYPE_CHECKING
+from datetime import date, datetime, timedelta
+
+import google.cloud.ndb as ndb
 
 # from google.cloud.tasks_v2 import HttpMethod
 #
 from ..models.beh_entry import Entry as BehEntry
 from ..models.input_entry_adapter import InputEntryAdapter
 from ..services.taskq_dispatch import do_background_work, do_background_work_get
+from .rescore_coalescer import rescoreCoalescer
 
 from ..constants import (
     IS_RUNNING_LOCAL,
@@ -16,6 +19,37 @@ from ..constants import (
     # SCORING_SERVICE_NAME,
 )
 
+if TYPE_CHECKING:
+    from ..models.incident import Incident
+    from ..models.interval import Interval
+
+
+# storeMany inputs;  BehEntry & ready built InputEntryAdapter recs are taken as is
+class ValueAssessmentInput(NamedTuple):
+    behCode: str
+    concernVote: int
+    freqVote: int
+    changeDt: date = None
+
+
+class CommitLevelChangeInput(NamedTuple):
+    priorPhase: "Interval"
+    mostRecentPhase: "Interval"
+
+
+class IncidentInput(NamedTuple):
+    incdt: "Incident"
+    relLength: int = 30
+
+
+ScoreEntryInput = Union[
+    BehEntry,
+    ValueAssessmentInput,
+    CommitLevelChangeInput,
+    IncidentInput,
+    InputEntryAdapter,
+]
+
 
 class ScoreDispatchHelper(object):
     """
@@ -28,21 +62,42 @@ class ScoreDispatchHelper(object):
 
     @classmethod
     def _dispatchScoreTask(cls: Type, userId: str, prospectId: int, dtTmEta: datetime):
-        taskName = "rescore-{0}-{1}".format(userId, prospectId)
-        scoreSvcOrRelUrl = LOCAL_PUBLIC_URL_SCORING if IS_RUNNING_LOCAL else ""
-        url = scoreSvcOrRelUrl + "/scoring/recalc/{0}/{1}".format(userId, prospectId)
-        delay_secs: int = (dtTmEta - datetime.now()).total_seconds()
-        do_background_work_get(url, GAEQ_FOR_SCORING, delay_secs, taskName)
+        # no new task while one is pending for this user & prospect
+        rescoreCoalescer().dispatch(userId, prospectId, dtTmEta)
+
+    @classmethod
+    def rescoreStarted(cls: Type, userId: str, prospectId: int):
+        # optional:  releases the pending marker before its ETA (shared stores only)
+        rescoreCoalescer().rescoreStarted(userId, prospectId)
+
+    @classmethod
+    def storeMany(
+        cls: Type,
+        userId: str,
+        prospectId: int,
+        entries: Iterable[ScoreEntryInput],
+        isFreeUser: bool = True,
+    ) -> List[InputEntryAdapter]:
+        """
+        store a batch of entries (eg an offline client sync)
+        with ONE put_multi and ONE rescore task for this user & prospect
+        instead of a put + a task per entry
+        """
+        ieas: List[InputEntryAdapter] = [_toAdapter(entry) for entry in entries]
+        if len(ieas) == 0:
+            return ieas
+        for iea in ieas:
+            iea.setKeyProperties(userId, prospectId)
+        ndb.put_multi(ieas)
+        eta = _deriveRescoreTime(isFreeUser)
+        cls._dispatchScoreTask(userId, prospectId, eta)
+        return ieas
 
     @classmethod
     def storeFeelingOrBehavior(
         cls: Type, userId: str, prospectId: int, beh: BehEntry, isFreeUser: bool = True
     ):
-        iea = InputEntryAdapter.fromBehavior(beh)
-        iea.setKeyProperties(userId, prospectId)
-        iea.save()
-        eta = _deriveRescoreTime(isFreeUser)
-        cls._dispatchScoreTask(userId, prospectId, eta)
+        cls.storeMany(userId, prospectId, [beh], isFreeUser)
 
     @classmethod
     def storeValueAssessment(
@@ -55,23 +110,15 @@ class ScoreDispatchHelper(object):
         changeDt: datetime,
         isFreeUser: bool = True,
     ):
-        iea = InputEntryAdapter.fromValueAssessment(
-            behCode, concernVote, freqVote, changeDt
-        )
-        iea.setKeyProperties(userId, prospectId)
-        iea.save()
-        eta = _deriveRescoreTime(isFreeUser)
-        cls._dispatchScoreTask(userId, prospectId, eta)
+        entry = ValueAssessmentInput(behCode, concernVote, freqVote, changeDt)
+        cls.storeMany(userId, prospectId, [entry], isFreeUser)
 
     @classmethod
     def storeCommitLevelChange(
         cls, userId, prospectId, priorPhase, mostRecentPhase, isFreeUser=True
     ):
-        iea = InputEntryAdapter.fromCommitLevelChange(priorPhase, mostRecentPhase)
-        iea.setKeyProperties(userId, prospectId)
-        iea.save()
-        eta = _deriveRescoreTime(isFreeUser)
-        cls._dispatchScoreTask(userId, prospectId, eta)
+        entry = CommitLevelChangeInput(priorPhase, mostRecentPhase)
+        cls.storeMany(userId, prospectId, [entry], isFreeUser)
 
     @classmethod
     def storeIncident(
@@ -83,11 +130,21 @@ class ScoreDispatchHelper(object):
         isFreeUser: bool = True,
     ):
         # incidents created on another server
-        iea = InputEntryAdapter.fromIncident(incdt, relLength)
-        iea.setKeyProperties(userId, prospectId)
-        iea.save()
-        eta = _deriveRescoreTime(isFreeUser)
-        cls._dispatchScoreTask(userId, prospectId, eta)
+        cls.storeMany(userId, prospectId, [IncidentInput(incdt, relLength)], isFreeUser)
+
+
+def _toAdapter(entry: ScoreEntryInput) -> InputEntryAdapter:
+    if isinstance(entry, InputEntryAdapter):
+        return entry
+    elif isinstance(entry, BehEntry):
+        return InputEntryAdapter.fromBehavior(entry)
+    elif isinstance(entry, ValueAssessmentInput):
+        return InputEntryAdapter.fromValueAssessment(*entry)
+    elif isinstance(entry, CommitLevelChangeInput):
+        return InputEntryAdapter.fromCommitLevelChange(*entry)
+    elif isinstance(entry, IncidentInput):
+        return InputEntryAdapter.fromIncident(*entry)
+    raise TypeError("storeMany: unsupported entry {0}".format(type(entry)))
 
 
 def _deriveRescoreTime(isFreeUser: bool) -> datetime:
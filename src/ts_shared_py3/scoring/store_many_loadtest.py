@@ -0,0 +1,99 @@
+"""
+bulk entry ingest (eg an offline client sync):  one store* call per entry
+(a put + a rescore task each) vs ScoreDispatchHelper.storeMany
+(one put_multi + one rescore task)
+
+cloud tasks is replaced by FakeTasksClient (latencySecs per create_task)
+
+runs against the datastore emulator only:
+    gcloud beta emulators datastore start --no-store-on-disk
+    $(gcloud beta emulators datastore env-init)
+    python -m ts_shared_py3.scoring.store_many_loadtest <proj_root> [entries] [syncs]
+"""
+
+from __future__ import annotations
+import os
+import random
+import time
+from datetime import date, timedelta
+
+TASK_LATENCY_SECS = 0.03  # typical create_task round trip
+
+
+def loadTest(entries: int = 50, syncs: int = 5) -> None:
+    # imported here so the proj_root can be set first
+    import google.cloud.ndb as ndb
+    from ..models.beh_entry import behaviorDataShared
+    from ..models.input_entry_adapter import InputEntryAdapter
+    from ..services.taskq_dispatch import FakeTasksClient, setTaskClient
+    from .score_dispatch import ScoreDispatchHelper, ValueAssessmentInput
+
+    assert os.environ.get("DATASTORE_EMULATOR_HOST"), "start the emulator first"
+    client = ndb.Client(project=os.environ.get("DATASTORE_PROJECT_ID", "ts-local"))
+
+    behCodes = behaviorDataShared.allBehaviorCodes(False)[:40]
+    today = date.today()
+
+    def _randomEntries(n: int) -> list[ValueAssessmentInput]:
+        return [
+            ValueAssessmentInput(
+                random.choice(behCodes),
+                random.randint(1, 4),
+                random.randint(1, 4),
+                today - timedelta(days=random.randint(0, 30)),
+            )
+            for _ in range(n)
+        ]
+
+    def _storedFor(userId: str, prospectId: int) -> int:
+        ancestor = InputEntryAdapter.makeAncestor(userId, prospectId)
+        with client.context():
+            return InputEntryAdapter.query(ancestor=ancestor).count()
+
+    def _perEntry(userId: str, prospectId: int, batch: list) -> None:
+        for entry in batch:
+            ScoreDispatchHelper.storeValueAssessment(userId, prospectId, *entry)
+
+    def _bulk(userId: str, prospectId: int, batch: list) -> None:
+        ScoreDispatchHelper.storeMany(userId, prospectId, batch)
+
+    previousClient = setTaskClient(None)
+    try:
+        for label, store in (("per entry", _perEntry), ("storeMany", _bulk)):
+            tasks = FakeTasksClient(TASK_LATENCY_SECS)
+            setTaskClient(tasks)  # restored below
+            runId = "{0}{1}".format(label.replace(" ", ""), random.randint(0, 10**6))
+            batches = [_randomEntries(entries) for _ in range(syncs)]
+
+            start = time.perf_counter()
+            for i, batch in enumerate(batches):
+                with client.context():
+                    store(runId, i + 1, batch)
+            elapsed = time.perf_counter() - start
+
+            stored = sum(_storedFor(runId, i + 1) for i in range(syncs))
+            assert stored == entries * syncs, "stored {0} of {1}".format(
+                stored, entries * syncs
+            )
+            print(
+                "{0:<10} {1} syncs x {2} entries in {3:.2f}s = {4:.1f}ms per sync   "
+                "rescore tasks {5}".format(
+                    label,
+                    syncs,
+                    entries,
+                    elapsed,
+                    elapsed / syncs * 1000,
+                    len(tasks.tasks),
+                )
+            )
+            if store is _bulk:
+                assert len(tasks.tasks) == syncs, "expected one task per sync"
+
+    finally:
+        setTaskClient(previousClient)
+
+
+if __name__ == "__main__":
+    from ..utils.bench import benchArgs
+
+    loadTest(*[int(a) for a in benchArgs("[entries] [syncs]")[:2]])
@@ -0,0 +1,244 @@
+"""
+debounced, coalescing publisher for the daily stats firebase nodes
+
+RollingStatWindow asks for a publish on every hour change, global % jump or
+category reorder;  under load that is many writes per second to the same
+2 paths.  per path this publisher:
+    coalesces:   only the newest snapshot submitted is kept
+    debounces:   writes at most once per intervalSecs
+                 leading edge (1st submit after a quiet interval goes now)
+                 + trailing edge (the newest snapshot at the end of the interval)
+    diffs:       only categories that changed since the last PUBLISHED
+                 snapshot are sent, as one firebase_patch
+                 (a category that disappeared is patched to None == deleted)
+
+submit() never blocks on the network;  writes run on a timer thread
+a failed write keeps the snapshot pending & retries after the next interval
+
+    dailyStatsPublisher().submit("dailyStatsPos", {catCode: {...}, ...})
+
+check with a recording patchFunc:  python -m ts_shared_py3.services.firebase.stats_publisher
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import atexit
+import logging
+import threading
+import time
+
+DAILY_STATS_MIN_INTERVAL_SECS = 10.0
+
+# {catCode: {catName, iconName, isPos, actCount}}
+Snapshot = Dict[str, Any]
+PatchFunc = Callable[[str, Dict[str, Any]], None]
+
+
+def _firebasePatch(path: str, changes: Dict[str, Any]) -> None:
+    # imported on first write:  client_admin initializes firebase at import
+    from .client_admin import firebase_patch
+
+    firebase_patch(path, changes)
+
+
+class StatsPublisher(object):
+    """thread safe;  see module doc"""
+
+    def __init__(
+        self: StatsPublisher,
+        intervalSecs: float = DAILY_STATS_MIN_INTERVAL_SECS,
+        patchFunc: PatchFunc = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.intervalSecs = intervalSecs
+        self._patch: PatchFunc = patchFunc or _firebasePatch
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Snapshot] = dict()  # newest unsent per path
+        self._published: Dict[str, Snapshot] = dict()  # last sent per path
+        self._lastWriteAt: Dict[str, float] = dict()
+        self._timers: Dict[str, threading.Timer] = dict()
+        self._counts: Dict[str, int] = dict(
+            submitted=0,
+            sent=0,  # firebase writes
+            coalesced=0,  # submits replaced by a newer one before sending
+            unchanged=0,  # flushes with nothing to send after the diff
+            failed=0,
+            categoriesSent=0,
+            categoriesSuppressed=0,  # unchanged categories left out of writes
+        )
+
+    @property
+    def metrics(self: StatsPublisher) -> Dict[str, int]:
+        """counter snapshot;  suppressed == coalesced + unchanged"""
+        with self._lock:
+            counts = dict(self._counts)
+        counts["suppressed"] = counts["coalesced"] + counts["unchanged"]
+        return counts
+
+    def submit(self: StatsPublisher, path: str, snapshot: Snapshot) -> None:
+        with self._lock:
+            self._counts["submitted"] += 1
+            if path in self._pending:
+                self._counts["coalesced"] += 1
+            self._pending[path] = snapshot
+            if path in self._timers:
+                return  # the scheduled write will pick up this snapshot
+            sinceWrite = self._clock() - self._lastWriteAt.get(path, float("-inf"))
+            self._schedule(path, max(self.intervalSecs - sinceWrite, 0.0))
+
+    def flush(self: StatsPublisher, path: str) -> bool:
+        """write the pending snapshot for path now;  False if the write failed"""
+        with self._lock:
+            timer = self._timers.pop(path, None)
+            snapshot = self._pending.pop(path, None)
+            if snapshot is None:
+                return True
+            published = self._published.get(path, dict())
+            self._lastWriteAt[path] = self._clock()
+        if timer is not None:
+            timer.cancel()
+
+        changes: Dict[str, Any] = {
+            catCode: value
+            for catCode, value in snapshot.items()
+            if published.get(catCode) != value
+        }
+        for catCode in published.keys() - snapshot.keys():
+            changes[catCode] = None
+        if len(changes) == 0:
+            with self._lock:
+                self._counts["unchanged"] += 1
+            return True
+
+        try:
+            self._patch(path, changes)
+        except Exception:
+            logging.exception("StatsPublisher write to {0} failed".format(path))
+            with self._lock:
+                self._counts["failed"] += 1
+                # keep it unless a newer snapshot arrived meanwhile
+                self._pending.setdefault(path, snapshot)
+                if path not in self._timers:
+                    self._schedule(path, self.intervalSecs)
+            return False
+
+        with self._lock:
+            self._published[path] = snapshot
+            self._counts["sent"] += 1
+            self._counts["categoriesSent"] += len(changes)
+            self._counts["categoriesSuppressed"] += len(snapshot) - len(
+                snapshot.keys() & changes.keys()
+            )
+        return True
+
+    def flushAll(self: StatsPublisher) -> None:
+        with self._lock:
+            paths = list(self._pending.keys())
+        for path in paths:
+            self.flush(path)
+
+    def _schedule(self: StatsPublisher, path: str, delaySecs: float) -> None:
+        # call with _lock held
+        timer = threading.Timer(delaySecs, self._onTimer, args=(path,))
+        timer.daemon = True
+        self._timers[path] = timer
+        timer.start()
+
+    def _onTimer(self: StatsPublisher, path: str) -> None:
+        try:
+            self.flush(path)
+        except Exception:
+            logging.exception("StatsPublisher timer for {0}".format(path))
+
+
+_publisher: Optional[StatsPublisher] = None
+_publisherLock = threading.Lock()
+
+
+def dailyStatsPublisher() -> StatsPublisher:
+    """process wide publisher for the dailyStatsPos / dailyStatsNeg nodes"""
+    global _publisher
+    with _publisherLock:
+        if _publisher is None:
+            _publisher = StatsPublisher()
+            # send the trailing edge before the process goes away
+            atexit.register(_publisher.flushAll)
+        return _publisher
+
+
+def setDailyStatsPublisher(publisher: StatsPublisher) -> None:
+    global _publisher
+    with _publisherLock:
+        _publisher = publisher
+
+
+def publisherCheck(submits: int = 2000, intervalSecs: float = 0.1) -> None:
+    """burst of submits;  writes are recorded by an injected patchFunc
+    (client_admin & firebase are never touched)
+    """
+    writes = []
+
+    def _record(path: str, obj: Dict[str, Any]) -> None:
+        writes.append((path, dict(obj)))
+
+    def _snapshot(i: int) -> Snapshot:
+        # only cat0 changes on every submit;  cat1 every 100th
+        return {
+            "cat0": {"actCount": i},
+            "cat1": {"actCount": i // 100},
+            "cat2": {"actCount": 0},
+        }
+
+    pub = StatsPublisher(intervalSecs, _record)
+    start = time.perf_counter()
+    for i in range(submits):
+        pub.submit("dailyStatsPos", _snapshot(i))
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    time.sleep(intervalSecs * 2)  # let the trailing edge go out
+
+    # leading edge went out at once & in full
+    assert writes[0] == ("dailyStatsPos", _snapshot(0)), writes[0]
+    # the newest snapshot always lands
+    merged: Snapshot = dict()
+    for _, changes in writes:
+        merged.update(changes)
+    assert merged == _snapshot(submits - 1), "final state lost"
+    assert all("cat2" not in changes for _, changes in writes[1:]), "sent unchanged"
+    maxWrites = int(elapsed / intervalSecs) + 2
+    assert len(writes) <= maxWrites, "{0} writes > {1}".format(len(writes), maxWrites)
+
+    # a failed write is retried with the pending snapshot
+    failOnce = [True]
+
+    def _flaky(path: str, obj: Dict[str, Any]) -> None:
+        if failOnce[0]:
+            failOnce[0] = False
+            raise IOError("firebase down")
+        _record(path, obj)
+
+    flaky = StatsPublisher(intervalSecs, _flaky)
+    flaky.submit("dailyStatsNeg", _snapshot(1))
+    time.sleep(intervalSecs * 3)
+    assert writes[-1] == ("dailyStatsNeg", _snapshot(1)), "failed write not retried"
+    assert flaky.metrics["failed"] == 1 and flaky.metrics["sent"] == 1
+
+    metrics = pub.metrics
+    print(
+        "{0} submits in {1:.2f}s @ {2}s interval:  {3} writes, {4} suppressed, "
+        "{5} categories sent / {6} unchanged left out".format(
+            metrics["submitted"],
+            elapsed,
+            intervalSecs,
+            metrics["sent"],
+            metrics["suppressed"],
+            metrics["categoriesSent"],
+            metrics["categoriesSuppressed"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    publisherCheck()
@@ -0,0 +1,278 @@
+"""
+cloud tasks POST body encoding for taskq_dispatch
+
+stats & community news payloads can be large & a task has a hard size cap, so
+    compression:  bodies of at least COMPRESS_MIN_BYTES go out as zstd
+        (pip install zstandard) or zlib with a Content-Encoding header
+        (zstd / deflate), when that is smaller
+    spill:  a body still over the spill size (env TASK_PAYLOAD_SPILL_BYTES)
+        is stored with BitBucket.storeBlobAtKey (key from its sha256, so
+        resends reuse it) & the task only carries
+        {"spilledTo": key, "encoding": ...} + the SPILL_HEADER header;
+        needs an ndb context
+        (spilled blobs are left for retries;  clean up by BitBucket.addDateTime)
+both are OFF unless enabled (env TASK_PAYLOAD_COMPRESS / TASK_PAYLOAD_SPILL
+or the setters below):  a handler that doesn't decode would get compressed
+bytes or a reference instead of its json.  with spill off an oversized body
+is sent as is (& counted as oversize)
+bytes are counted per QueuedWorkTyp:  taskPayloadMetrics()
+
+task handlers read the body with:
+    payload: str = decodeTaskPayload(request.get_data(), request.headers)
+
+    setTaskPayloadCompression(True)   # once every handler decodes
+    setTaskPayloadSpill(True)
+
+check with a stubbed BitBucket:  python -m ts_shared_py3.services.task_payload
+"""
+
+from __future__ import annotations
+from typing import Dict, Mapping, NamedTuple, Optional
+from collections import Counter
+import hashlib
+import json
+import logging
+import threading
+import zlib
+
+try:
+    import zstandard  # optional;  pip install zstandard
+except ImportError:
+    zstandard = None
+
+from ..config.env_vars import EnvVarVals
+from ..enums.queued_work import QueuedWorkTyp
+
+COMPRESS_MIN_BYTES = 1024
+SPILL_KEY_PREFIX = "taskPayload-"
+SPILL_HEADER = "X-Ts-Payload-Spill"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+_envVars = EnvVarVals()
+_compressEnabled: bool = _envVars.TASK_PAYLOAD_COMPRESS
+_spillEnabled: bool = _envVars.TASK_PAYLOAD_SPILL
+_spillOverBytes: int = _envVars.TASK_PAYLOAD_SPILL_BYTES
+_metricsLock = threading.Lock()
+_metrics: Dict[str, Counter] = dict()
+
+
+class EncodedPayload(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]  # added to the task request headers
+
+
+def setTaskPayloadCompression(enabled: bool) -> None:
+    global _compressEnabled
+    _compressEnabled = enabled
+
+
+def setTaskPayloadSpill(enabled: bool, overBytes: int = None) -> None:
+    """overBytes defaults to env TASK_PAYLOAD_SPILL_BYTES"""
+    global _spillEnabled, _spillOverBytes
+    _spillEnabled = enabled
+    if overBytes is not None:
+        _spillOverBytes = overBytes
+
+
+def encodeTaskPayload(
+    payload: Optional[str], workType: Optional[QueuedWorkTyp] = None
+) -> EncodedPayload:
+    raw: bytes = "_empty".encode() if payload is None else payload.encode()
+    body, encoding = raw, None
+    if _compressEnabled and len(raw) >= COMPRESS_MIN_BYTES:
+        compressed, algo = _compress(raw)
+        if len(compressed) < len(raw):
+            body, encoding = compressed, algo
+
+    headers: Dict[str, str] = dict()
+    oversize = len(body) > _spillOverBytes
+    spilled = oversize and _spillEnabled
+    if oversize and not spilled:
+        logging.warning(
+            "task payload for {0} is {1} bytes;  may exceed the task size cap "
+            "(spill is off)".format(workType, len(body))
+        )
+    if spilled:
+        key = _spill(body)
+        headers[SPILL_HEADER] = key
+        body = json.dumps({"spilledTo": key, "encoding": encoding}).encode()
+    elif encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    _count(
+        workType,
+        tasks=1,
+        rawBytes=len(raw),
+        sentBytes=len(body),
+        compressed=int(encoding is not None),
+        spilled=int(spilled),
+        oversize=int(oversize and not spilled),
+    )
+    return EncodedPayload(body, headers)
+
+
+def decodeTaskPayload(body: bytes, headers: Mapping[str, str]) -> str:
+    """handler side of encodeTaskPayload"""
+    encoding = _header(headers, "Content-Encoding")
+    if _header(headers, SPILL_HEADER) is not None:
+        from ..models.bbucket import BitBucket
+
+        ref = json.loads(body)
+        body = BitBucket.getBlobAtKey(ref["spilledTo"])
+        assert body is not None, "spilled payload {0} missing".format(ref["spilledTo"])
+        encoding = ref["encoding"]
+    if encoding == "zstd":
+        assert zstandard is not None, "zstd payload but zstandard not installed"
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif encoding == "deflate":
+        body = zlib.decompress(body)
+    return body.decode("utf-8")
+
+
+def taskPayloadMetrics() -> Dict[str, Dict[str, int]]:
+    """per QueuedWorkTyp name:  tasks, rawBytes, sentBytes, compressed, spilled,
+    oversize (too big but sent as is)
+    """
+    with _metricsLock:
+        return {name: dict(c) for name, c in _metrics.items()}
+
+
+def _compress(raw: bytes):  # -> (bytes, Content-Encoding)
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), "zstd"
+    return zlib.compress(raw, ZLIB_LEVEL), "deflate"
+
+
+def _spill(body: bytes) -> str:
+    from ..models.bbucket import BitBucket
+
+    key = SPILL_KEY_PREFIX + hashlib.sha256(body).hexdigest()[:40]
+    BitBucket.storeBlobAtKey(key, body)
+    return key
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    # case insensitive for plain dicts too
+    for k, v in headers.items():
+        if k.lower() == name.lower():
+            return v
+    return None
+
+
+def _count(workType: Optional[QueuedWorkTyp], **amounts: int) -> None:
+    if workType is None:
+        return  # GETs & untyped test posts
+    with _metricsLock:
+        _metrics.setdefault(workType.name, Counter()).update(amounts)
+
+
+def payloadCheck(categories: int = 300, newsItems: int = 3000) -> None:
+    """round trips & sizes through do_background_work with FakeTasksClient
+    BitBucket blob calls, the task client, the payload settings & metrics
+    are swapped for the check & restored after
+    """
+    from ..models.bbucket import BitBucket
+    from .taskq_dispatch import setTaskClient
+
+    blobs: Dict[str, bytes] = dict()
+    # raw class attributes (staticmethod objects) so they restore exactly
+    realStore = BitBucket.__dict__["storeBlobAtKey"]
+    realGet = BitBucket.__dict__["getBlobAtKey"]
+    BitBucket.storeBlobAtKey = staticmethod(lambda k, data: blobs.__setitem__(k, data))
+    BitBucket.getBlobAtKey = staticmethod(blobs.get)
+    previousClient = setTaskClient(None)
+    settings = (_compressEnabled, _spillEnabled, _spillOverBytes)
+    with _metricsLock:
+        savedMetrics = {name: Counter(c) for name, c in _metrics.items()}
+    try:
+        _runPayloadCheck(categories, newsItems)
+    finally:
+        BitBucket.storeBlobAtKey = realStore
+        BitBucket.getBlobAtKey = realGet
+        setTaskClient(previousClient)
+        setTaskPayloadCompression(settings[0])
+        setTaskPayloadSpill(settings[1], settings[2])
+        with _metricsLock:
+            _metrics.clear()
+            _metrics.update(savedMetrics)
+
+
+def _runPayloadCheck(categories: int, newsItems: int) -> None:
+    import random
+    import time
+    from .taskq_dispatch import FakeTasksClient, do_background_work, setTaskClient
+
+    rnd = random.Random(7)
+    dailyStats = {
+        "cat{0:03d}".format(i): dict(
+            catName="category {0}".format(i),
+            iconName="icon{0}".format(i % 20),
+            isPos=i % 2 == 0,
+            actCount=rnd.randint(0, 5000),
+        )
+        for i in range(categories)
+    }
+    news = [
+        dict(
+            behCode="beh{0:04d}".format(rnd.randint(0, 900)),
+            headline="prospect {0} did something {1}".format(i, rnd.random()),
+            votes=rnd.randint(0, 99),
+        )
+        for i in range(newsItems)
+    ]
+    payloads = [
+        (QueuedWorkTyp.STATS_DAILY, json.dumps(dailyStats)),
+        (QueuedWorkTyp.COMMUNITY_NEWS, json.dumps(news)),
+        (QueuedWorkTyp.STATS_ROLLUPAGGREGATE, json.dumps({"positive": True})),
+    ]
+
+    # (compress, spill):  the default leaves bodies exactly as before
+    for compress, spill in ((False, False), (False, True), (True, True)):
+        setTaskPayloadCompression(compress)
+        setTaskPayloadSpill(spill)
+        _metrics.clear()
+        tasks = FakeTasksClient()
+        setTaskClient(tasks)
+        start = time.perf_counter()
+        for i, (workType, payload) in enumerate(payloads):
+            do_background_work(workType, payload, taskName="check{0}".format(i))
+        elapsed = time.perf_counter() - start
+
+        for task, (_, payload) in zip(tasks.tasks, payloads):
+            req = task.app_engine_http_request or task.http_request
+            if not (compress or spill):
+                # handlers that don't decode still get their json
+                assert req.body == payload.encode() and len(req.headers) == 1
+                continue
+            assert len(req.body) <= _spillOverBytes, "task too big"
+            assert decodeTaskPayload(req.body, dict(req.headers)) == payload
+
+        print(
+            "compression {0} ({1}), spill {2}, {3:.1f}ms:".format(
+                "on" if compress else "off",
+                "zstd" if zstandard is not None else "zlib",
+                "on" if spill else "off",
+                elapsed * 1000,
+            )
+        )
+        for name, counts in taskPayloadMetrics().items():
+            print(
+                "  {0:<22} raw {1:>7}B  sent {2:>7}B  compressed {3}  spilled {4}  "
+                "oversize {5}".format(
+                    name,
+                    counts["rawBytes"],
+                    counts["sentBytes"],
+                    counts["compressed"],
+                    counts["spilled"],
+                    counts["oversize"],
+                )
+            )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    # the copy taskq_dispatch imported, not this __main__ one
+    from . import task_payload
+
+    task_payload.payloadCheck()
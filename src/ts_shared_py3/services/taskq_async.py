@@ -0,0 +1,336 @@
+"""
+non-blocking cloud tasks sends for taskq_dispatch
+
+taskq_dispatch builds each CreateTaskRequest on the request thread and used to
+wait for the create_task RPC there too;  with a dispatcher installed the
+request is only queued & the RPC runs here:
+    asyncio loop on a daemon thread with a CloudTasksAsyncClient
+    bounded queue (maxQueued);  submit blocks up to putTimeoutSecs when full,
+        then raises queue.Full (backpressure instead of unbounded memory)
+    `concurrency` sender coroutines, so at most that many RPCs in flight
+    transient errors (unavailable, deadline, 429, 5xx) retried with
+        exponential backoff + jitter, up to maxAttempts
+    AlreadyExists (a named task sent twice) counts as deduped, not failed
+    stop() drains the queue (up to drainSecs);  startAsyncDispatch registers it
+        with atexit.  from then on submit() returns False & taskq_dispatch
+        sends blocking instead
+
+    startAsyncDispatch()   # app startup;  do_background_work* keep their signatures
+
+start() raises (instead of hanging) when the loop or client can't be set up
+
+callers of dispatched tasks no longer learn the RPC outcome (dedupes & tasks
+failed after maxAttempts only show up in metrics);  named GETs (dedupeByName)
+skip the dispatcher & are sent blocking, so do_background_work_get still
+returns False for a duplicate name
+
+latency benchmark with a stubbed client:  python -m ts_shared_py3.services.taskq_async
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+
+from google.api_core import exceptions as gexc
+from google.cloud.tasks_v2 import CreateTaskRequest, Task
+
+DISPATCH_MAX_QUEUED = 1000
+DISPATCH_CONCURRENCY = 8
+DISPATCH_MAX_ATTEMPTS = 5
+DISPATCH_BACKOFF_SECS = 0.25  # doubles per retry
+DISPATCH_MAX_BACKOFF_SECS = 8.0
+
+TRANSIENT_ERRORS = (
+    gexc.ServiceUnavailable,
+    gexc.DeadlineExceeded,
+    gexc.TooManyRequests,
+    gexc.InternalServerError,
+    gexc.Aborted,
+)
+
+log = logging.getLogger("queue_dispatch")
+
+
+def _cloudTasksAsyncClient():
+    # created on the dispatcher loop (grpc aio binds to it)
+    from google.cloud.tasks_v2 import CloudTasksAsyncClient
+
+    return CloudTasksAsyncClient()
+
+
+class AsyncTaskDispatcher(object):
+    """thread safe submit();  see module doc"""
+
+    def __init__(
+        self: AsyncTaskDispatcher,
+        maxQueued: int = DISPATCH_MAX_QUEUED,
+        concurrency: int = DISPATCH_CONCURRENCY,
+        maxAttempts: int = DISPATCH_MAX_ATTEMPTS,
+        backoffSecs: float = DISPATCH_BACKOFF_SECS,
+        putTimeoutSecs: float = 1.0,
+        clientFactory: Callable[[], Any] = None,
+    ) -> None:
+        self.concurrency = concurrency
+        self.maxAttempts = maxAttempts
+        self.backoffSecs = backoffSecs
+        self.putTimeoutSecs = putTimeoutSecs
+        self._clientFactory = clientFactory or _cloudTasksAsyncClient
+        # the asyncio.Queue is unbounded;  this bounds it across threads
+        self._slots = threading.BoundedSemaphore(maxQueued)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._startError: Optional[BaseException] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = dict(
+            submitted=0,
+            sent=0,
+            retried=0,
+            deduped=0,
+            failed=0,
+            rejected=0,  # queue full
+        )
+
+    @property
+    def metrics(self: AsyncTaskDispatcher) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["queued"] = self._queue.qsize() if self._queue is not None else 0
+        return counts
+
+    def start(
+        self: AsyncTaskDispatcher, timeoutSecs: float = 10.0
+    ) -> AsyncTaskDispatcher:
+        """raises what the loop setup (eg clientFactory) raised, or TimeoutError"""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(
+            target=self._run, name="taskq-async", daemon=True
+        )
+        self._thread.start()
+        if not self._ready.wait(timeoutSecs):
+            self._stopping = True
+            raise TimeoutError(
+                "task dispatcher not started after {0}s".format(timeoutSecs)
+            )
+        if self._startError is not None:
+            self._stopping = True
+            raise self._startError
+        return self
+
+    @property
+    def isAccepting(self: AsyncTaskDispatcher) -> bool:
+        # started & stop() not begun
+        return self._loop is not None and not self._stopping
+
+    def submit(self: AsyncTaskDispatcher, request: CreateTaskRequest) -> bool:
+        """queue one create_task;  False (nothing queued) when not accepting
+        (eg the atexit drain began), so the caller sends it itself
+        raises queue.Full after putTimeoutSecs
+        """
+        if not self.isAccepting:
+            return False
+        if not self._slots.acquire(timeout=self.putTimeoutSecs):
+            self._count("rejected")
+            raise queue.Full("task dispatch queue full")
+        with self._lock:
+            # stop() flips _stopping under this lock & queues its drain after,
+            # so a request queued here is always part of the drain
+            if self._stopping:
+                self._slots.release()
+                return False
+            self._counts["submitted"] += 1
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, request)
+        return True
+
+    def stop(self: AsyncTaskDispatcher, drainSecs: float = 10.0) -> bool:
+        """send what is queued (up to drainSecs) & stop;  False if some were left"""
+        with self._lock:
+            if self._thread is None or self._stopping:
+                return True
+            self._stopping = True
+        drained = asyncio.run_coroutine_threadsafe(self._drain(drainSecs), self._loop)
+        try:
+            allSent = drained.result(drainSecs + 1.0)
+        except Exception:
+            allSent = False
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(drainSecs)
+        if not allSent:
+            log.warning("task dispatcher stopped with {0}".format(self.metrics))
+        return allSent
+
+    def _run(self: AsyncTaskDispatcher) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            self._queue = asyncio.Queue()
+            self._client = self._clientFactory()
+            self._senders = [
+                loop.create_task(self._sender()) for _ in range(self.concurrency)
+            ]
+            self._loop = loop
+        except BaseException as err:
+            # start() re-raises it instead of waiting forever
+            self._startError = err
+            loop.close()
+            return
+        finally:
+            self._ready.set()
+        loop.run_forever()
+
+    async def _drain(self: AsyncTaskDispatcher, drainSecs: float) -> bool:
+        try:
+            await asyncio.wait_for(self._queue.join(), drainSecs)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            for sender in self._senders:
+                sender.cancel()
+
+    async def _sender(self: AsyncTaskDispatcher) -> None:
+        while True:
+            request = await self._queue.get()
+            try:
+                await self._send(request)
+            finally:
+                self._slots.release()
+                self._queue.task_done()
+
+    async def _send(self: AsyncTaskDispatcher, request: CreateTaskRequest) -> None:
+        lastErr: Exception = None
+        for attempt in range(1, self.maxAttempts + 1):
+            try:
+                task: Task = await self._client.create_task(request=request)
+                self._count("sent")
+                log.info("Created task {0}".format(task.name))
+                return
+            except gexc.AlreadyExists:
+                self._count("deduped")
+                return
+            except TRANSIENT_ERRORS as err:
+                lastErr = err
+                if attempt == self.maxAttempts:
+                    break
+                self._count("retried")
+                backoff = min(
+                    self.backoffSecs * 2 ** (attempt - 1), DISPATCH_MAX_BACKOFF_SECS
+                )
+                log.info("create_task retry {0} after {1}".format(attempt, err))
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            except Exception as err:
+                lastErr = err
+                break
+        self._count("failed")
+        log.error("create_task failed for {0}: {1}".format(request.parent, lastErr))
+
+    def _count(self: AsyncTaskDispatcher, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+
+class FakeAsyncTasksClient(object):
+    """stand-in for CloudTasksAsyncClient:  latencySecs per create_task
+    & every failEvery-th call raises ServiceUnavailable
+    """
+
+    def __init__(
+        self: FakeAsyncTasksClient, latencySecs: float = 0.0, failEvery: int = 0
+    ) -> None:
+        self.latencySecs = latencySecs
+        self.failEvery = failEvery
+        self.tasks: list[Task] = []
+        self.calls = 0
+
+    async def create_task(
+        self: FakeAsyncTasksClient, request: CreateTaskRequest = None, **kwargs
+    ) -> Task:
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.latencySecs)
+        if self.failEvery and call % self.failEvery == 0:
+            raise gexc.ServiceUnavailable("injected")
+        self.tasks.append(request.task)
+        return request.task
+
+
+def benchRequestLatency(
+    tasks: int = 200, rpcLatencySecs: float = 0.03, failEvery: int = 7
+) -> None:
+    """request thread time per do_background_work_get:  sync client vs dispatcher"""
+    from . import taskq_dispatch
+    from .taskq_dispatch import FakeTasksClient, do_background_work_get
+
+    def _timedCalls() -> list[float]:
+        times = []
+        for i in range(tasks):
+            start = time.perf_counter()
+            do_background_work_get("/bench/{0}".format(i), "default", 0)
+            times.append(time.perf_counter() - start)
+        return sorted(times)
+
+    def _report(label: str, times: list[float], extra: str = "") -> None:
+        print(
+            "{0:<6} {1} calls:  p50 {2:.2f}ms   p99 {3:.2f}ms   total {4:.2f}s  {5}".format(
+                label,
+                tasks,
+                times[len(times) // 2] * 1000,
+                times[int(len(times) * 0.99)] * 1000,
+                sum(times),
+                extra,
+            )
+        )
+
+    def _noClient():
+        raise RuntimeError("no credentials")
+
+    try:
+        AsyncTaskDispatcher(clientFactory=_noClient).start(1.0)
+        assert False, "start() should raise"
+    except RuntimeError:
+        pass  # raised, not hung
+
+    syncClient = FakeTasksClient(rpcLatencySecs)
+    previousClient = taskq_dispatch.setTaskClient(syncClient)
+    previousDispatcher = taskq_dispatch.setAsyncDispatcher(None)
+    fake = FakeAsyncTasksClient(rpcLatencySecs, failEvery)
+    dispatcher = AsyncTaskDispatcher(backoffSecs=0.01, clientFactory=lambda: fake)
+    try:
+        _report("sync", _timedCalls())
+
+        taskq_dispatch.setAsyncDispatcher(dispatcher.start())
+        times = _timedCalls()
+        start = time.perf_counter()
+        assert dispatcher.stop(), "not drained"
+        drainSecs = time.perf_counter() - start
+        # once stopping, sends fall back to the blocking client
+        sentBefore = len(syncClient.tasks)
+        assert do_background_work_get("/bench/late", "default", 0)
+        assert len(syncClient.tasks) == sentBefore + 1
+    finally:
+        taskq_dispatch.setAsyncDispatcher(previousDispatcher)
+        taskq_dispatch.setTaskClient(previousClient)
+    metrics = dispatcher.metrics
+    assert len(fake.tasks) == tasks == metrics["sent"], "lost tasks {0} {1}".format(
+        len(fake.tasks), metrics
+    )
+    _report(
+        "async",
+        times,
+        "(+{0:.2f}s drain;  {1} retried of {2} RPCs)".format(
+            drainSecs, metrics["retried"], fake.calls
+        ),
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    benchRequestLatency()
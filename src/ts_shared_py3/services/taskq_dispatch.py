@@ -1,9 +1,11 @@
 from typing import Any, Union, Dict
+import atexit
 import numbers
 import logging
 import datetime
 import time
 from json import dumps as json_dumps
+from google.api_core.exceptions import AlreadyExists
 from google.auth import default as authDefault
 from google.protobuf import timestamp_pb2
 import google.cloud.tasks_v2 as tasks_v2
@@ -23,12 +25,15 @@ from ..constants import (
     LOCAL_PUBLIC_URL_SCORING,
 )
 from ..enums.queued_work import QueuedWorkTyp
+from .task_payload import encodeTaskPayload
 
 log = logging.getLogger("queue_dispatch")
 
 
 # gcpCfg: GcpSvcsCfg = GcpSvcsCfg()
 _ts_task_client: CloudTasksClient = None
+_ts_async_dispatcher = None  # AsyncTaskDispatcher;  see startAsyncDispatch
+_ts_task_backend = None  # TaskBackend that replaces cloud tasks;  see useLocalTasks
 # _retryConfig: RetryConfig = RetryConfig(dict(max_attempts=2))
 
 
@@ -47,7 +52,14 @@ def do_background_work(
         non_gae_web_host = LOCAL_PUBLIC_URL_SCORING if IS_RUNNING_LOCAL else None
     handlerUri = workType.postHandlerFullUri(non_gae_web_host=non_gae_web_host)
 
-    _create_task_post(queue, handlerUri, payload, in_seconds, taskName)
+    if _ts_task_backend is not None:
+        if isinstance(payload, dict):
+            payload = json_dumps(payload)
+        _ts_task_backend.submit(
+            queue, handlerUri, "POST", payload, in_seconds, taskName
+        )
+        return
+    _create_task_post(queue, handlerUri, payload, in_seconds, taskName, workType)
 
 
 def do_background_work_get(
@@ -55,9 +67,16 @@ def do_background_work_get(
     queueName: str = "default",  # GAEQ_FOR_SCORING,
     in_seconds: int = None,
     taskName: str = None,
-):
+    dedupeByName: bool = False,
+) -> bool:
     # uses GET
-    _create_task_get(queueName, handlerUri, in_seconds, taskName)
+    # dedupeByName sends taskName to cloud tasks;  False if that name already exists
+    if _ts_task_backend is not None:
+        name = taskName if dedupeByName else None
+        return _ts_task_backend.submit(
+            queueName, handlerUri, "GET", None, in_seconds, name
+        )
+    return _create_task_get(queueName, handlerUri, in_seconds, taskName, dedupeByName)
 
 
 def _getTaskClient() -> CloudTasksClient:  # CloudTasksAsyncClient
@@ -74,6 +93,92 @@ def _getTaskClient() -> CloudTasksClient:  # CloudTasksAsyncClient
     return _ts_task_client
 
 
+def setTaskBackend(backend):  # -> previous TaskBackend
+    """run do_background_work* tasks on backend (None == cloud tasks)"""
+    global _ts_task_backend
+    previous = _ts_task_backend
+    _ts_task_backend = backend
+    return previous
+
+
+def useLocalTasks(**kwargs):  # -> LocalTaskBackend
+    # no cloud tasks at all;  register handlers on the returned backend
+    from .taskq_local import LocalTaskBackend
+
+    backend = LocalTaskBackend(**kwargs)
+    setTaskBackend(backend)
+    return backend
+
+
+def setAsyncDispatcher(dispatcher):  # -> previous AsyncTaskDispatcher
+    """send tasks through an AsyncTaskDispatcher (None == back to blocking sends)"""
+    global _ts_async_dispatcher
+    previous = _ts_async_dispatcher
+    _ts_async_dispatcher = dispatcher
+    return previous
+
+
+def startAsyncDispatch(**kwargs):  # -> AsyncTaskDispatcher
+    # kwargs go to AsyncTaskDispatcher;  queued tasks are sent at exit
+    from .taskq_async import AsyncTaskDispatcher
+
+    dispatcher = AsyncTaskDispatcher(**kwargs).start()
+    atexit.register(dispatcher.stop)
+    setAsyncDispatcher(dispatcher)
+    return dispatcher
+
+
+def _sendTask(
+    taskRequest: CreateTaskRequest, blocking: bool = False
+) -> Union[Task, None]:
+    # None when queued on the async dispatcher;  raises AlreadyExists (named tasks)
+    # blocking skips the dispatcher (callers that need the outcome)
+    dispatcher = _ts_async_dispatcher
+    if dispatcher is not None and not blocking and dispatcher.submit(taskRequest):
+        return None
+    # else a blocking send;  also once the dispatcher stops (eg the atexit drain)
+    return _getTaskClient().create_task(request=taskRequest)
+
+
+def setTaskClient(client):  # -> previous client (None == not created yet)
+    """swap the Cloud Tasks client (eg FakeTasksClient in checks & load tests)
+    restore the returned one when done
+    """
+    global _ts_task_client
+    previous = _ts_task_client
+    _ts_task_client = client
+    return previous
+
+
+class FakeTasksClient(object):
+    """the slice of CloudTasksClient this module uses
+    records every created task;  latencySecs simulates the create_task RPC
+    """
+
+    def __init__(self, latencySecs: float = 0.0) -> None:
+        self.latencySecs = latencySecs
+        self.tasks: list[Task] = []
+        self._names: set[str] = set()
+
+    def queue_path(self, project: str, location: str, queue: str) -> str:
+        return "projects/{0}/locations/{1}/queues/{2}".format(project, location, queue)
+
+    def task_path(self, project: str, location: str, queue: str, task: str) -> str:
+        return self.queue_path(project, location, queue) + "/tasks/" + task
+
+    def create_task(self, request: CreateTaskRequest = None, **kwargs) -> Task:
+        if self.latencySecs > 0:
+            time.sleep(self.latencySecs)
+        name = request.task.name
+        if name:
+            # cloud tasks keeps used names (even of finished tasks) for a while
+            if name in self._names:
+                raise AlreadyExists("task {0} already exists".format(name))
+            self._names.add(name)
+        self.tasks.append(request.task)
+        return request.task
+
+
 def _getQueuePath(queueName: str) -> str:
     ctc = _getTaskClient()
     ev = EnvVarVals()  # regionId: str = "us-central1"
@@ -87,7 +192,7 @@ def _getPathPrefix(qPath: str) -> str:
 
 
 def _createTaskPayload(
-    handlerUri: str, payload: str
+    handlerUri: str, payload: str, workType: QueuedWorkTyp = None
 ) -> tasks_v2.AppEngineHttpRequest:  # dict[str, str]:
     #
     # print("task payload type: {0}".format(type(payload)))
@@ -99,13 +204,15 @@ def _createTaskPayload(
     assert (
         isinstance(payload, str) or payload is None
     ), "payload must be a string or none"
-    encoded_payload: str = "_empty".encode() if payload is None else payload.encode()
+    # compressed and/or spilled to BitBucket when large;  see task_payload.py
+    encoded = encodeTaskPayload(payload, workType)
     d: dict[str, Any] = {
         uri_key: handlerUri,
         "http_method": "POST",
-        "body": encoded_payload,
+        "body": encoded.body,
         "headers": {
             "Content-Type": "application/json",
+            **encoded.headers,
         },
     }
 
@@ -131,6 +238,7 @@ def _create_task_post(
     payload: Union[str, dict, None] = "",
     in_seconds: int = None,
     taskName: str = None,
+    workType: QueuedWorkTyp = None,
 ):
     # https://cloud.google.com/tasks/docs/creating-appengine-tasks
     if isinstance(payload, dict):
@@ -139,7 +247,7 @@ def _create_task_post(
     # print("create_task_post:  {0}".format(type(payload)))
     # print(payload)
 
-    requestObj = _createTaskPayload(handlerUri, payload)  # : Dict[str, str]
+    requestObj = _createTaskPayload(handlerUri, payload, workType)
     if in_seconds is not None:
         d = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
             seconds=in_seconds
@@ -166,9 +274,10 @@ def _create_task_post(
         task=t,
     )
 
-    createdTask: Task = task_client.create_task(request=taskRequest)
+    createdTask: Task = _sendTask(taskRequest)
     # createdTask: Task = _getTaskClient().create_task(parent=parent, task=taskArgs)  #
-    logging.info("Created task at {0}--{1}".format(parent, createdTask))
+    if createdTask is not None:  # None == queued for async send
+        logging.info("Created task at {0}--{1}".format(parent, createdTask))
     # logging.info("web url: " + requestObj)
     # logging.info("gae uri: " + requestObj)
     # logging.info(createdTask)
@@ -179,7 +288,8 @@ def _create_task_get(
     handlerUri: str,
     in_seconds: int = None,
     taskName: str = None,
-):
+    dedupeByName: bool = False,
+) -> bool:
     # https://cloud.google.com/tasks/docs/creating-appengine-tasks
 
     taskRequest: Union[tasks_v2.AppEngineHttpRequest, tasks_v2.HttpRequest] = (
@@ -207,13 +317,24 @@ def _create_task_get(
         timestamp.FromSeconds(in_seconds)
         t.schedule_time = timestamp
 
+    if dedupeByName and taskName:
+        # name must be [A-Za-z0-9_-] & unused (names of finished tasks are kept too)
+        t.name = parent + "/tasks/" + taskName
+
     taskRequest = CreateTaskRequest(
         parent=parent,
         task=t,
     )
-    queueAck = _getTaskClient().create_task(request=taskRequest)
-    logging.info("Created task {} --".format(queueAck.name))
-    logging.info(queueAck)
+    try:
+        # named:  sent blocking so a duplicate name still returns False
+        queueAck = _sendTask(taskRequest, blocking=bool(t.name))
+    except AlreadyExists:
+        logging.info("task {0} already queued;  skipped".format(taskName))
+        return False
+    if queueAck is not None:
+        logging.info("Created task {} --".format(queueAck.name))
+        logging.info(queueAck)
+    return True
 
 
 def test_create_task(
@@ -0,0 +1,302 @@
+"""
+in-process task backend for taskq_dispatch (dev, tests & load tests)
+
+with a backend installed, do_background_work / do_background_work_get skip
+cloud tasks (no network or gcp credentials) and the backend runs the task:
+    LocalTaskBackend    python handlers registered per route, called on a
+                        thread pool;  honors in_seconds, task names (a name
+                        is refused for TASK_NAME_RETAIN_SECS like cloud tasks)
+                        & queue names (from QueuedWorkTyp.queueName);
+                        metrics per queue
+
+routes are a QueuedWorkTyp (its POST handler uri) or a uri path;  a path ending
+in "/" matches every uri under it (eg "/scoring/recalc/" for the GET rescore)
+the host part of local full urls is ignored
+
+    backend = taskq_dispatch.useLocalTasks()
+    backend.register(QueuedWorkTyp.STATS_DAILY, lambda task: handleDaily(task.payload))
+    backend.register("/scoring/recalc/", lambda task: rescore(*task.path.split("/")[-2:]))
+
+pipeline benchmark:  python -m ts_shared_py3.services.taskq_local
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from ..enums.queued_work import QueuedWorkTyp
+
+TASK_NAME_RETAIN_SECS = 3600
+LOCAL_TASK_WORKERS = 4
+
+log = logging.getLogger("queue_dispatch")
+
+
+class LocalTask(NamedTuple):
+    queue: str
+    path: str  # handler uri without scheme & host
+    method: str  # POST | GET
+    payload: Optional[str]
+    taskName: Optional[str]
+    dueAt: float  # time.monotonic()
+    attempt: int = 1
+
+
+TaskHandler = Callable[[LocalTask], Any]
+
+
+class TaskBackend(object):
+    """what do_background_work* hand tasks to"""
+
+    def submit(
+        self: TaskBackend,
+        queue: str,
+        handlerUri: str,
+        method: str,
+        payload: Optional[str] = None,
+        inSeconds: Optional[float] = None,
+        taskName: Optional[str] = None,
+    ) -> bool:
+        """False if taskName was already used"""
+        raise NotImplementedError()
+
+
+class LocalTaskBackend(TaskBackend):
+    """thread safe;  see module doc"""
+
+    def __init__(
+        self: LocalTaskBackend,
+        workers: int = LOCAL_TASK_WORKERS,
+        maxAttempts: int = 1,
+        retrySecs: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxAttempts = maxAttempts
+        self.retrySecs = retrySecs
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="taskq-local")
+        self._handlers: Dict[str, TaskHandler] = dict()
+        self._cond = threading.Condition()
+        # (dueAt, seq, task) waiting for their in_seconds
+        self._delayed: List[Tuple[float, int, LocalTask]] = []
+        self._seq = itertools.count()
+        self._usedNames: Dict[str, float] = dict()
+        self._unfinished = 0
+        self._stopped = False
+        self._counts: Dict[str, Counter] = dict()
+        self._runSecs: Counter = Counter()
+        self._scheduler = threading.Thread(
+            target=self._runScheduler, name="taskq-local-timer", daemon=True
+        )
+        self._scheduler.start()
+
+    def register(
+        self: LocalTaskBackend, route: Union[QueuedWorkTyp, str], handler: TaskHandler
+    ) -> None:
+        path = route.postHandlerFullUri() if isinstance(route, QueuedWorkTyp) else route
+        self._handlers[path] = handler
+
+    def submit(
+        self: LocalTaskBackend,
+        queue: str,
+        handlerUri: str,
+        method: str,
+        payload: Optional[str] = None,
+        inSeconds: Optional[float] = None,
+        taskName: Optional[str] = None,
+    ) -> bool:
+        now = self._clock()
+        task = LocalTask(
+            queue,
+            urlsplit(handlerUri).path,
+            method,
+            payload,
+            taskName,
+            now + max(inSeconds or 0, 0),
+        )
+        with self._cond:
+            assert not self._stopped, "LocalTaskBackend is shut down"
+            if taskName:
+                usedAt = self._usedNames.get(taskName)
+                if usedAt is not None and now - usedAt < TASK_NAME_RETAIN_SECS:
+                    self._bump(queue, "deduped")
+                    return False
+                self._usedNames[taskName] = now
+            self._bump(queue, "queued")
+            self._unfinished += 1
+            self._schedule(task)
+        return True
+
+    def join(self: LocalTaskBackend, timeoutSecs: float = None) -> bool:
+        """wait until every queued (& delayed) task has run;  False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeoutSecs)
+
+    def shutdown(self: LocalTaskBackend, wait: bool = True) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._pool.shutdown(wait=wait)
+
+    @property
+    def metrics(self: LocalTaskBackend) -> Dict[str, Dict[str, float]]:
+        """per queue:  queued, ran, failed, retried, deduped, unhandled, runSecs"""
+        with self._cond:
+            byQueue = {q: dict(c) for q, c in self._counts.items()}
+            for q, secs in self._runSecs.items():
+                byQueue[q]["runSecs"] = round(secs, 4)
+        return byQueue
+
+    def _handlerFor(self: LocalTaskBackend, path: str) -> Optional[TaskHandler]:
+        handler = self._handlers.get(path)
+        if handler is not None:
+            return handler
+        prefixes = [p for p in self._handlers if p.endswith("/") and path.startswith(p)]
+        return self._handlers[max(prefixes, key=len)] if prefixes else None
+
+    def _schedule(self: LocalTaskBackend, task: LocalTask) -> None:
+        # call with _cond held
+        if task.dueAt <= self._clock():
+            self._pool.submit(self._run, task)
+        else:
+            heapq.heappush(self._delayed, (task.dueAt, next(self._seq), task))
+            self._cond.notify_all()
+
+    def _runScheduler(self: LocalTaskBackend) -> None:
+        with self._cond:
+            while not self._stopped:
+                now = self._clock()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._pool.submit(self._run, heapq.heappop(self._delayed)[2])
+                waitSecs = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(waitSecs)
+
+    def _run(self: LocalTaskBackend, task: LocalTask) -> None:
+        handler = self._handlerFor(task.path)
+        outcome = "ran"
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                log.warning("no local handler for {0}".format(task.path))
+                outcome = "unhandled"
+            else:
+                handler(task)
+        except Exception:
+            log.exception("local task {0} failed".format(task.taskName or task.path))
+            outcome = "failed"
+        elapsed = time.perf_counter() - start
+
+        with self._cond:
+            self._runSecs[task.queue] += elapsed
+            if outcome == "failed" and task.attempt < self.maxAttempts:
+                self._bump(task.queue, "retried")
+                retry = task._replace(
+                    dueAt=self._clock() + self.retrySecs * task.attempt,
+                    attempt=task.attempt + 1,
+                )
+                self._schedule(retry)
+                return
+            self._bump(task.queue, outcome)
+            self._unfinished -= 1
+            self._pruneNames()
+            self._cond.notify_all()
+
+    def _bump(self: LocalTaskBackend, queue: str, name: str) -> None:
+        # call with _cond held
+        self._counts.setdefault(queue, Counter())[name] += 1
+
+    def _pruneNames(self: LocalTaskBackend) -> None:
+        # call with _cond held
+        if len(self._usedNames) > 10000:
+            oldest = self._clock() - TASK_NAME_RETAIN_SECS
+            self._usedNames = {n: t for n, t in self._usedNames.items() if t > oldest}
+
+
+def benchLocalPipeline(
+    entries: int = 2000, workers: int = LOCAL_TASK_WORKERS, workSecs: float = 0.001
+) -> None:
+    """a 2 stage pipeline through do_background_work:  each entry posts a
+    STATS_DAILY task whose handler queues a named COMMUNITY_NEWS task
+    (one per 10 entries, so 9 of 10 are deduped) & a delayed GET rescore
+    """
+    import json
+    from . import taskq_dispatch
+    from .taskq_dispatch import do_background_work, do_background_work_get
+
+    backend = LocalTaskBackend(workers)
+    previous = taskq_dispatch.setTaskBackend(backend)
+    latencies: List[float] = []
+    rescored: Counter = Counter()
+
+    def _daily(task: LocalTask) -> None:
+        args = json.loads(task.payload)
+        time.sleep(workSecs)
+        do_background_work(
+            QueuedWorkTyp.COMMUNITY_NEWS,
+            task.payload,
+            taskName="news-{0}".format(args["i"] // 10),
+        )
+        do_background_work_get("/scoring/recalc/u{0}/1".format(args["i"]), "x", 0.05)
+
+    def _news(task: LocalTask) -> None:
+        latencies.append(backend._clock() - json.loads(task.payload)["at"])
+
+    def _rescore(task: LocalTask) -> None:
+        rescored[task.queue] += 1
+        # honored in_seconds
+        assert backend._clock() >= task.dueAt
+
+    backend.register(QueuedWorkTyp.STATS_DAILY, _daily)
+    backend.register(QueuedWorkTyp.COMMUNITY_NEWS, _news)
+    backend.register("/scoring/recalc/", _rescore)
+    try:
+        start = time.perf_counter()
+        for i in range(entries):
+            payload = json.dumps({"i": i, "at": backend._clock()})
+            do_background_work(
+                QueuedWorkTyp.STATS_DAILY, payload, taskName="d{0}".format(i)
+            )
+        submitSecs = time.perf_counter() - start
+        assert backend.join(60), "tasks left after 60s"
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.shutdown()
+        taskq_dispatch.setTaskBackend(previous)
+
+    metrics = backend.metrics
+    assert metrics["default"]["ran"] == entries
+    assert metrics["comm-news-queue"]["ran"] == len(latencies) == -(-entries // 10)
+    assert metrics["comm-news-queue"]["deduped"] == entries - len(latencies)
+    assert rescored["x"] == entries
+    latencies.sort()
+    print(
+        "{0} entries, {1} workers:  {2} tasks in {3:.2f}s = {4:.0f} tasks/sec   "
+        "(submit {5:.1f}us each)".format(
+            entries,
+            workers,
+            sum(m.get("ran", 0) for m in metrics.values()),
+            elapsed,
+            sum(m.get("ran", 0) for m in metrics.values()) / elapsed,
+            submitSecs / entries * 1e6,
+        )
+    )
+    print(
+        "entry -> news latency p50 {0:.1f}ms   p99 {1:.1f}ms".format(
+            latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000,
+        )
+    )
+    for queue, counts in sorted(metrics.items()):
+        print("  {0:<16} {1}".format(queue, counts))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    benchLocalPipeline()
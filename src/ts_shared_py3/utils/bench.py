@@ -0,0 +1,49 @@
+"""
+shared bits of the python -m benchmarks, checks & load tests
+    bestMs(func, rounds)          best wall time of func() over rounds (ms)
+    perCallMicros(func, rounds)   mean wall time per func() call (us)
+    benchArgs(usage)              __main__ bootstrap:  sets the proj_root
+                                  from argv[1] (or prints usage & exits)
+
+    if __name__ == "__main__":
+        from ...utils.bench import benchArgs
+
+        args = benchArgs("[--bench]")   # argv after the proj_root
+"""
+
+from __future__ import annotations
+from typing import Callable, List
+import sys
+import time
+
+
+def bestMs(func: Callable[[], object], rounds: int = 5) -> float:
+    # best of rounds:  least disturbed by gc & other threads
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def perCallMicros(func: Callable[[], object], rounds: int) -> float:
+    # mean over rounds back to back calls (for calls too fast to time alone)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def benchArgs(usage: str = "") -> List[str]:
+    """set the proj_root from argv[1] & return the args after it
+    prints usage & exits without one
+    """
+    from ..config.env_vars import OsPathInfo
+
+    if len(sys.argv) < 2:
+        module = sys.modules["__main__"].__spec__.name
+        print("usage: python -m {0} <proj_root> {1}".format(module, usage).rstrip())
+        sys.exit(1)
+    OsPathInfo().set_proj_root(sys.argv[1])
+    return sys.argv[2:]